@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+"""
+#
+# Project by j54j6
+# This file provides the bandwidth scheduler of the download queue.
+# All running downloads share one global budget (bytes per second). The budget can depend on
+# the time of day (windows). It is split fairly - first between the subscriptions with running
+# downloads, then between the downloads of each subscription. So a big channel with many
+# queued videos can't starve the other subscriptions.
+# The limit is enforced below yt-dlp with a progress hook: every downloaded chunk takes its
+# bytes from the budget of the download and the downloading thread waits until the budget
+# allows them. yt-dlp calls the hook in every fragment thread (HLS / DASH with
+# concurrent_fragment_downloads), so all threads of a download share one budget. The
+# "ratelimit" param of yt-dlp can't be used - the fragment downloaders copy the params when
+# they start and enforce the rate per thread.
+#
+"""
+
+#Python modules
+import time
+import logging
+import threading
+import itertools
+from contextlib import contextmanager
+from datetime import datetime
+
+# init logger
+logger = logging.getLogger(__name__)
+
+#Budget outside of all windows (bytes per second) - 0 = unlimited
+GLOBAL_LIMIT:int = 0
+
+#Time of day windows [(start_minute, end_minute, bytes_per_second)] - first match wins
+WINDOWS:list = []
+
+#Function returning the current (local) datetime - set by configure()
+CLOCK = datetime.now
+
+#Running downloads {download_id: {"group": "<<subscription>>", "rate": None, "budget_time": 0.0,
+# "downloaded_bytes": {"<<file>>": 0}}} - rate None = unlimited
+ACTIVE_DOWNLOADS:dict = {}
+DOWNLOAD_COUNTER = itertools.count()
+SCHEDULER_LOCK = threading.Lock()
+
+#Seconds between two checks if a window started / ended while downloads are running
+REBALANCE_INTERVAL = 60
+
+#A download never gets less than this (bytes per second)
+MIN_RATE = 1024
+
+#Seconds of unused budget a download can use at once (burst)
+BURST_SECONDS = 1.0
+
+#Thread which rebalances the budget while downloads are running
+REBALANCE_THREAD = None
+
+def parse_time(value:str):
+    """ Convert a time of day like "08:30" to minutes since midnight
+
+        Return Value: int
+        - Raises ValueError on invalid values
+    """
+    hours, minutes = value.split(":")
+    hours, minutes = int(hours), int(minutes)
+    if not 0 <= hours <= 24 or not 0 <= minutes < 60 or hours * 60 + minutes > 1440:
+        raise ValueError(f"Invalid time of day {value}")
+    return hours * 60 + minutes
+
+def parse_windows(windows:list):
+    """ Convert the configured windows
+        [{"start": "08:00", "end": "23:00", "bytes_per_second": 2000000}]
+        If start > end the window ends on the next day (e.g. 22:00 - 06:00).
+
+        Return Value: list [(start_minute, end_minute, bytes_per_second)]
+        - Raises ValueError on invalid windows
+    """
+    if not isinstance(windows, list):
+        raise ValueError("Windows must be a list")
+    parsed_windows = []
+    for window in windows:
+        try:
+            parsed_windows.append((parse_time(window["start"]), parse_time(window["end"]),
+                                   max(int(window["bytes_per_second"]), 0)))
+        except (KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"Invalid window {window}") from e
+    return parsed_windows
+
+def configure(limit:int, windows:list, clock=None):
+    """ Set the budget of the scheduler. limit is used outside of all windows.
+        A limit of 0 means unlimited. The running downloads are rebalanced.
+
+        Return Value: bool
+        - True -> Budget configured
+        - False -> Invalid windows (ignored - see log)
+    """
+    global GLOBAL_LIMIT, WINDOWS, CLOCK # pylint: disable=global-statement
+    valid_config = True
+    try:
+        parsed_windows = parse_windows(windows)
+    except ValueError as e:
+        logger.error("Invalid bandwidth windows! - Windows are ignored - Error: %s", e)
+        parsed_windows = []
+        valid_config = False
+
+    with SCHEDULER_LOCK:
+        GLOBAL_LIMIT = max(int(limit), 0)
+        WINDOWS = parsed_windows
+        if clock is not None:
+            CLOCK = clock
+    rebalance()
+    return valid_config
+
+def is_limited():
+    """ Is a budget configured (global limit or at least one window)? """
+    return GLOBAL_LIMIT > 0 or bool(WINDOWS)
+
+def get_current_limit(now:datetime=None):
+    """ Return the budget for the given time (default: now)
+
+        Return Value: int - bytes per second (0 = unlimited)
+    """
+    if now is None:
+        now = CLOCK()
+    minute = now.hour * 60 + now.minute
+    for start, end, window_limit in WINDOWS:
+        if start <= end:
+            if start <= minute < end:
+                return window_limit
+        elif minute >= start or minute < end:
+            return window_limit
+    return GLOBAL_LIMIT
+
+def allocate(limit:int, downloads_per_group:dict):
+    """ Split the budget between the groups (subscriptions) and then between the downloads
+        of each group.
+
+        Return Value: dict {"<<group>>": bytes_per_second_per_download} - None = unlimited
+    """
+    if not downloads_per_group:
+        return {}
+    if not limit:
+        return {group: None for group in downloads_per_group}
+    group_share = limit / len(downloads_per_group)
+    return {group: max(int(group_share / downloads), MIN_RATE)
+            for group, downloads in downloads_per_group.items()}
+
+def rebalance():
+    """ Apply the current budget to all running downloads """
+    if not ACTIVE_DOWNLOADS:
+        return
+    limit = get_current_limit()
+    with SCHEDULER_LOCK:
+        downloads_per_group = {}
+        for download in ACTIVE_DOWNLOADS.values():
+            downloads_per_group[download["group"]] = downloads_per_group.get(download["group"], 0) + 1
+        rates = allocate(limit, downloads_per_group)
+        for download in ACTIVE_DOWNLOADS.values():
+            download["rate"] = rates[download["group"]]
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Bandwidth budget %i B/s split: %s", limit, rates)
+
+def _rebalance_loop():
+    global REBALANCE_THREAD # pylint: disable=global-statement
+    while True:
+        with SCHEDULER_LOCK:
+            if not ACTIVE_DOWNLOADS:
+                REBALANCE_THREAD = None
+                return
+        rebalance()
+        threading.Event().wait(REBALANCE_INTERVAL)
+
+def consume(download_id:int, progress:dict):
+    """ Take the bytes downloaded since the last call from the budget of a download and wait
+        until the budget allows them. progress is the dict of a yt-dlp progress hook
+        ("downloaded_bytes" of a file - of all fragments for HLS / DASH).
+
+        Return Value: float - Seconds waited
+    """
+    if progress.get("status") not in ("downloading", "finished"):
+        return 0.0
+    #The final state only contains "filename" (not "tmpfilename")
+    file_name = progress.get("filename")
+    downloaded_bytes = progress.get("downloaded_bytes") or 0
+    with SCHEDULER_LOCK:
+        download = ACTIVE_DOWNLOADS.get(download_id)
+        if download is None:
+            return 0.0
+        last_bytes = download["downloaded_bytes"].get(file_name, 0)
+        download["downloaded_bytes"][file_name] = max(last_bytes, downloaded_bytes)
+        new_bytes = downloaded_bytes - last_bytes
+        if new_bytes <= 0 or download["rate"] is None:
+            return 0.0
+        #budget_time = time until the budget is used - unused budget is kept for BURST_SECONDS
+        now = time.monotonic()
+        download["budget_time"] = max(download["budget_time"], now - BURST_SECONDS) + \
+                                  new_bytes / download["rate"]
+        wait_time = download["budget_time"] - now
+    if wait_time > 0:
+        time.sleep(wait_time)
+        return wait_time
+    return 0.0
+
+@contextmanager
+def limited_download(group:str, ydl):
+    """ Context manager to register a running download. A progress hook is added to the
+        YoutubeDL instance while the download is running - it enforces the share of the
+        budget (see consume()).
+
+        with YoutubeDL(ydl_opts) as ydl, limited_download("<<subscription>>", ydl):
+            ydl.download([url])
+    """
+    if not is_limited():
+        yield
+        return
+
+    global REBALANCE_THREAD # pylint: disable=global-statement
+    download_id = next(DOWNLOAD_COUNTER)
+
+    def progress_hook(progress:dict):
+        consume(download_id, progress)
+
+    with SCHEDULER_LOCK:
+        ACTIVE_DOWNLOADS[download_id] = {"group": group, "rate": None,
+                                         "budget_time": time.monotonic(), "downloaded_bytes": {}}
+        if REBALANCE_THREAD is None:
+            REBALANCE_THREAD = threading.Thread(target=_rebalance_loop, daemon=True,
+                                                name="bandwidth-scheduler")
+            REBALANCE_THREAD.start()
+    rebalance()
+    ydl.add_progress_hook(progress_hook)
+    try:
+        yield
+    finally:
+        #Pooled instances are reused - remove the hook again
+        if progress_hook in ydl._progress_hooks: # pylint: disable=protected-access
+            ydl._progress_hooks.remove(progress_hook) # pylint: disable=protected-access
+        with SCHEDULER_LOCK:
+            ACTIVE_DOWNLOADS.pop(download_id)
+        rebalance()
@@ -0,0 +1,365 @@
+#!/usr/bin/env python
+"""
+#
+# Project by j54j6
+# This file is an offline benchmark for the most important commands.
+# YoutubeDL and requests are replaced by a fake extractor which returns synthetic playlists
+# and writes synthetic media files. A synthetic library (N items in M subscriptions) is
+# created in a temporary directory. Nothing is downloaded and your own db is not touched.
+#
+# Usage: python benchmark.py --items 5000 --subscriptions 50 --output results.json
+# The results (seconds per scenario) are saved as json so they can be compared across commits.
+#
+"""
+
+#Python modules
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import logging
+import argparse
+import tempfile
+import threading
+import functools
+import subprocess
+import contextlib
+import http.server
+from datetime import datetime
+
+import requests
+import yt_dlp
+
+# init logger
+logger = logging.getLogger(__name__)
+
+#The real YoutubeDL (patch_dependencies() replaces it) - used by the bandwidth check
+REAL_YOUTUBE_DL = yt_dlp.YoutubeDL
+
+class FakeYoutubeDL:
+    """ Replacement for yt_dlp.YoutubeDL. Channel urls (ending with /videos) return a playlist
+        with FakeYoutubeDL.entries_per_playlist videos. Every other url is a single video.
+    """
+    entries_per_playlist = 10
+    file_size = 1024
+
+    def __init__(self, params=None, auto_init=True): # pylint: disable=unused-argument
+        self.params = dict(params or {})
+        self._progress_hooks = []
+
+    def add_progress_hook(self, hook):
+        """ The synthetic files are written at once - hooks are not called """
+        self._progress_hooks.append(hook)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """ Nothing to close """
+
+    def extract_info(self, url, download=False, process=True, **kwargs): # pylint: disable=unused-argument
+        """ Return a synthetic playlist or video """
+        if url.rstrip("/").endswith("/videos"):
+            channel = url.rstrip("/").split("/")[-2].lstrip("@")
+            return {"_type": "playlist", "id": channel, "title": channel,
+                    "playlist_count": self.entries_per_playlist,
+                    "entries": [{"_type": "url", "ie_key": "Youtube", "id": f"{channel}-{index}",
+                                 "title": f"{channel} video {index}",
+                                 "url": f"https://www.youtube.com/watch?v={channel}-{index}"}
+                                for index in range(self.entries_per_playlist)]}
+        video_id = url.split("v=")[-1]
+        info = {"id": video_id, "title": video_title(video_id), "extractor_key": "Youtube",
+                "webpage_url": url, "duration": 60, "tags": ["benchmark"]}
+        if process:
+            info["ext"] = "mp4"
+        if download:
+            self.write_file(info)
+        return info
+
+    def sanitize_info(self, info, *args, **kwargs): # pylint: disable=unused-argument
+        """ The synthetic data are already sanitized """
+        return info
+
+    def prepare_filename(self, info, dir_type="", *, outtmpl=None, warn=False): # pylint: disable=unused-argument
+        """ Fill the output template """
+        return (outtmpl or self.params["outtmpl"]) % info
+
+    def download(self, urls):
+        """ Write a synthetic media file for every url """
+        for url in urls:
+            self.extract_info(url, download=True)
+        return 0
+
+    def write_file(self, info):
+        """ Write the synthetic media file of a video """
+        path = self.prepare_filename(info)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as media_file:
+            media_file.write(synthetic_content(info["id"], self.file_size))
+
+class FakeResponse: # pylint: disable=too-few-public-methods
+    """ Replacement for the response of requests.get() used by alive_check() """
+    status_code = 200
+
+def video_title(video_id:str):
+    """ Title of a synthetic video """
+    return "Title " + video_id
+
+def synthetic_content(seed:str, size:int):
+    """ Create reproducible file content with the given size """
+    block = hashlib.sha256(seed.encode()).digest()
+    return (block * (size // len(block) + 1))[:size]
+
+def patch_dependencies():
+    """ Replace YoutubeDL and requests.get by the fakes """
+    yt_dlp.YoutubeDL = FakeYoutubeDL
+    requests.get = lambda *args, **kwargs: FakeResponse()
+
+def setup_environment(work_dir:str, download_workers:int=1):
+    """ Load the config, point the db and the base location to work_dir and create all tables.
+        start downloads with "download_workers" parallel workers (> 1: group commit)
+
+        Return Value: bool
+    """
+    from config_handler import check_for_config, config # pylint: disable=import-outside-toplevel
+    import database_manager # pylint: disable=import-outside-toplevel
+    from project_functions import scheme_setup, check_for_workdir # pylint: disable=import-outside-toplevel
+
+    if not check_for_config():
+        return False
+    config.set("db", "db_path", os.path.join(work_dir, "benchmark.db"))
+    if not database_manager.check_db() or not scheme_setup():
+        return False
+    database_manager.update_value("config", {"option_value": os.path.join(work_dir, "library")},
+                                  {"option_name": "base_location"})
+    database_manager.update_value("config", {"option_value": str(download_workers)},
+                                  {"option_name": "download_workers"})
+    return check_for_workdir()
+
+def generate_library(subscriptions:int, items:int, new_items:int, file_size:int, duplicates:int):
+    """ Create the subscriptions and the items (db rows and files) of the synthetic library.
+        Every subscription gets new_items entries which are not downloaded yet (used by start)
+
+        Return Value: dict - Number of created subscriptions, items and duplicates
+    """
+    import database_manager # pylint: disable=import-outside-toplevel
+    from project_functions import add_subscription, prepare_scheme_dst_data # pylint: disable=import-outside-toplevel
+
+    items_per_subscription = max(items // max(subscriptions, 1), 1)
+    FakeYoutubeDL.entries_per_playlist = items_per_subscription + new_items
+    FakeYoutubeDL.file_size = file_size
+
+    for index in range(subscriptions):
+        if not add_subscription(f"https://www.youtube.com/@benchmark{index}"):
+            raise RuntimeError(f"Can't create subscription {index}")
+
+    item_rows = []
+    created_files = []
+    for subscription_name, subscription_url in database_manager.fetch_value(
+            "subscriptions", None, ["subscription_name", "subscription_path"]):
+        #Same folder download_missing() uses for this subscription
+        subscription_path = prepare_scheme_dst_data(subscription_url, True)["dst_path"]
+        os.makedirs(subscription_path, exist_ok=True)
+        for index in range(items_per_subscription):
+            video_id = f"{subscription_name}-{index}"
+            file_name = video_title(video_id) + ".mp4"
+            content = synthetic_content(video_id, file_size)
+            with open(os.path.join(subscription_path, file_name), "wb") as media_file:
+                media_file.write(content)
+            created_files.append((subscription_path, file_name))
+            url = f"https://www.youtube.com/watch?v={video_id}"
+            item_rows.append(("youtube", file_name, subscription_path,
+                              hashlib.sha256(content).hexdigest(), json.dumps({"url": [url]}),
+                              json.dumps({"id": video_id, "title": video_title(video_id),
+                                          "webpage_url": url, "tags": ["benchmark"]})))
+
+    #Copies of existing files (same content, other name) - found by validate
+    for index, (file_path, file_name) in enumerate(created_files[:duplicates]):
+        shutil.copyfile(os.path.join(file_path, file_name),
+                        os.path.join(file_path, f"duplicate {index}.mp4"))
+
+    database_manager.insert_values("items", ["scheme", "file_name", "file_path", "file_hash",
+                                             "url", "data"], item_rows)
+    return {"subscriptions": subscriptions, "items": len(item_rows),
+            "duplicates": min(duplicates, len(created_files))}
+
+def create_hls_stream(directory:str, fragments:int, fragment_size:int):
+    """ Write a synthetic HLS stream (index.m3u8 and "fragments" segments) to directory """
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "index.m3u8"), "w", encoding="utf-8") as playlist:
+        playlist.write("#EXTM3U\n#EXT-X-VERSION:3\n#EXT-X-TARGETDURATION:10\n"
+                       "#EXT-X-MEDIA-SEQUENCE:0\n")
+        for index in range(fragments):
+            with open(os.path.join(directory, f"segment{index}.ts"), "wb") as segment:
+                segment.write(synthetic_content(f"segment{index}", fragment_size))
+            playlist.write(f"#EXTINF:10.0,\nsegment{index}.ts\n")
+        playlist.write("#EXT-X-ENDLIST\n")
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    """ Serve files without logging every request """
+    def log_message(self, *args): # pylint: disable=arguments-differ
+        pass
+
+def check_fragmented_bandwidth(work_dir:str, limit:int, fragments:int=8,
+                               fragment_size:int=262144):
+    """ Download a local HLS stream (concurrent_fragment_downloads=4) twice with the real
+        yt-dlp - the second download (other subscription) starts while the first is running.
+        Both must share the budget: the total rate may not exceed the limit (+10%) and every
+        download must get at least a third of it.
+
+        Return Value: bool
+    """
+    import bandwidth_scheduler # pylint: disable=import-outside-toplevel
+    stream_dir = os.path.join(work_dir, "hls")
+    create_hls_stream(stream_dir, fragments, fragment_size)
+    server = http.server.ThreadingHTTPServer(
+        ("127.0.0.1", 0), functools.partial(QuietHandler, directory=stream_dir))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/index.m3u8"
+    bandwidth_scheduler.configure(limit, [])
+    durations = {}
+
+    def download(group:str):
+        ydl_opts = {"quiet": True, "noprogress": True, "hls_prefer_native": True,
+                    "concurrent_fragment_downloads": 4,
+                    "outtmpl": os.path.join(work_dir, "hls_" + group, "%(id)s.%(ext)s")}
+        with REAL_YOUTUBE_DL(ydl_opts) as ydl, bandwidth_scheduler.limited_download(group, ydl):
+            start_time = time.perf_counter()
+            ydl.download([url])
+            durations[group] = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    downloads = [threading.Thread(target=download, args=(group,)) for group in ("a", "b")]
+    downloads[0].start()
+    time.sleep(0.5)
+    downloads[1].start()
+    for thread in downloads:
+        thread.join()
+    total_time = time.perf_counter() - start_time
+    server.shutdown()
+    bandwidth_scheduler.configure(0, [])
+
+    if len(durations) != 2:
+        logger.error("Fragmented download failed!")
+        return False
+    size = fragments * fragment_size
+    total_rate = 2 * size / total_time
+    logger.info("Fragmented downloads: %.0f B/s total (limit %i) - %s", total_rate, limit,
+                {group: round(size / duration) for group, duration in durations.items()})
+    return total_rate <= limit * 1.1 and \
+           all(size / duration >= limit / 3 for duration in durations.values())
+
+def get_scenarios(work_dir:str, bandwidth_limit:int=0):
+    """ All scenarios in the order they are executed [(name, preparation, scenario)].
+        The preparation is not timed.
+    """
+    import database_manager # pylint: disable=import-outside-toplevel
+    import project_functions # pylint: disable=import-outside-toplevel
+
+    export_file = os.path.join(work_dir, "library", "items_export.json")
+    return [
+        ("list-subscriptions", None, project_functions.list_subscriptions),
+        ("validate", None, project_functions.validate),
+        ("validate --full", None, lambda: project_functions.validate(rehash=True)),
+        ("validate --quick", None, lambda: project_functions.validate(quick=True)),
+        ("show-duplicates", None, lambda: project_functions.show_duplicate_files() is not False),
+        ("export-items", None, project_functions.export_items),
+        #Import the exported items into an empty table
+        ("import-items", lambda: database_manager.delete_value("items", None, True),
+         lambda: project_functions.import_items(export_file)),
+        ("start", None, project_functions.start),
+    ] + ([("bandwidth (fragmented)", None,
+           lambda: check_fragmented_bandwidth(work_dir, bandwidth_limit))]
+         if bandwidth_limit > 0 else [])
+
+def run_scenarios(work_dir:str, bandwidth_limit:int=0):
+    """ Run and time all scenarios. The CLI output of the commands is suppressed.
+
+        Return Value: dict {"<<scenario>>": {"seconds": 0.1, "result": True}}
+    """
+    results = {}
+    for name, preparation, scenario in get_scenarios(work_dir, bandwidth_limit):
+        if preparation is not None:
+            preparation()
+        with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+            start_time = time.perf_counter()
+            result = scenario()
+            duration = time.perf_counter() - start_time
+        results[name] = {"seconds": round(duration, 4), "result": bool(result)}
+        logger.info("%-20s %9.3fs (result: %s)", name, duration, result)
+    return results
+
+def get_commit():
+    """ The current git commit (if available) """
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    """ The main function provides the CLI """
+    parser = argparse.ArgumentParser(description="Offline benchmark of the YT-Download Manager")
+    parser.add_argument("--items", help="Number of items in the library", type=int, default=1000)
+    parser.add_argument("--subscriptions", help="Number of subscriptions", type=int, default=10)
+    parser.add_argument("--new-items", help="New (not downloaded) videos per subscription",
+                        type=int, default=5)
+    parser.add_argument("--file-size", help="Size of each synthetic file in bytes", type=int,
+                        default=65536)
+    parser.add_argument("--duplicates", help="Number of duplicate files", type=int, default=10)
+    parser.add_argument("--output", help="Path of the json result file",
+                        default="benchmark_" + datetime.now().strftime("%Y%m%d_%H%M%S") + ".json")
+    parser.add_argument("--bandwidth-check", help="Also check that fragmented (HLS) downloads "
+                        "share this budget in bytes per second (local server, real yt-dlp)",
+                        type=int, default=0)
+    parser.add_argument("--download-workers", help="Parallel download workers used by start "
+                        "(> 1: the db writes are group committed)", type=int, default=1)
+    parser.add_argument("--keep", help="Keep the temporary library", action="store_true")
+    parser.add_argument("--log-level", help="Log level of the commands", default="ERROR")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper())
+    logger.setLevel(logging.INFO)
+    patch_dependencies()
+
+    work_dir = tempfile.mkdtemp(prefix="yt_manager_benchmark_")
+    try:
+        if not setup_environment(work_dir, args.download_workers):
+            logger.error("Error while preparing the benchmark environment!")
+            return False
+
+        start_time = time.perf_counter()
+        library = generate_library(args.subscriptions, args.items, args.new_items,
+                                   args.file_size, args.duplicates)
+        logger.info("Library created in %.3fs: %s", time.perf_counter() - start_time, library)
+
+        report = {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "commit": get_commit(),
+            "python": sys.version.split()[0],
+            "parameters": vars(args) | {"library": library},
+            "scenarios": run_scenarios(work_dir, args.bandwidth_check)
+        }
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(report, output_file, indent=4)
+        logger.info("Results saved to %s", os.path.abspath(args.output))
+        failed_scenarios = [name for name, result in report["scenarios"].items()
+                            if not result["result"]]
+        if failed_scenarios:
+            logger.error("Failed scenarios: %s", ", ".join(failed_scenarios))
+            return False
+        return True
+    finally:
+        if args.keep:
+            logger.info("Library kept in %s", work_dir)
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
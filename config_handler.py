@@ -32,6 +32,8 @@ def create_default_config(
     #Add Default configuration for values needed for the whole project
     config.add_section('other')
     config.set('other', 'timezone', 'Europe/Berlin')
+    config.set('other', 'log_level', 'INFO')
+    config.set('other', 'log_file', '')
     config.add_section('db')
     config.set('db', 'db_driver', 'sqlite')
     config.set('db', 'db_path', './')
@@ -39,6 +41,8 @@ def create_default_config(
     config.set('db', 'db_host', 'localhost')
     config.set('db', 'db_user', 'username')
     config.set('db', 'db_pass', 'password')
+    config.set('db', 'db_port', '5432')
+    config.set('db', 'db_busy_timeout', '30')
 
 
     try:
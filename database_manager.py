@@ -3,12 +3,20 @@
 #
 # Project by j54j6
 # This file provides a simple abstraction layer database files for most projects
+# The SQL is written once - the differences of the databases (connection, placeholders,
+# types, catalog queries) are described by the backends (see BACKENDS).
 #
 """
 #Python modules
 import logging
 import os
 import json
+import time
+import queue
+import pathlib
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager, nullcontext
 
 #temporarily removed sql alchemy.
 #It is not possible to use a dynamic database scheme (JSON Based) scheme.
@@ -16,21 +24,151 @@ import json
 #Feel free to add it - so we can support both SQLite and MySQL
 #from sqlalchemy import create_engine, Column, Integer, String, engine, MetaData, StaticPool, text
 
-#As replacement use sqlite python module
+#As replacement use sqlite python module (PostgreSQL: psycopg2 - imported if selected)
 import sqlite3
 
 #own Modules
 from config_handler import config
+from instrumentation import timed, timed_function
+from metrics import observed, observe
+from log_handler import shorten
 
 #DB Stuff
 #Variabvle to check if the db is already initialized
 db_init:bool = False
-#ENGINE Object
+#ENGINE Object (writer connection shared by all threads - or connection of the thread which
+#initialized the db if the backend uses one connection per thread)
 ENGINE = None
+#Selected backend (see BACKENDS) - set by check_db()
+BACKEND:dict = None
+#Errors raised by the selected backend (psycopg2.Error is added if PostgreSQL is used)
+DB_ERRORS:tuple = (sqlite3.Error,)
+#Queries on the shared ENGINE (writer) - Only one query / transaction at a time
+DB_LOCK = threading.RLock()
+
+#Connections of each thread {(thread_id, "reader"|"connection"): connection}
+#Connections of finished threads are closed
+THREAD_CONNECTIONS:dict = {}
+THREAD_LOCAL = threading.local()
+CONNECTIONS_LOCK = threading.Lock()
+
+#Condition values (see prepare_sql_conditions()) - {"column": IS_NULL} -> "column IS NULL"
+IS_NULL = object()
+NOT_NULL = object()
+
+#Seconds to wait for a lock held by another process (config.ini [db] db_busy_timeout)
+DEFAULT_BUSY_TIMEOUT = 30
+
+#Group commit (see group_commit()) - Write intents (query, values, many, future) of all threads
+#are committed by WRITER_THREAD. None if group commit is not active.
+WRITE_QUEUE = None
+WRITER_THREAD = None
+#Number of active group_commit() blocks
+GROUP_COMMIT_USERS = 0
+GROUP_COMMIT_LOCK = threading.Lock()
 
 # init logger
 logger = logging.getLogger(__name__)
 
+def connect_sqlite():
+    """ Open a connection to the SQLite file (config.ini [db] db_path) """
+    db_path = os.path.abspath(config.get("db", "db_path"))
+    #Several processes (workers) can share the db file - wait for locks of the others
+    busy_timeout = config.getint("db", "db_busy_timeout", fallback=DEFAULT_BUSY_TIMEOUT)
+    connection = sqlite3.connect(db_path, check_same_thread=False, timeout=busy_timeout)
+    cursor = connection.cursor()
+    cursor.execute('pragma encoding=UTF8')
+    #Readers don't block the writer (and vice versa)
+    cursor.execute('pragma journal_mode=WAL')
+    cursor.execute(f'pragma busy_timeout={int(busy_timeout * 1000)}')
+    connection.commit()
+    return connection
+
+def connect_sqlite_reader():
+    """ Open a read only connection to the SQLite file. In WAL mode readers neither wait for
+        the writer nor block it - so reports can run while files are downloaded.
+    """
+    db_path = pathlib.Path(os.path.abspath(config.get("db", "db_path")))
+    busy_timeout = config.getint("db", "db_busy_timeout", fallback=DEFAULT_BUSY_TIMEOUT)
+    connection = sqlite3.connect(db_path.as_uri() + "?mode=ro", uri=True,
+                                 check_same_thread=False, timeout=busy_timeout)
+    connection.cursor().execute(f'pragma busy_timeout={int(busy_timeout * 1000)}')
+    return connection
+
+def connect_memory():
+    """ Open the in memory SQLite db (shared by all threads) """
+    connection = sqlite3.connect("file::memory:?cache=shared", check_same_thread=False)
+    connection.cursor().execute('pragma encoding=UTF8')
+    connection.commit()
+    return connection
+
+def connect_postgres():
+    """ Open a connection to the PostgreSQL server (config.ini [db] db_host, db_port, db_name,
+        db_user, db_pass). Every statement is committed on its own (autocommit) - like the
+        commit after each statement of the other backends.
+    """
+    import psycopg2 # pylint: disable=import-outside-toplevel
+    connection = psycopg2.connect(host=config.get("db", "db_host"),
+                                  port=config.getint("db", "db_port", fallback=5432),
+                                  dbname=config.get("db", "db_name"),
+                                  user=config.get("db", "db_user"),
+                                  password=config.get("db", "db_pass"),
+                                  connect_timeout=config.getint("db", "db_busy_timeout",
+                                                                fallback=DEFAULT_BUSY_TIMEOUT))
+    connection.autocommit = True
+    return connection
+
+#Supported backends (config.ini [db] db_driver)
+# - connect: function returning a new connection
+# - connect_reader: function returning a new read only connection (one per thread) - None: reads
+#   use the same connection as writes
+# - shared_writer: All writes use ENGINE (with DB_LOCK) - otherwise each thread gets its own
+#   connection
+# - placeholder: Placeholder of the driver for "?" in the queries
+# - table_exist_query / columns_query: Catalog queries (parameter: table name)
+# - types / defaults: Replacements for column types and defaults of the scheme files
+# - auto_increment: Column option for "auto_increment": true
+BACKENDS = {
+    "sqlite": {
+        "connect": connect_sqlite,
+        "connect_reader": connect_sqlite_reader,
+        "shared_writer": True,
+        "placeholder": "?",
+        "table_exist_query": "SELECT name FROM sqlite_master WHERE type='table' AND name=?",
+        "columns_query": "SELECT name FROM pragma_table_info(?)",
+        "types": {},
+        "defaults": {},
+        "auto_increment": " AUTOINCREMENT"
+    },
+    "memory": {
+        "connect": connect_memory,
+        "connect_reader": None,
+        "shared_writer": True,
+        "placeholder": "?",
+        "table_exist_query": "SELECT name FROM sqlite_master WHERE type='table' AND name=?",
+        "columns_query": "SELECT name FROM pragma_table_info(?)",
+        "types": {},
+        "defaults": {},
+        "auto_increment": " AUTOINCREMENT"
+    },
+    "postgres": {
+        "connect": connect_postgres,
+        "connect_reader": None,
+        "shared_writer": False,
+        "placeholder": "%s",
+        "table_exist_query": """SELECT table_name FROM information_schema.tables
+                                WHERE table_schema = current_schema() AND table_name = ?""",
+        "columns_query": """SELECT column_name FROM information_schema.columns
+                            WHERE table_schema = current_schema() AND table_name = ?""",
+        #Timestamps are saved as text (like SQLite) - the program compares them as strings
+        #Epoch timestamps and byte counts don't fit in 32 bit
+        "types": {"datetime": "text", "integer": "bigint"},
+        "defaults": {"current_timestamp":
+                     "to_char(timezone('UTC', CURRENT_TIMESTAMP), 'YYYY-MM-DD HH24:MI:SS')"},
+        "auto_increment": " GENERATED BY DEFAULT AS IDENTITY"
+    }
+}
+
 def check_db():
     """This function is used to initialize the database.
 
@@ -38,7 +176,7 @@ def check_db():
         - True -> Success
         - False -> Failed
     """
-    global ENGINE
+    global ENGINE, BACKEND, DB_ERRORS
     global db_init
     logger.info("Init database...")
     logger.info("read config...")
@@ -48,79 +186,265 @@ def check_db():
         return False
 
     db_driver = config.get("db", "db_driver")
+    if db_driver == "postgresql":
+        db_driver = "postgres"
+
+    if db_driver == "mysql":
+        #Linebreak because of Pylint C0301
+        logger.error("""Currently MySQL is not supported :( -
+                     Use PostgreSQL (db_driver = postgres) or add a backend to BACKENDS
+                     in database_manager.py and create a PR <3)""")
+        return False
+    if db_driver not in BACKENDS:
+        logger.error("Currently only SQLite and PostgreSQL is supported :) - Please choose one ^^")
+        return False
+
+    logger.info("Selected DB Driver is %s", db_driver)
+    if db_driver == "postgres":
+        try:
+            import psycopg2 # pylint: disable=import-outside-toplevel
+        except ImportError:
+            logger.error("PostgreSQL needs the module psycopg2! - pip install psycopg2-binary")
+            return False
+        DB_ERRORS = (sqlite3.Error, psycopg2.Error)
+    else:
+        DB_ERRORS = (sqlite3.Error,)
+
+    #Connections of a previous init (e.g. other config) are not used anymore
+    close_db()
+    BACKEND = BACKENDS[db_driver]
     try:
-        if db_driver == "sqlite":
-            logger.info("Selected DB Driver is SQLite")
-            db_path = os.path.abspath(config.get("db", "db_path"))
-
-            #Not needed - SQLite creates a db file if it not exist
-            #if not os.path.exists(db_path):
-            #    logger.error("The given path %s does not exists!", db_path)
-            #    return False
-
-            #OLD SQL ALCHEMY CODE
-            #ENGINE = create_ENGINE(f"sqlite:///{db_path}")
-            #ENGINE.connect()
-            #logger.info("ENGINE created")
-            #db_init = True
-
-            #NEW SQLite Code
-            try:
-                ENGINE = sqlite3.connect(db_path, check_same_thread=False)
-                encoding = ENGINE.cursor()
-                encoding.execute('pragma encoding=UTF8')
-                ENGINE.commit()
-                db_init = True
-                logger.debug("DB initializied!")
-                return True
+        ENGINE = get_connection()
+        db_init = True
+        logger.debug("DB initializied!")
+        return True
+    except DB_ERRORS as e:
+        logger.error("Error while conencting to %s DB! - Error: %s", db_driver, e)
+        BACKEND = None
+        return False
 
-            except sqlite3.Error as e:
-                logger.error("Error while conencting to SQLite DB! - Error: %s", e)
-                return False
+def is_shared_connection(read_only:bool=False):
+    """ Is the connection used for reads / writes shared by all threads (ENGINE)? """
+    if read_only and BACKEND["connect_reader"] is not None:
+        return False
+    return BACKEND["shared_writer"]
+
+def get_connection(read_only:bool=False):
+    """ This function returns the connection for queries of the current thread.
+        - Writes use the shared writer connection (ENGINE) or the connection of the thread
+          (backend without shared_writer).
+        - Reads (read_only=True) use the read only connection of the thread. Backends without
+          reader connections use the same connection as writes.
+        Connections of a thread are opened on first use and reused for all its queries.
+
+        Return Value: Connection
+        - Raises DB_ERRORS if the connection can't be opened
+    """
+    global ENGINE # pylint: disable=global-statement
+    if BACKEND is None and not check_db():
+        raise sqlite3.OperationalError("Database is not initialized")
+    if is_shared_connection(read_only):
+        with DB_LOCK:
+            if ENGINE is None:
+                ENGINE = BACKEND["connect"]()
+            return ENGINE
+
+    kind = "reader" if read_only and BACKEND["connect_reader"] is not None else "connection"
+    connection_key = (threading.get_ident(), kind)
+    connection = getattr(THREAD_LOCAL, kind, None)
+    #Closed by close_db() if it isn't registered anymore
+    if connection is not None and THREAD_CONNECTIONS.get(connection_key) is connection:
+        return connection
+
+    connection = BACKEND["connect_reader" if kind == "reader" else "connect"]()
+    setattr(THREAD_LOCAL, kind, connection)
+    with CONNECTIONS_LOCK:
+        THREAD_CONNECTIONS[connection_key] = connection
+        #Close the connections of finished threads (e.g. download workers of the last run)
+        running_threads = {thread.ident for thread in threading.enumerate()}
+        finished_connections = [key for key in THREAD_CONNECTIONS
+                                if key[0] not in running_threads]
+        for key in finished_connections:
+            close_connection(THREAD_CONNECTIONS.pop(key))
+    return connection
+
+def close_connection(connection):
+    """ Close a connection and log errors """
+    try:
+        connection.close()
+    except DB_ERRORS as e:
+        logger.warning("Error while closing db connection - Error: %s", e)
+
+def close_db():
+    """ This function closes all connections (all threads) """
+    global ENGINE, db_init # pylint: disable=global-statement
+    with CONNECTIONS_LOCK:
+        connections = list(THREAD_CONNECTIONS.values())
+        THREAD_CONNECTIONS.clear()
+    if ENGINE is not None and ENGINE not in connections:
+        connections.append(ENGINE)
+    for connection in connections:
+        close_connection(connection)
+    #Other threads notice it on their next query (see get_connection()) and open a new one
+    ENGINE = None
+    db_init = False
+
+def connection_lock(read_only:bool=False):
+    """ Lock needed for queries on the connection of get_connection() (only shared connections) """
+    if is_shared_connection(read_only):
+        return DB_LOCK
+    return nullcontext()
+
+def prepare_query(query:str):
+    """ Replace the placeholders ("?") of a query with the placeholder of the backend """
+    if BACKEND["placeholder"] == "?":
+        return query
+    return query.replace("%", "%%").replace("?", BACKEND["placeholder"])
+
+@contextmanager
+def db_cursor(commit:bool=False):
+    """ Context manager to run queries (see get_connection()).
+        If commit=True the writer connection is used and the changes are committed after the
+        block. On errors all changes of the block are rolled back and the error is raised again.
+        Otherwise the reader connection of the current thread is used.
+
+        with db_cursor(commit=True) as cursor:
+            cursor.execute(prepare_query("UPDATE ... WHERE id = ?"), [row_id])
+    """
+    connection = get_connection(read_only=not commit)
+    with connection_lock(read_only=not commit):
+        cursor = connection.cursor()
+        try:
+            yield cursor
+            if commit:
+                connection.commit()
+        except DB_ERRORS:
+            connection.rollback()
+            raise
+        finally:
+            cursor.close()
+
+def execute_write(query:str, values:list, many:bool=False):
+    """ This function executes a write statement ("?" placeholders) and commits it.
+        While group commit is active (see group_commit()) the statement is passed to the writer
+        thread and the function waits until the transaction with it is committed.
+        many=True executes the statement for each entry of values (executemany).
+
+        Return Value: int - Number of changed rows
+        - Raises DB_ERRORS on SQL errors
+    """
+    with GROUP_COMMIT_LOCK:
+        write_queue = WRITE_QUEUE
+        if write_queue is not None and threading.current_thread() is not WRITER_THREAD:
+            future = Future()
+            write_queue.put((query, values, many, future))
+        else:
+            future = None
+    if future is not None:
+        return future.result()
 
-        elif db_driver == "mysql":
-            #Linebreak because of Pylint C0301
-            logger.error("""Currently MySQL is not supported :( -
-                         If you are able to use SQLAlchemy
-                         feel free to modify this file and create a PR <3)""")
-            return False
-        #    username = config.get("db", "db_user")
-        #    password = config.get("db", "db_pass")
-        #    hostname = config.get("db", "db_host")
-        #    database_name = config.get("db", "db_name")
-        #    ENGINE = create_ENGINE(f"mysql://{username}:{password}@{hostname}/{database_name}")
-        #    ENGINE.connect()
-        #    logger.info("ENGINE created")
-        #    db_init = True
-        #    return True
-        elif db_driver == "memory":
-            logger.info("Selected DB Driver is SQLite-Memory")
-
-            #OLD SQLALCHEMY Code
-            #ENGINE = create_ENGINE("sqlite://" ,
-            #        connect_args={'check_same_thread':False},
-            #        poolclass=StaticPool)
-            #ENGINE.connect()
-            #logger.info("ENGINE created")
-            #db_init = True
-            #return True
-            try:
-                ENGINE = sqlite3.connect("file::memory:?cache=shared")
-                encoding = ENGINE.cursor()
-                encoding.execute('pragma encoding=UTF8')
-                ENGINE.commit()
-                db_init = True
-                return True
-            except sqlite3.Error as e:
-                #Line Break because of PyLint best Practice (C0301)
-                logger.error("Error while creating in memory %s Database! - SQL Error: %s",
-                             db_driver, e)
+    with db_cursor(commit=True) as cursor:
+        if many:
+            cursor.executemany(prepare_query(query), values)
         else:
-            logger.error("Currently only SQLite and MySQL is supported :) - Please choose one ^^")
-    except sqlite3.Error as e:
-        logger.error("Error while initiating %s Database! - SQL Error: %s", db_driver, e)
-    return False
+            cursor.execute(prepare_query(query), values)
+        return cursor.rowcount
 
+def commit_write_batch(batch:list):
+    """ This function runs the write intents of batch in one transaction. Each write has its
+        own savepoint - a failing write is rolled back alone and only its caller gets the error.
+        The futures are resolved after the commit.
+    """
+    results = {}
+    connection = get_connection()
+    with connection_lock():
+        cursor = connection.cursor()
+        try:
+            cursor.execute("BEGIN")
+            for index, (query, values, many, future) in enumerate(batch):
+                cursor.execute("SAVEPOINT write_intent")
+                try:
+                    if many:
+                        cursor.executemany(prepare_query(query), values)
+                    else:
+                        cursor.execute(prepare_query(query), values)
+                    results[index] = cursor.rowcount
+                except DB_ERRORS as e:
+                    cursor.execute("ROLLBACK TO SAVEPOINT write_intent")
+                    future.set_exception(e)
+                cursor.execute("RELEASE SAVEPOINT write_intent")
+            cursor.execute("COMMIT")
+        except DB_ERRORS as e:
+            logger.error("Error while committing %i writes! - Error: %s", len(batch), e)
+            connection.rollback()
+            for _, _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            cursor.close()
+    observe("ytdl_db_group_commit_writes", len(batch))
+    for index, result in results.items():
+        batch[index][3].set_result(result)
+
+def _group_commit_loop(write_queue:queue.Queue, delay:float, max_writes:int):
+    running = True
+    while running:
+        intent = write_queue.get()
+        if intent is None:
+            break
+        batch = [intent]
+        #Collect the writes of the other threads for "delay" seconds (or max_writes)
+        commit_at = time.monotonic() + delay
+        while len(batch) < max_writes:
+            try:
+                intent = write_queue.get(timeout=max(commit_at - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            if intent is None:
+                running = False
+                break
+            batch.append(intent)
+        commit_write_batch(batch)
+
+@contextmanager
+def group_commit(delay_ms:int=5, max_writes:int=100):
+    """ Context manager to commit the writes of parallel threads together. Inside the block all
+        writes (insert_value(), update_value(), ...) of all threads are passed to one writer
+        thread. It commits them in one transaction every delay_ms milliseconds (or after
+        max_writes writes). Each caller waits until its write is committed.
+        Blocks can be nested - the writer stops after the last block.
+
+        with group_commit():
+            with ThreadPoolExecutor(...) as executor:
+                ...
+    """
+    global WRITE_QUEUE, WRITER_THREAD, GROUP_COMMIT_USERS # pylint: disable=global-statement
+    with GROUP_COMMIT_LOCK:
+        GROUP_COMMIT_USERS += 1
+        if WRITE_QUEUE is None:
+            WRITE_QUEUE = queue.Queue()
+            WRITER_THREAD = threading.Thread(target=_group_commit_loop,
+                                             args=(WRITE_QUEUE, max(delay_ms, 0) / 1000,
+                                                   max(max_writes, 1)),
+                                             daemon=True, name="db-writer")
+            WRITER_THREAD.start()
+            logger.debug("Group commit started (%i ms / %i writes)", delay_ms, max_writes)
+    try:
+        yield
+    finally:
+        writer_thread = None
+        with GROUP_COMMIT_LOCK:
+            GROUP_COMMIT_USERS -= 1
+            if GROUP_COMMIT_USERS == 0:
+                #Writes queued before None are still committed
+                WRITE_QUEUE.put(None)
+                WRITE_QUEUE = None
+                writer_thread = WRITER_THREAD
+        if writer_thread is not None:
+            writer_thread.join()
+
+@timed_function("db.check_table")
 def check_table_exist(table_name:str):
     """ This function checks if the passed table name exists in the database
 
@@ -147,19 +471,26 @@ def check_table_exist(table_name:str):
         if not init:
             return False
 
-    cursor = ENGINE.cursor()
-
     try:
-        table_exist = cursor.execute("""SELECT name FROM sqlite_master WHERE type='table'
-                            AND name=?; """, [table_name]).fetchall()
+        with db_cursor() as cursor:
+            cursor.execute(prepare_query(BACKEND["table_exist_query"]), [table_name])
+            table_exist = cursor.fetchall()
 
         if table_exist == []:
             return False
         return True
-    except sqlite3.Error as e:
+    except DB_ERRORS as e:
         logger.error("Error while checking for table! - Error: %s",e)
         return False
 
+def get_column_type(column_type:str):
+    """ Return the type of the backend for a column type of a scheme file """
+    return BACKEND["types"].get(column_type.lower(), column_type)
+
+def get_column_default(default:str):
+    """ Return the default of the backend for a column default of a scheme file """
+    return BACKEND["defaults"].get(default.lower(), default)
+
 def prepare_sql_create_statement(name, scheme):
     """ This function is used to create tables based on a defined json scheme.
         Check documentation for help
@@ -188,7 +519,7 @@ def prepare_sql_create_statement(name, scheme):
             logger.error("""Error while creating table! -
                          Column %s does not include a valid \"type\" field!""", column_name)
             return None
-        c_query += " " + options["type"]
+        c_query += " " + get_column_type(options["type"])
 
         if "not_null" in options and options["not_null"] is True:
             c_query += " NOT NULL"
@@ -203,13 +534,13 @@ def prepare_sql_create_statement(name, scheme):
                            Please check config. Ignore Primary Key %s""", column_name)
 
         if "auto_increment" in options and options["auto_increment"] is True:
-            c_query += " AUTOINCREMENT"
+            c_query += BACKEND["auto_increment"]
 
         if "unique" in options and options["unique"] is True:
             c_query += " UNIQUE"
 
         if "default" in options:
-            c_query += " DEFAULT " + options["default"]
+            c_query += " DEFAULT " + get_column_default(options["default"])
 
         query += c_query + ", "
     query = query[:-2]
@@ -235,7 +566,7 @@ def prepare_sql_add_column_statement(table_name, column_name, options):
                      Column %s does not include a valid \"type\" field!""", column_name)
         return None
     c_query:str = ""
-    c_query += " " + options["type"]
+    c_query += " " + get_column_type(options["type"])
     if "not_null" in options and options["not_null"] is True and "default" in options and options["default"] != "":
         c_query += " NOT NULL"
     if "primary_key" in options and options["primary_key"] is True:
@@ -245,7 +576,7 @@ def prepare_sql_add_column_statement(table_name, column_name, options):
     if "unique" in options and options["unique"] is True:
         c_query += " UNIQUE"
     if "default" in options:
-        c_query += " DEFAULT " + options["default"]
+        c_query += " DEFAULT " + get_column_default(options["default"])
     query += c_query + ", "
     query = query[:-2]
     query +=";"
@@ -293,9 +624,8 @@ def create_table(name:str, scheme:json):
     #    return False
 
     try:
-        cursor = ENGINE.cursor()
-        cursor.execute(query)
-        ENGINE.commit()
+        with db_cursor(commit=True) as cursor:
+            cursor.execute(query)
 
         table_exist = check_table_exist(name)
 
@@ -305,10 +635,28 @@ def create_table(name:str, scheme:json):
                          After creating table does not exist!""", name)
             return False
         return True
-    except sqlite3.Error as e:
+    except DB_ERRORS as e:
         logger.error("Error while creating table %s Error: %s", name, e)
         return False
 
+def create_index(table_name:str, index_name:str, columns:list, unique:bool=False):
+    """ This function creates an index on the passed columns of a table (if it does not exist)
+
+        Return Values:bool
+        - true -> Success (Index exists)
+        - false -> Failed
+    """
+    query = (f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {index_name} "
+             f"ON {table_name} ({', '.join(columns)})")
+    try:
+        with db_cursor(commit=True) as cursor:
+            cursor.execute(query)
+        return True
+    except DB_ERRORS as e:
+        logger.error("Error while creating index %s on table %s Error: %s", index_name,
+                     table_name, e)
+        return False
+
 def check_scheme_match(table_name: str, scheme:json):
     """ 
     This function is used to check if a given (existing) table is matching a given scheme (it checks if all columns of the scheme actually existing inside the db table)
@@ -324,37 +672,108 @@ def check_scheme_match(table_name: str, scheme:json):
         logger.warning("Table %s does not exist! - Can't check if the table matches a scheme...", table_name)
         return False
     
-    #Fetch all rows of the table
-    cursor = cursor = ENGINE.cursor()
-    cursor.execute("SELECT * from " + table_name)
-    ENGINE.commit()
-
-    names = list(map(lambda x: x[0], cursor.description))
+    #Fetch all column names of the table (without reading any row)
+    try:
+        with db_cursor() as cursor:
+            cursor.execute(prepare_query(BACKEND["columns_query"]), [table_name])
+            names = [column[0] for column in cursor.fetchall()]
+    except DB_ERRORS as e:
+        logger.error("Error while reading columns of table %s Error: %s", table_name, e)
+        return False
 
     missing_columns:list = []
-    
+
     for needed_column in scheme:
         if not needed_column in names:
-            print(needed_column)
-            print("Is missing")
+            logger.info("Column %s is missing in table %s", needed_column, table_name)
             missing_columns.append(needed_column)
-    
+
     if len(missing_columns) > 0:
         logger.info("Table %s misses %i columns. Add missing columns...", table_name, len(missing_columns))
         for missing_column in missing_columns:
             try:
                 sql_statement = prepare_sql_add_column_statement(table_name, missing_column, scheme[missing_column])
-                cursor = cursor = ENGINE.cursor()
-                cursor.execute(sql_statement)
-                ENGINE.commit()
-                return True
-            except sqlite3.Error as e:
+                with db_cursor(commit=True) as cursor:
+                    cursor.execute(sql_statement)
+            except DB_ERRORS as e:
                 logger.error("Error while adding column %s to table %s Error: %s", missing_column, table_name, e)
                 return False
+        return True
     else:
         logger.info("Table %s is up to date...", table_name)
         return True
 
+def prepare_sql_conditions(conditions:dict|list):
+    """ This function creates the WHERE part of a statement and the values that need to be
+        bound to it. A dict is one condition set (all keys must match - AND), a list of dicts
+        matches if one of the sets matches (OR). {"column_name": "desired_value"}
+        The value IS_NULL / NOT_NULL checks for NULL, a list or tuple of values matches if the
+        column has one of them (IN).
+
+        Return Values: tuple
+            - (conditions_part, values) -> conditions_part is "" if there are no conditions
+    """
+    values = []
+    if isinstance(conditions, dict):
+        conditions = [conditions]
+    elif not isinstance(conditions, list):
+        if conditions is not None:
+            logger.error("""Unsupported type for conditions! -
+                         Conditions will be ignored! - Type: %s""", type(conditions))
+        return "", values
+
+    condition_sets = []
+    for condition_set in conditions:
+        #Iterate over all conditions
+        condition_parts = []
+        for condition in condition_set:
+            value = condition_set[condition]
+            if value is IS_NULL:
+                condition_parts.append(condition + " IS NULL")
+            elif value is NOT_NULL:
+                condition_parts.append(condition + " IS NOT NULL")
+            elif isinstance(value, (list, tuple)):
+                if not value:
+                    #Nothing can match an empty list
+                    condition_parts.append("1 = 0")
+                    continue
+                condition_parts.append(condition + " IN (" + ",".join("?" * len(value)) + ")")
+                values.extend(value)
+            else:
+                condition_parts.append(condition + "= ?")
+                values.append(value)
+        condition_sets.append(" AND ".join(condition_parts))
+    return " OR ".join(condition_sets), values
+
+def prepare_sql_select_statement(table:str, conditions:dict|list=None,
+                                 data_filter:dict|list = None, extra_sql=None):
+    """ This function is used to create a SELECT statement and the values that need to be bound
+        to it. It is used by fetch_value() and fetch_value_iter()
+
+        Return Values: tuple
+            - (query, values)
+    """
+    #create SELECT query
+    if data_filter is not None:
+        query_filter = ""
+        for element in data_filter:
+            query_filter += element + ","
+        query_filter = query_filter[:-1]
+    else:
+        query_filter = "*"
+
+    query = f"SELECT {query_filter} from {table} "
+    #Create filter
+    conditions_part, values = prepare_sql_conditions(conditions)
+    if conditions_part:
+        query += " WHERE " + conditions_part
+
+    if extra_sql is not None:
+        query = query + " " + extra_sql
+    return query, values
+
+@timed_function("db.fetch")
+@observed("ytdl_db_query_seconds", {"operation": "fetch"})
 def fetch_value(table:str, conditions:dict|list=None, data_filter:dict|list = None,
                 is_unique=False, extra_sql=None):
     """ Fetch a value from a database based on a json filter {""} """
@@ -369,15 +788,6 @@ def fetch_value(table:str, conditions:dict|list=None, data_filter:dict|list = No
         logger.warning("Table %s does not exist!", table)
         return False
 
-    #create SELECT query
-    if data_filter is not None:
-        query_filter = ""
-        for element in data_filter:
-            query_filter += element + ","
-        query_filter = query_filter[:-1]
-    else:
-        query_filter = "*"
-
     #OLD SQLALCHEMY CODE
     #query = F"SELECT {query_filter} from {table} WHERE {row_name} = \"{value}\""
     #logger.debug(f"Prepared Query: {query}")
@@ -393,51 +803,62 @@ def fetch_value(table:str, conditions:dict|list=None, data_filter:dict|list = No
     #except Exception as e:
     #    logger.error(f"Error while executing Insert Statement! - Error: {e}")
     #    return False
-    values = []
-    query = f"SELECT {query_filter} from {table} "
-    #Create filter
-    conditions_part = ""
-    if conditions is not None:
-        if isinstance(conditions, dict):
-            query += " WHERE "
-            for condition in conditions:
-                conditions_part += condition + "= ? AND "
-                values.append(conditions[condition])
-            conditions_part = conditions_part[:-5]
-        elif isinstance(conditions, list):
-            query += " WHERE "
-            for condition_set in conditions:
-                #Iterate over all conditions
-                for condition in condition_set:
-                    conditions_part += condition + "= ? AND "
-                    values.append(condition_set[condition])
-                conditions_part = conditions_part[:-5]
-                conditions_part += " OR "
-            conditions_part = conditions_part[:-4]
-        else:
-            logging.error("""Unsupported type for conditions! -
-                          Conditions will be ignored! - Type: %s""", type(conditions))
-
+    query, values = prepare_sql_select_statement(table, conditions, data_filter, extra_sql)
 
-    query = query + conditions_part
-
-    if extra_sql is not None:
-        query = query + " " + extra_sql
-
-    logging.debug("Prepared Query: %s \n data: %s", query, values)
-    cursor = ENGINE.cursor()
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Prepared Query: %s \n data: %s", query, shorten(values))
     try:
-        data = cursor.execute(query, values)
-        if not is_unique:
-            return data.fetchall()
-        return data.fetchone()
-    except sqlite3.Error as e:
+        with db_cursor() as cursor:
+            cursor.execute(prepare_query(query), values)
+            if not is_unique:
+                return cursor.fetchall()
+            return cursor.fetchone()
+    except DB_ERRORS as e:
         logger.error("Error while fetching value from table %s SQL Error: %s", table, e)
         return False
     except TypeError as e:
         logging.error("Error while fetching Value. Unexcepted type received! - Error: %s", e)
         return False
 
+def fetch_value_iter(table:str, conditions:dict|list=None, data_filter:dict|list = None,
+                     extra_sql=None, batch_size:int=1000):
+    """ This function works like fetch_value() but does not load the whole result into memory.
+        The rows are streamed from the database in batches of "batch_size" rows.
+        Use it for big tables (e.g. items) if you need to iterate over all rows.
+
+        The cursor used here is not shared with other functions. So it is safe to call
+        other database functions while iterating.
+
+        Yield Values:
+            - row (tuple) -> One row per iteration. Nothing is yielded on error (check log)
+    """
+    if not db_init:
+        init = check_db()
+        if not init:
+            logger.error("Error while initializing db!")
+            return
+
+    if not check_table_exist(table):
+        logger.warning("Table %s does not exist!", table)
+        return
+
+    query, values = prepare_sql_select_statement(table, conditions, data_filter, extra_sql)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Prepared streaming Query: %s \n data: %s", query, shorten(values))
+    cursor = get_connection(read_only=True).cursor()
+    try:
+        with timed("db.fetch_batch"), connection_lock(read_only=True):
+            cursor.execute(prepare_query(query), values)
+            rows = cursor.fetchmany(batch_size)
+        while rows:
+            yield from rows
+            with timed("db.fetch_batch"), connection_lock(read_only=True):
+                rows = cursor.fetchmany(batch_size)
+    except DB_ERRORS as e:
+        logger.error("Error while streaming values from table %s SQL Error: %s", table, e)
+    finally:
+        cursor.close()
+
 #Pylint C0301
 def fetch_value_as_bool(table:str, conditions:dict|list=None,
                         data_filter:list = None, is_unique=False):
@@ -459,10 +880,12 @@ def fetch_value_as_bool(table:str, conditions:dict|list=None,
             logger.error("""Error while converting fetched \"%s\" value to bool! -
                          Unsupported type %s""", value, type(value))
         return False
-    except sqlite3.Error as e:
+    except DB_ERRORS as e:
         logger.error("Error while fetching data from DB! - Error %s", e)
         return False
 
+@timed_function("db.insert")
+@observed("ytdl_db_query_seconds", {"operation": "insert"})
 def insert_value(table:str, data:dict):
     """Insert a value into a given table.
         Data are passed as JSON with the following format:
@@ -512,24 +935,75 @@ def insert_value(table:str, data:dict):
     #    return False
 
     try:
-        cursor = ENGINE.cursor()
         len_data = len(data)
         value_placeholder = ""
         for _ in range(len_data):
             value_placeholder += "?,"
         value_placeholder = value_placeholder[:-1]
         query = f"Insert into  {table} ({keys}) VALUES ({value_placeholder})"
-        logging.debug(query)
-        cursor.execute(query, values)
-        ENGINE.commit()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Prepared Query: %s \n data: %s", query, shorten(values))
+        execute_write(query, values)
         #Maybe a check if all data are inserted will be added in the future
         #by adding a select statement (call fetch function)
         return True
-    except sqlite3.Error as e:
+    except DB_ERRORS as e:
         logger.error("Error while inserting value in table %s SQL Error: %s", table, e)
-        logger.error("Statemet: Insert into  %s (%s) VALUES (?), %s", table, keys, values)
+        logger.error("Statemet: Insert into  %s (%s) VALUES (?), %s", table, keys, shorten(values))
         return False
 
+@timed_function("db.insert")
+@observed("ytdl_db_query_seconds", {"operation": "insert"})
+def insert_values(table:str, keys:list, rows:list):
+    """Insert many rows into a given table with one commit. Each row is a tuple/list with the
+        values in the order of keys.
+
+        Return Values:bool
+        - True -> Success
+        - False -> Failed (no row is inserted)
+    """
+    if not rows:
+        return True
+    query = f"Insert into  {table} ({','.join(keys)}) VALUES ({','.join('?' * len(keys))})"
+    try:
+        execute_write(query, rows, many=True)
+        return True
+    except DB_ERRORS as e:
+        logger.error("Error while inserting %i values in table %s SQL Error: %s",
+                     len(rows), table, e)
+        return False
+
+@timed_function("db.insert")
+@observed("ytdl_db_query_seconds", {"operation": "upsert"})
+def upsert_values(table:str, keys:list, rows:list, conflict_keys:list, update_existing:bool=True):
+    """Insert many rows into a given table with one commit. If a row with the same values in
+        conflict_keys (needs a unique index) exists, its other keys are updated instead
+        (update_existing=False: the existing row is kept as it is).
+        Each row is a tuple/list with the values in the order of keys.
+
+        Return Values:bool
+        - True -> Success
+        - False -> Failed (no row is inserted / updated)
+    """
+    if not rows:
+        return True
+    update_keys = [key for key in keys if key not in conflict_keys] if update_existing else []
+    query = (f"Insert into  {table} ({','.join(keys)}) VALUES ({','.join('?' * len(keys))}) "
+             f"ON CONFLICT ({','.join(conflict_keys)}) DO ")
+    if update_keys:
+        query += "UPDATE SET " + ", ".join(f"{key} = excluded.{key}" for key in update_keys)
+    else:
+        query += "NOTHING"
+    try:
+        execute_write(query, rows, many=True)
+        return True
+    except DB_ERRORS as e:
+        logger.error("Error while upserting %i values in table %s SQL Error: %s",
+                     len(rows), table, e)
+        return False
+
+@timed_function("db.delete")
+@observed("ytdl_db_query_seconds", {"operation": "delete"})
 def delete_value(table:str, conditions: dict|list, delete_all_content=False):
     """ Delete a value from db. Conditions are passed as json with columnname as key
         and column value as value
@@ -539,38 +1013,28 @@ def delete_value(table:str, conditions: dict|list, delete_all_content=False):
         - False -> Failed
     """
     logging.debug("Remove from table %s", table)
+    values = []
     if not delete_all_content:
-        query = f"DELETE FROM {table} WHERE "
-        conditions_part = ""
-
-        if isinstance(conditions, dict):
-            for condition in conditions:
-                conditions_part += condition + f"=\"{conditions[condition]}\" AND "
-            conditions_part = conditions_part[:-5]
-        elif isinstance(conditions, list):
-            for condition_set in conditions:
-                #Iterate over all conditions
-                for condition in condition_set:
-                    conditions_part += condition + f"=\"{condition_set[condition]}\" AND "
-                conditions_part = conditions_part[:-5]
-                conditions_part += " OR "
-            conditions_part = conditions_part[:-4]
-        query = query + conditions_part
+        conditions_part, values = prepare_sql_conditions(conditions)
+        if not conditions_part:
+            logger.error("No conditions passed! - Nothing is deleted from table %s", table)
+            return False
+        query = f"DELETE FROM {table} WHERE " + conditions_part
     else:
         query = f"DELETE FROM {table}"
     try:
-        cursor = ENGINE.cursor()
-        cursor.execute(query)
-        ENGINE.commit()
+        execute_write(query, values)
 
         #Maybe a check if all data are inserted will be added in the future
         #by adding a select statement (call fetch function)
         return True
-    except sqlite3.Error as e:
+    except DB_ERRORS as e:
         logger.error("Error while deleting value from table %s SQL Error: %s", table, e)
         logger.error("Statemet: %s", query)
         return False
 
+@timed_function("db.update")
+@observed("ytdl_db_query_seconds", {"operation": "update"})
 def update_value(table:str, data:dict, conditions:dict|list, extra_sql:str=None):
     """ This function updates a table based on the passed data
 
@@ -591,11 +1055,9 @@ def update_value(table:str, data:dict, conditions:dict|list, extra_sql:str=None)
 
     for data_set in data:
         if isinstance(data[data_set], int):
-            logging.debug("Key %s is an int", data_set)
             query += data_set + "= ?"
             values.append(data[data_set])
         elif isinstance(data[data_set], (dict, list)):
-            logging.debug("Key %s is a dict or list", data_set)
             try:
                 json_data = json.dumps(data[data_set])
 
@@ -606,7 +1068,6 @@ def update_value(table:str, data:dict, conditions:dict|list, extra_sql:str=None)
                 return False
         elif isinstance(data[data_set], str):
             #try to convert to json
-            logging.debug("Key %s is a str", data_set)
             query += data_set + "= ?"
             values.append(data[data_set])
         else:
@@ -616,38 +1077,58 @@ def update_value(table:str, data:dict, conditions:dict|list, extra_sql:str=None)
         query += ", "
     query = query[:-2]
 
-    conditions_part = ""
-    if isinstance(conditions, dict):
-        query += " WHERE "
-        for condition in conditions:
-            conditions_part += condition + f"=\"{conditions[condition]}\" AND "
-        conditions_part = conditions_part[:-5]
-    elif isinstance(conditions, list):
-        query += " WHERE "
-        for condition_set in conditions:
-            #Iterate over all conditions
-            for condition in condition_set:
-                conditions_part += condition + f"=\"{condition_set[condition]}\" AND "
-            conditions_part = conditions_part[:-5]
-            conditions_part += " OR "
-        conditions_part = conditions_part[:-4]
-    else:
-        logging.error("Unsupported type for conditions! - Condition will be ignored! - Type: %s",
-                      type(conditions))
-    query = query + conditions_part + ";"
-    logger.debug("Prepared Query: %s ", query)
-    logger.debug("Data %s", values)
+    conditions_part, condition_values = prepare_sql_conditions(conditions)
+    if conditions_part:
+        query += " WHERE " + conditions_part
+    values.extend(condition_values)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Prepared Query: %s \n data: %s", query, shorten(values))
     if extra_sql is not None:
         query += " " + extra_sql
     try:
-        cursor = ENGINE.cursor()
-        cursor.execute(query, values)
-        ENGINE.commit()
+        execute_write(query, values)
 
         #Maybe a check if all data are inserted will be added in the future
         #by adding a select statement (call fetch function)
         return True
-    except sqlite3.Error as e:
+    except DB_ERRORS as e:
         logger.error("Error while updateing value in table %s SQL Error: %s", table, e)
         logger.error("Statement: %s", query)
         return False
+
+@timed_function("db.update")
+@observed("ytdl_db_query_seconds", {"operation": "update"})
+def update_value_if(table:str, data:dict, condition:str, condition_values:list=None):
+    """ This function updates all rows matching a parameterized condition and returns the
+        number of changed rows. The check and the update are one statement - so it can be used
+        to claim rows (compare and set) even if several processes share the db.
+
+        update_value_if("download_jobs", {"state": "running"}, "id = ? AND state = ?",
+                        [job_id, "queued"])
+
+        Return Value: int|None
+        - Number of updated rows (0 -> condition didn't match (anymore))
+        - None -> SQL Error
+    """
+    values = []
+    assignments = []
+    for column, value in data.items():
+        if isinstance(value, (dict, list)):
+            value = json.dumps(value)
+        elif value is not None and not isinstance(value, (int, float, str)):
+            logger.info("Type %s is not supported by update_value_if()! - Ignore value %s...",
+                        type(value), column)
+            continue
+        assignments.append(column + " = ?")
+        values.append(value)
+
+    query = f"UPDATE {table} SET {', '.join(assignments)} WHERE {condition}"
+    values.extend(condition_values or [])
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Prepared Query: %s \n data: %s", query, shorten(values))
+    try:
+        return execute_write(query, values)
+    except DB_ERRORS as e:
+        logger.error("Error while updateing value in table %s SQL Error: %s", table, e)
+        logger.error("Statement: %s", query)
+        return None
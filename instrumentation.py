@@ -0,0 +1,307 @@
+#!/usr/bin/env python
+"""
+#
+# Project by j54j6
+# This file provides a small timing instrumentation used to find out where time goes
+# (download pipeline, db, hashing...). It is disabled by default - timed() returns a no-op
+# context manager until enable_timings() is called (CLI option --timings).
+# It also contains the profiling hooks (CLI options --profile and --profile-items).
+#
+"""
+
+#Python modules
+import os
+import json
+import math
+import time
+import heapq
+import itertools
+import logging
+import threading
+import functools
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+# init logger
+logger = logging.getLogger(__name__)
+
+#Switch for the whole module - set by enable_timings()
+ENABLED:bool = False
+
+#Shared no-op context manager returned by timed() if timings are disabled
+NO_TIMER = nullcontext()
+
+#All samples of the current run {"stage": [seconds, ...]}
+RUN_SAMPLES:dict = {}
+
+#Finished items [{"item": "<<name>>", "total": seconds, "stages": {summary}}]
+ITEM_REPORTS:list = []
+
+#Lock for RUN_SAMPLES and ITEM_REPORTS (downloads can run in multiple threads)
+SAMPLES_LOCK = threading.Lock()
+
+#Samples of the item (download) the current thread is working on
+CURRENT_ITEM = threading.local()
+
+#Number of slowest items that are profiled (CLI option --profile-items) - 0 = disabled
+ITEM_PROFILE_LIMIT:int = 0
+
+#Profiles of the slowest items - min heap [(seconds, counter, "<<name>>", profiler)]
+SLOWEST_ITEMS:list = []
+ITEM_COUNTER = itertools.count()
+
+#Only one cProfile profiler can be active at a time (Python 3.12+ raises a ValueError, older
+#versions replace the active one) - held by profile_call() and profiled_item()
+PROFILER_LOCK = threading.Lock()
+
+#Supported modes of profile_call()
+PROFILE_MODES = ["cprofile", "tracemalloc"]
+
+def enable_timings():
+    """ Enable the timing of all stages for this run """
+    global ENABLED # pylint: disable=global-statement
+    ENABLED = True
+    logger.info("Timings enabled - A report is created at the end of the run")
+
+def timed(stage:str):
+    """ Context manager to measure the time of a stage.
+
+        with timed("get_metadata"):
+            ...
+    """
+    if not ENABLED:
+        return NO_TIMER
+    return _measure(stage)
+
+def timed_function(stage:str):
+    """ Decorator to measure every call of a function as stage """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            with _measure(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+@contextmanager
+def _measure(stage:str):
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_sample(stage, time.perf_counter() - start_time)
+
+def add_sample(stage:str, duration:float):
+    """ Add a measured duration (in seconds) to the run and to the current item (if any) """
+    with SAMPLES_LOCK:
+        RUN_SAMPLES.setdefault(stage, []).append(duration)
+
+    item_samples = getattr(CURRENT_ITEM, "samples", None)
+    if item_samples is not None:
+        item_samples.setdefault(stage, []).append(duration)
+
+@contextmanager
+def timed_item(name:str):
+    """ Context manager to group all stages of one item (e.g. one download).
+        If the item is finished a summary is logged and added to the report.
+    """
+    if not ENABLED:
+        yield
+        return
+
+    CURRENT_ITEM.samples = {}
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        total = time.perf_counter() - start_time
+        item_summary = summarize(CURRENT_ITEM.samples)
+        CURRENT_ITEM.samples = None
+        with SAMPLES_LOCK:
+            ITEM_REPORTS.append({"item": name, "total": round(total, 6), "stages": item_summary})
+        logger.info("Timings for %s: %.3fs total - %s", name, total,
+                    ", ".join(f"{stage}: {values['total']:.3f}s"
+                              for stage, values in item_summary.items()))
+
+def percentile(values:list, percent:float):
+    """ Return the percentile (nearest rank) of a sorted list """
+    if not values:
+        return 0.0
+    rank = max(math.ceil(percent / 100 * len(values)) - 1, 0)
+    return values[rank]
+
+def summarize(samples:dict):
+    """ Create a summary (count, total, p50, p95, max) per stage
+
+        Return Value: dict
+        {
+            "<<stage>>": {"count": 0, "total": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+        }
+    """
+    summary = {}
+    for stage in sorted(samples):
+        values = sorted(samples[stage])
+        summary[stage] = {
+            "count": len(values),
+            "total": round(sum(values), 6),
+            "p50": round(percentile(values, 50), 6),
+            "p95": round(percentile(values, 95), 6),
+            "max": round(values[-1], 6) if values else 0.0
+        }
+    return summary
+
+def write_report(path:str):
+    """ Log the summary of the run and save it (including all items) as json file
+        in the given folder.
+
+        Return Value: str|None
+        - str -> path of the report
+        - None -> Timings disabled or error while writing the file
+    """
+    if not ENABLED:
+        return None
+
+    with SAMPLES_LOCK:
+        run_summary = summarize(RUN_SAMPLES)
+        items = list(ITEM_REPORTS)
+
+    logger.info("Timings of this run (seconds):")
+    for stage, values in run_summary.items():
+        logger.info("%-24s count: %6i total: %9.3f p50: %8.4f p95: %8.4f max: %8.4f", stage,
+                    values["count"], values["total"], values["p50"], values["p95"], values["max"])
+
+    report_path = os.path.join(os.path.abspath(path),
+                               "timings_" + datetime.now().strftime("%Y%m%d_%H%M%S") + ".json")
+    try:
+        with open(report_path, 'w', encoding="utf-8") as report_file:
+            json.dump({"created": datetime.now().isoformat(timespec="seconds"),
+                       "run": run_summary, "items": items}, report_file, indent=4)
+    except OSError as e:
+        logger.error("Error while writing timing report %s - Error: %s", report_path, e)
+        return None
+    logger.info("Timing report saved to %s", report_path)
+    return report_path
+
+def profile_call(func, mode:str, path:str, name:str, top_n:int=30):
+    """ Run func with a profiler and save the result in the folder "path".
+        - cprofile -> <<name>>_<<date>>.pstats (open with pstats / snakeviz)
+        - tracemalloc -> <<name>>_<<date>>.tracemalloc (tracemalloc.Snapshot.load())
+        A summary of the top_n entries is saved as <<name>>_<<date>>.txt
+
+        Return Value: The return value of func
+    """
+    #Profilers are only needed with --profile - don't import them on every start
+    import cProfile # pylint: disable=import-outside-toplevel
+    import tracemalloc # pylint: disable=import-outside-toplevel
+
+    file_prefix = os.path.join(os.path.abspath(path),
+                               name + "_" + datetime.now().strftime("%Y%m%d_%H%M%S"))
+    if mode == "tracemalloc":
+        tracemalloc.start(25)
+        try:
+            result = func()
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            try:
+                snapshot.dump(file_prefix + ".tracemalloc")
+                with open(file_prefix + ".txt", 'w', encoding="utf-8") as summary_file:
+                    summary_file.write(f"Top {top_n} allocations (by line):\n")
+                    for statistic in snapshot.statistics("lineno")[:top_n]:
+                        summary_file.write(str(statistic) + "\n")
+                logger.info("Allocation snapshot saved to %s.tracemalloc", file_prefix)
+            except OSError as e:
+                logger.error("Error while saving allocation snapshot - Error: %s", e)
+        return result
+
+    profiler = cProfile.Profile()
+    try:
+        #Downloads are not profiled on their own (profiled_item()) - they are part of this profile
+        with PROFILER_LOCK:
+            result = profiler.runcall(func)
+    finally:
+        try:
+            profiler.dump_stats(file_prefix + ".pstats")
+            _write_profile_summary(profiler, file_prefix + ".txt", top_n)
+            logger.info("Profile saved to %s.pstats", file_prefix)
+        except OSError as e:
+            logger.error("Error while saving profile - Error: %s", e)
+    return result
+
+def _write_profile_summary(profiler, path:str, top_n:int, title:str=None):
+    import pstats # pylint: disable=import-outside-toplevel
+    with open(path, 'a', encoding="utf-8") as summary_file:
+        if title is not None:
+            summary_file.write(title + "\n")
+        stats = pstats.Stats(profiler, stream=summary_file)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top_n)
+
+def enable_item_profiling(limit:int):
+    """ Profile every download and keep the profiles of the "limit" slowest ones """
+    global ITEM_PROFILE_LIMIT # pylint: disable=global-statement
+    ITEM_PROFILE_LIMIT = limit
+    logger.info("Profiling of the %i slowest downloads enabled", limit)
+
+@contextmanager
+def profiled_item(name:str):
+    """ Context manager to profile one item (e.g. one download) if item profiling is enabled.
+        Only the profiles of the slowest items are kept in memory.
+        The item is not profiled if another profiler is active (--profile or a parallel download).
+        Errors of the profiler are logged - they never reach the profiled code.
+    """
+    if not ITEM_PROFILE_LIMIT or not PROFILER_LOCK.acquire(blocking=False):
+        yield
+        return
+
+    try:
+        import cProfile # pylint: disable=import-outside-toplevel
+        profiler = cProfile.Profile()
+        profiler.enable()
+    except ValueError as e:
+        #Another profiling tool (e.g. a debugger) is active
+        PROFILER_LOCK.release()
+        logger.debug("Can't profile %s - Error: %s", name, e)
+        yield
+        return
+
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        PROFILER_LOCK.release()
+        entry = (time.perf_counter() - start_time, next(ITEM_COUNTER), name, profiler)
+        with SAMPLES_LOCK:
+            if len(SLOWEST_ITEMS) < ITEM_PROFILE_LIMIT:
+                heapq.heappush(SLOWEST_ITEMS, entry)
+            else:
+                heapq.heappushpop(SLOWEST_ITEMS, entry)
+
+def write_item_profiles(path:str, top_n:int=30):
+    """ Save the profiles of the slowest items as one summary (txt) and one .pstats file per item
+        in the folder "path".
+
+        Return Value: str|None
+        - str -> path of the summary
+        - None -> Item profiling disabled / nothing profiled / error while writing
+    """
+    with SAMPLES_LOCK:
+        slowest_items = sorted(SLOWEST_ITEMS, reverse=True)
+    if not slowest_items:
+        return None
+
+    file_prefix = os.path.join(os.path.abspath(path),
+                               "profile_items_" + datetime.now().strftime("%Y%m%d_%H%M%S"))
+    try:
+        for rank, (duration, _, name, profiler) in enumerate(slowest_items, start=1):
+            profiler.dump_stats(f"{file_prefix}_{rank}.pstats")
+            _write_profile_summary(profiler, file_prefix + ".txt", top_n,
+                                   f"#{rank} {name} - {duration:.3f}s ({file_prefix}_{rank}.pstats)")
+    except OSError as e:
+        logger.error("Error while saving item profiles - Error: %s", e)
+        return None
+    logger.info("Profiles of the %i slowest downloads saved to %s.txt", len(slowest_items),
+                file_prefix)
+    return file_prefix + ".txt"
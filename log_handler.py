@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+
+"""
+#
+# Project by j54j6
+# This file provides the logging setup (level, rotating log file) and some helpers to keep
+# logging cheap in big runs (shortened payloads, rate limited progress lines)
+#
+"""
+
+# Python Modules
+import time
+import logging
+from logging.handlers import RotatingFileHandler
+
+# Own Modules
+from config_handler import config
+
+# init logger
+logger = logging.getLogger(__name__)
+
+#Supported log levels (CLI option --log-level / config.ini [other] log_level)
+LOG_LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
+
+#Default values if config.ini does not define them
+DEFAULT_LOG_LEVEL = "INFO"
+DEFAULT_LOG_MAX_BYTES = 10485760
+DEFAULT_LOG_BACKUP_COUNT = 5
+
+#Maximum length of payloads (query data, metadata) in log messages
+LOG_PAYLOAD_LIMIT = 500
+
+#Minimum number of seconds between two progress lines
+PROGRESS_LOG_INTERVAL = 10
+
+def setup_logging(level:str=None):
+    """ Configure the root logger. The level is taken from the parameter (CLI) or from
+        config.ini ([other] log_level). If [other] log_file is set, the log is also written to
+        a rotating file (log_max_bytes / log_backup_count).
+
+        Return Value: bool
+        - True -> Logging configured
+        - False -> Invalid values in config.ini - Defaults are used (see log)
+    """
+    valid_config = True
+    if level is None:
+        level = config.get("other", "log_level", fallback=DEFAULT_LOG_LEVEL).upper()
+    if level not in LOG_LEVELS:
+        valid_config = False
+        level = DEFAULT_LOG_LEVEL
+
+    handlers = [logging.StreamHandler()]
+    log_file = config.get("other", "log_file", fallback="")
+    file_error = None
+    if log_file:
+        try:
+            file_handler = RotatingFileHandler(
+                log_file,
+                maxBytes=config.getint("other", "log_max_bytes", fallback=DEFAULT_LOG_MAX_BYTES),
+                backupCount=config.getint("other", "log_backup_count",
+                                          fallback=DEFAULT_LOG_BACKUP_COUNT),
+                encoding="utf-8")
+            file_handler.setFormatter(logging.Formatter(
+                "%(asctime)s %(levelname)s %(name)s: %(message)s"))
+            handlers.append(file_handler)
+        except (OSError, ValueError) as e:
+            file_error = e
+
+    logging.basicConfig(level=level, handlers=handlers, force=True)
+
+    if not valid_config:
+        logger.warning("Invalid log level in config.ini! - Use %s", DEFAULT_LOG_LEVEL)
+    if file_error is not None:
+        logger.error("Can't log to file %s - Error: %s", log_file, file_error)
+        return False
+    return valid_config
+
+def shorten(value, limit:int=LOG_PAYLOAD_LIMIT):
+    """ Return value as string with at most "limit" characters. Use it for payloads in log
+        messages (e.g. metadata) together with logger.isEnabledFor()
+    """
+    text = str(value)
+    if len(text) > limit:
+        return text[:limit] + f"... ({len(text)} characters)"
+    return text
+
+def create_progress_logger(description:str, total:int=None, interval:float=PROGRESS_LOG_INTERVAL,
+                           progress_logger:logging.Logger=None):
+    """ Create a function to log the progress of a long running loop.
+        A line is logged at most every "interval" seconds (or if force=True) with
+        progress_logger (default: logger of this module).
+
+        progress = create_progress_logger("Validate files")
+        for ...:
+            progress(done)
+        progress(done, force=True)
+
+        Return Value: function(done:int, force:bool=False)
+    """
+    last_log = time.monotonic()
+    if progress_logger is None:
+        progress_logger = logger
+
+    def log_progress(done:int, force:bool=False):
+        nonlocal last_log
+        current_time = time.monotonic()
+        if not force and current_time - last_log < interval:
+            return
+        last_log = current_time
+        if total:
+            progress_logger.info("%s: %i/%i (%.1f%%)", description, done, total,
+                                 done / total * 100)
+        else:
+            progress_logger.info("%s: %i", description, done)
+    return log_progress
@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+"""
+#
+# Project by j54j6
+# This file provides a small metrics registry (counters, gauges and summaries with labels).
+# The metrics can be exported in the Prometheus text format - either as textfile
+# (node-exporter textfile collector) or with a tiny http endpoint (daemon mode).
+#
+"""
+
+#Python modules
+import os
+import time
+import logging
+import tempfile
+import threading
+import functools
+
+# init logger
+logger = logging.getLogger(__name__)
+
+#All known metrics {"name": ("type", "help text")}
+METRIC_DEFINITIONS = {
+    "ytdl_downloads_total": ("counter", "Number of downloaded files"),
+    "ytdl_downloaded_bytes_total": ("counter", "Size of all downloaded files in bytes"),
+    "ytdl_download_failures_total": ("counter", "Number of failed downloads"),
+    "ytdl_resumed_bytes_total": ("counter", "Bytes of interrupted downloads that were continued"),
+    "ytdl_download_queue_depth": ("gauge", "Number of jobs in the download queue"),
+    "ytdl_extractor_calls_total": ("counter", "Number of metadata extractions"),
+    "ytdl_subscriptions_checked_total": ("counter", "Number of checked subscriptions"),
+    "ytdl_subscription_check_failures_total": ("counter", "Number of failed subscription checks"),
+    "ytdl_shared_entries_total": ("counter", "Entries linked to a video of another subscription"),
+    "ytdl_predicted_duplicates_total": ("counter", "Probable duplicates found before the download"),
+    "ytdl_avoided_duplicate_bytes_total": ("counter", "Bytes of skipped probable duplicates"),
+    "ytdl_db_query_seconds": ("summary", "Duration of db queries"),
+    "ytdl_db_group_commit_writes": ("summary", "Number of writes per group commit"),
+    "ytdl_hashed_bytes_total": ("counter", "Number of bytes hashed"),
+    "ytdl_hash_seconds_total": ("counter", "Time spent hashing files"),
+    "ytdl_hash_throughput_mb_per_second": ("gauge", "Hash throughput of the last validation"),
+    "ytdl_last_run_timestamp_seconds": ("gauge", "Unix time of the last finished run"),
+}
+
+#Values of all metrics {"name": {(("label", "value"),): value}}
+#Summaries are saved as [count, sum]
+METRIC_VALUES:dict = {}
+
+#Lock for METRIC_VALUES (downloads and file checks can run in multiple threads)
+METRICS_LOCK = threading.Lock()
+
+#Measure durations with @observed? - Disabled by default (see enable())
+ENABLED:bool = False
+
+def enable():
+    """ Enable the measurement of durations (@observed). Only needed if the metrics are
+        exported - otherwise every db call would pay for the bookkeeping.
+    """
+    global ENABLED # pylint: disable=global-statement
+    ENABLED = True
+
+def _label_key(labels:dict):
+    if not labels:
+        return ()
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+def inc_counter(name:str, value:float=1, labels:dict=None):
+    """ Increase a counter (or gauge) by value """
+    key = _label_key(labels)
+    with METRICS_LOCK:
+        values = METRIC_VALUES.setdefault(name, {})
+        values[key] = values.get(key, 0) + value
+
+def set_gauge(name:str, value:float, labels:dict=None):
+    """ Set a gauge to value """
+    key = _label_key(labels)
+    with METRICS_LOCK:
+        METRIC_VALUES.setdefault(name, {})[key] = value
+
+def observe(name:str, value:float, labels:dict=None):
+    """ Add an observation (e.g. a duration in seconds) to a summary """
+    key = _label_key(labels)
+    with METRICS_LOCK:
+        summary = METRIC_VALUES.setdefault(name, {}).setdefault(key, [0, 0.0])
+        summary[0] += 1
+        summary[1] += value
+
+def get_value(name:str, labels:dict=None):
+    """ Return the current value of a metric (0 if it was never set) """
+    with METRICS_LOCK:
+        return METRIC_VALUES.get(name, {}).get(_label_key(labels), 0)
+
+def observed(name:str, labels:dict=None):
+    """ Decorator to observe the duration of every call of a function in a summary
+        (only if the metrics are enabled)
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            start_time = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - start_time, labels)
+        return wrapper
+    return decorator
+
+def _format_labels(key):
+    if not key:
+        return ""
+    escaped = [(label, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+               for label, value in key]
+    return "{" + ",".join(f'{label}="{value}"' for label, value in escaped) + "}"
+
+def render():
+    """ Render all metrics in the Prometheus text format
+
+        Return Value: str
+    """
+    lines = []
+    with METRICS_LOCK:
+        for name in sorted(METRIC_VALUES):
+            metric_type, help_text = METRIC_DEFINITIONS.get(name, ("untyped", name))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for key, value in sorted(METRIC_VALUES[name].items()):
+                if metric_type == "summary":
+                    lines.append(f"{name}_count{_format_labels(key)} {value[0]}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {value[1]:.6f}")
+                else:
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+    return "\n".join(lines) + "\n"
+
+def write_textfile(path:str):
+    """ Write all metrics to a file (node-exporter textfile collector).
+        The file is replaced atomically so the collector never reads a half written file.
+
+        Return Value: bool
+        - True -> File written
+        - False -> Error while writing (see log)
+    """
+    path = os.path.abspath(path)
+    try:
+        file_descriptor, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(file_descriptor, 'w', encoding="utf-8") as metrics_file:
+            metrics_file.write(render())
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.error("Error while writing metrics to %s - Error: %s", path, e)
+        return False
+    logger.debug("Metrics written to %s", path)
+    return True
+
+def start_http_server(port:int, host:str="127.0.0.1"):
+    """ Start a http server in a background thread which serves the metrics on /metrics
+
+        Return Value: ThreadingHTTPServer|None
+        - server -> call shutdown() to stop it
+        - None -> Server could not be started (see log)
+    """
+    #http.server is only needed in daemon mode - don't import it on every start
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer # pylint: disable=import-outside-toplevel
+
+    class MetricsRequestHandler(BaseHTTPRequestHandler):
+        """ Serves the metrics on /metrics """
+        def do_GET(self): # pylint: disable=invalid-name
+            """ Return the metrics """
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            content = render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, format, *args): # pylint: disable=redefined-builtin
+            logger.debug("Metrics request: " + format, *args)
+
+    try:
+        server = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+    except OSError as e:
+        logger.error("Can't start metrics endpoint on %s:%s - Error: %s", host, port, e)
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info("Metrics available on http://%s:%s/metrics", host, port)
+    return server
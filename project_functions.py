@@ -21,25 +21,38 @@ import os
 import logging
 import json
 import pathlib
+import glob
 import hashlib
+import heapq
 import re
+import signal
+import socket
+import threading
+import time
+import unicodedata
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 import urllib.parse as urlparse
 
-import requests
-import tldextract
-import validators
-import pytz
-
-from prettytable import PrettyTable
-from yt_dlp import YoutubeDL, DownloadError
+#Third party modules (yt_dlp, requests, tldextract, validators, pytz, prettytable) are
+#imported inside the functions that need them. Importing yt_dlp alone takes several hundred ms
+#which made every CLI call (even "help") slow.
+# pylint: disable=import-outside-toplevel
 
 #own modules
 from database_manager import (check_table_exist, create_table, update_value,
-                insert_value, fetch_value, fetch_value_as_bool, delete_value, check_scheme_match)
+                insert_value, fetch_value, fetch_value_as_bool, delete_value, check_scheme_match,
+                fetch_value_iter, update_value_if, group_commit, create_index, upsert_values,
+                IS_NULL, NOT_NULL)
 
 from config_handler import config
+from instrumentation import (timed, timed_function, timed_item, write_report, profiled_item,
+                             write_item_profiles)
+import metrics
+import bandwidth_scheduler
+import ydl_pool
+from log_handler import create_progress_logger, shorten
 # init logger
 logger = logging.getLogger(__name__)
 
@@ -47,6 +60,37 @@ logger = logging.getLogger(__name__)
 #If you have problems adding files decrease the value!
 BUF_SIZE = 4096
 
+#Number of items that are checked together by verify_db(). Only one batch is kept in memory
+VERIFY_BATCH_SIZE = 1000
+
+#Number of item ids bound in one query (unlink_missing_entries(), export of the entries)
+ITEM_ID_BATCH_SIZE = 500
+
+#Loaded scheme files {path: (mtime, scheme)} - Used by load_scheme_file()
+SCHEME_CACHE = {}
+
+#Set if the program should stop (daemon mode). Running loops stop after the current item
+SHUTDOWN_EVENT = threading.Event()
+
+#Owner of the leases of this process (several workers can share one database)
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}"
+
+#Thread which renews the leases of this worker (see start_lease_heartbeat())
+LEASE_HEARTBEAT = None
+LEASE_LOCK = threading.Lock()
+
+#Lock for the heap of the download queue (shared by the download workers)
+DOWNLOAD_QUEUE_LOCK = threading.Lock()
+
+#Creates the file indexes of the download queue (see run_download_job())
+FILE_INDEX_LOCK = threading.Lock()
+
+#Priority of deferred download jobs (probable duplicates) - downloaded after all other jobs
+DEFERRED_JOB_PRIORITY = -2147483648
+
+#Possible values of the option "duplicate_prediction"
+DUPLICATE_PREDICTION_MODES = ("off", "skip", "defer")
+
 
 ################# MAIN
 
@@ -57,15 +101,112 @@ def start():
         - True: Success (All subscriptions updated and files downloaded)
         - False: Failed (There was an error either during update or download phase)
     """
+    #Finish all downloads of an interrupted run before checking for new content
+    resumed = process_download_jobs()
+
+    if not resumed["status"]:
+        logger.error("Error while finishing queued downloads of the last run!")
+
     logger.info("Checking all subscriptions for updates")
 
     updated = update_subscriptions()
 
     if not updated:
         logger.error("Error while updating subscriptions!")
+        export_metrics()
         return False
 
-    return download_missing()
+    downloaded = download_missing()
+    export_metrics()
+    return downloaded
+
+def daemon(poll_interval:int=0):
+    """This function keeps the program running and checks all subscriptions periodically.
+    The startup checks (config, db, schemes) are only done once. The time until the next
+    check is calculated from "subscription_check_delay" and the last check of every
+    subscription. If poll_interval is set, the download queue is processed every
+    poll_interval seconds between two checks (see worker()).
+    SIGTERM / SIGINT stop the daemon after the current download.
+
+    Return Values:
+        - True: Daemon stopped
+    """
+    def request_shutdown(signum, _frame):
+        logger.info("Received signal %s - Shutdown after the current download...", signum)
+        SHUTDOWN_EVENT.set()
+
+    signal.signal(signal.SIGTERM, request_shutdown)
+    signal.signal(signal.SIGINT, request_shutdown)
+
+    metrics_server = None
+    metrics_port = get_metrics_http_port()
+    if metrics_port > 0:
+        metrics_server = metrics.start_http_server(metrics_port)
+
+    logger.info("Daemon started")
+    while not SHUTDOWN_EVENT.is_set():
+        if not start():
+            logger.error("Error while checking subscriptions! - Check log")
+
+        if SHUTDOWN_EVENT.is_set():
+            break
+
+        next_check = get_seconds_until_next_check()
+        logger.info("Next check in %s minutes", round(next_check/60, 1))
+        check_at = time.monotonic() + next_check
+        #Download the jobs queued by other workers until the next check
+        while poll_interval and time.monotonic() + poll_interval < check_at:
+            if SHUTDOWN_EVENT.wait(poll_interval):
+                break
+            if not process_download_jobs()["status"]:
+                logger.error("Error while processing the download queue! - Check log")
+        SHUTDOWN_EVENT.wait(max(check_at - time.monotonic(), 0))
+
+    if metrics_server is not None:
+        metrics_server.shutdown()
+    ydl_pool.close_all()
+    logger.info("Daemon stopped")
+    return True
+
+def worker():
+    """This function runs the program as one of several workers sharing one database
+    (e.g. one SQLite file used by several processes). It works like daemon() but also
+    downloads the jobs queued by other workers every "worker_poll_interval" seconds.
+    Subscriptions and download jobs are claimed with leases - so no file is downloaded twice.
+
+    Return Values:
+        - True: Worker stopped
+    """
+    poll_interval = fetch_value("config", {"option_name": "worker_poll_interval"},
+                                ["option_value"], True)
+    try:
+        poll_interval = max(int(poll_interval[0]), 1)
+    except (TypeError, ValueError, IndexError):
+        logger.warning("Can't read option worker_poll_interval! - Use default (60)")
+        poll_interval = 60
+    logger.info("Worker %s started", WORKER_ID)
+    return daemon(poll_interval)
+
+def get_seconds_until_next_check(minimum_delay:int=60):
+    """This function calculates when the next subscription needs to be checked
+    (last check + subscription_check_delay).
+
+    Return Value: float
+        - Seconds until the next check (at least "minimum_delay")
+    """
+    check_interval = get_subscription_check_delay()
+    next_check = check_interval * 3600
+
+    subscriptions = fetch_value("subscriptions", None, ["subscription_last_checked"])
+    current_time = get_current_time()
+
+    if subscriptions and current_time != -1:
+        for subscription in subscriptions:
+            hours_since_last_check = get_hours_since(subscription[0], current_time)
+            if hours_since_last_check is None:
+                continue
+            next_check = min(next_check, (check_interval - hours_since_last_check) * 3600)
+    return max(next_check, minimum_delay)
 
 ################# Subscription related
 
@@ -114,6 +255,14 @@ def add_subscription(url:str, downloaded:int = None, last_checked = None, meta_d
         logger.error("Error while inserting subscription for %s into db! - Check log",
                      subscription_obj["obj"]["subscription_name"])
         return False
+
+    subscription_id = fetch_value("subscriptions",
+                                  {"subscription_path": subscription_obj["obj"]["subscription_path"]},
+                                  ["id"], True)
+    if not subscription_id or not save_subscription_entries(
+            subscription_id[0], subscription_obj["obj"]["current_subscription_data"]):
+        logger.warning("Error while saving the entries of %s! - They are saved with the next run",
+                       subscription_obj["obj"]["subscription_name"])
     logger.info("Subscription for %s successfully created.",
                 subscription_obj["obj"]["subscription_name"])
     return True
@@ -151,6 +300,7 @@ def del_subscription(identifier:str):
         - True: Success (Subscription successfully deleted from db)
         - False: Failed (Error while removing subscription from db - Most likly SQL Error)
     """
+    import validators
     if validators.url(identifier):
         #Remove with url as ident
 
@@ -164,6 +314,8 @@ def del_subscription(identifier:str):
             logger.info("Subscription does not exist!")
             return True
 
+        subscription_ids = {subscription[0] for subscription in
+                            (subscription_exist_1, subscription_exist_2) if subscription}
         subscription_deleted = delete_value("subscriptions", [
             {"subscription_path": identifier},
             {"passed_subscription_path": identifier}])
@@ -176,14 +328,60 @@ def del_subscription(identifier:str):
             logger.info("Subscription does not exist!")
             return True
 
+        subscription_ids = {subscription_exist[0]}
         subscription_deleted = delete_value("subscriptions", {"subscription_name": identifier})
 
     if not subscription_deleted:
         logger.error("Error while removing subscription!")
         return False
+    if not delete_value("subscription_entries",
+                        [{"subscription_id": subscription_id} for subscription_id in subscription_ids]):
+        logger.warning("Error while removing the entries of the subscription!")
     logger.info("Subscription removed.")
     return True
 
+def set_subscription_priority(identifier:str, priority:str):
+    """ This function sets the priority of a subscription. New videos of subscriptions with
+        a higher priority are downloaded first (see create_download_queue()).
+        Already queued jobs of the subscription get the new priority too - except deferred
+        jobs (probable duplicates - DEFERRED_JOB_PRIORITY), they stay at the end of the queue.
+
+        Return Values:
+        - True: Success (Priority saved)
+        - False: Failed (Invalid priority, unknown subscription or SQL Error)
+    """
+    import validators
+    try:
+        priority = int(priority)
+    except ValueError:
+        logger.error("Priority must be a number! - Got %s", priority)
+        return False
+
+    if validators.url(identifier):
+        subscription = fetch_value("subscriptions", [{"subscription_path": identifier},
+                                                     {"passed_subscription_path": identifier}],
+                                   ["id", "subscription_name"], True)
+    else:
+        subscription = fetch_value("subscriptions", {"subscription_name": identifier},
+                                   ["id", "subscription_name"], True)
+
+    if subscription is False:
+        logger.error("Error while fetching subscription!")
+        return False
+    if subscription is None:
+        logger.error("Subscription %s does not exist!", identifier)
+        return False
+
+    priority_set = update_value("subscriptions", {"priority": priority}, {"id": subscription[0]})
+    jobs_updated = update_value_if("download_jobs", {"priority": priority},
+                                   "subscription_name = ? AND state = 'queued' AND priority != ?",
+                                   [subscription[1], DEFERRED_JOB_PRIORITY])
+    if not priority_set or jobs_updated is None:
+        logger.error("Error while saving priority of subscription %s!", subscription[1])
+        return False
+    logger.info("Priority of subscription %s set to %i", subscription[1], priority)
+    return True
+
 def list_subscriptions(scheme_filter:list=None):
     """This function list all subscriptions with prettyTables
 
@@ -191,6 +389,7 @@ def list_subscriptions(scheme_filter:list=None):
         - True: Success (Subscription Table was printed to CLI)
         - False: Failed (Failed to fetch all data needed to build table. Most likly SQL Error)
     """
+    from prettytable import PrettyTable
     if scheme_filter is None:
         logger.debug("List all subscriptions")
         #List all subscriptions
@@ -204,7 +403,8 @@ def list_subscriptions(scheme_filter:list=None):
                                         "downloaded_content_count",
                                         "subscription_last_checked",
                                         "subscription_path",
-                                        "output_format"
+                                        "output_format",
+                                        "priority"
                                     ], extra_sql="ORDER BY scheme")
 
     else:
@@ -223,7 +423,8 @@ def list_subscriptions(scheme_filter:list=None):
                                         "downloaded_content_count",
                                         "subscription_last_checked",
                                         "subscription_path",
-                                        "output_format"
+                                        "output_format",
+                                        "priority"
                                     ], extra_sql="ORDER BY scheme")
 
     if subscriptions is None:
@@ -231,7 +432,8 @@ def list_subscriptions(scheme_filter:list=None):
         return False
 
     subscriptions_table = PrettyTable(
-        ['ID', 'Name', 'Scheme', 'Avail. Videos', 'Downloaded Videos', 'Last checked', 'url', 'format'])
+        ['ID', 'Name', 'Scheme', 'Avail. Videos', 'Downloaded Videos', 'Last checked', 'url', 'format',
+         'Priority'])
     subscriptions_table.align['ID'] = "c"
     subscriptions_table.align['Name'] = "l"
     subscriptions_table.align['Scheme'] = "l"
@@ -240,6 +442,7 @@ def list_subscriptions(scheme_filter:list=None):
     subscriptions_table.align['Last checked'] = "c"
     subscriptions_table.align['url'] = "l"
     subscriptions_table.align['format'] = "c"
+    subscriptions_table.align['Priority'] = "c"
     video_is = 0
     video_should = 0
     for index, subscription in enumerate(subscriptions):
@@ -269,7 +472,8 @@ def list_subscriptions(scheme_filter:list=None):
                 subscription[4],
                 subscription[5],
                 subscription[6],
-                output_format],
+                output_format,
+                subscription[8]],
                 divider=True)
         else:
             logger.debug("For ID %s no divider needed!", subscription[0])
@@ -285,11 +489,12 @@ def list_subscriptions(scheme_filter:list=None):
                 subscription[4],
                 subscription[5],
                 subscription[6],
-                output_format],
+                output_format,
+                subscription[8]],
                 divider=False)
         enable_divider = False
 
-    subscriptions_table.add_row(["Total: ",len(subscriptions),'',video_should,video_is,'','', ''])
+    subscriptions_table.add_row(["Total: ",len(subscriptions),'',video_should,video_is,'','', '', ''])
 
     print(subscriptions_table)
     return True
@@ -302,20 +507,11 @@ def update_subscriptions():
         - True: Success (All subscriptions updated)
         - False: Failed (There was an error during updating the db. Most likly YT DLP or SQL Error)
     """
-    subscriptions = fetch_value("subscriptions",
-                                None,
-                                [
-                                    "scheme",
-                                    "subscription_name",
-                                    "subscription_path",
-                                    "subscription_last_checked",
-                                    "downloaded_content_count",
-                                    "subscription_content_count",
-                                    "id",
-                                    "current_subscription_data"
-                                ],
-                                False,
-                                "ORDER BY scheme")
+    #The playlist metadata (current_subscription_data) is not read or written here - the entries
+    #are saved in subscription_entries
+    columns = ["scheme", "subscription_name", "subscription_path", "subscription_last_checked",
+               "downloaded_content_count", "subscription_content_count", "id"]
+    subscriptions = fetch_value("subscriptions", None, columns, False, "ORDER BY scheme")
 
     if not subscriptions:
         logger.error("Error while fetching subscription data! - Please check log.")
@@ -331,33 +527,44 @@ def update_subscriptions():
         return False
 
     #Iterate over all subscriptions
+    #Check if subscription needs to be checked
+    check_interval = get_subscription_check_delay()
+
     for subscription in subscriptions:
+        #A worker holds the lease of one subscription at a time
+        release_lease("subscriptions")
+        if SHUTDOWN_EVENT.is_set():
+            logger.info("Shutdown requested - Stop updating subscriptions")
+            break
+
+        if not claim_lease("subscriptions", subscription[6]):
+            logger.info("Subscription %s is processed by another worker - Skip", subscription[1])
+            continue
+        #Another worker could have checked the subscription since it was fetched
+        subscription = fetch_value("subscriptions", {"id": subscription[6]}, columns, True) \
+            or subscription
+
+        current_time = get_current_time()
+        hours_since_last_check = get_hours_since(subscription[3], current_time)
+
+        if hours_since_last_check is not None and hours_since_last_check < check_interval:
+            logger.info("Subscription %s was checked %s hours ago. Skip",
+                        subscription[1], str(round(hours_since_last_check, 2)))
+            continue
+
         #Fetch the current object of the subscription
         current_obj = get_subscription_data_obj(subscription[2])
 
+        metrics.inc_counter("ytdl_subscriptions_checked_total", labels={"scheme": subscription[0]})
         if not current_obj["status"]:
             logger.error("Error while fetching actual metadata for subscription %s",
                          subscription[1])
-
-        #Check if subscription needs to be checked
-        check_interval = fetch_value("config",
-                                     {"option_name": "subscription_check_delay"},
-                                     ["option_value"], True)
-
-        if not check_interval:
-            logger.error("Error while fetching check interval value! - Continue")
-        else:
-            check_interval = check_interval[0]
-            last_checked = subscription[3]
-            current_time = get_current_time()
-
-            time_since_last_check = datetime.strptime(current_time, "%Y-%m-%d %H:%M:%S") - datetime.strptime(last_checked, "%Y-%m-%d %H:%M:%S")
-            hours_since_last_check = time_since_last_check.seconds/3600
-
-            if hours_since_last_check < int(check_interval):
-                logger.info("Subscription %s was checked %s hours ago. Skip",
-                            subscription[1], str(round(hours_since_last_check, 2)))
-                continue
+            metrics.inc_counter("ytdl_subscription_check_failures_total",
+                                labels={"scheme": subscription[0]})
+            faulty_subscriptions.append(subscription[1])
+            faulty_messages.append("Error while fetching actual metadata!")
+            error_during_process = True
+            continue
 
         #Check for number of items
         if (current_obj["obj"]["subscription_content_count"] == subscription[5] and
@@ -368,8 +575,6 @@ def update_subscriptions():
                 "subscriptions",
                 {
                     "subscription_last_checked": current_time,
-                    "last_subscription_data": subscription[7],
-                    "current_subscription_data": current_obj["obj"]["current_subscription_data"],
                     "subscription_has_new_data": "0"
                 },
                 {"id": subscription[6]}
@@ -377,18 +582,15 @@ def update_subscriptions():
         elif current_obj["obj"]["subscription_content_count"] < subscription[5]:
             #Less avail than before - just send a message...
             faulty_subscriptions.append(subscription[1])
-            faulty_messages.append("""Number of items is less than the last check! -
-                                   Last time: %s, This time: %s""",
-                                   subscription[5],
-                                   current_obj["obj"]["subscription_content_count"])
+            faulty_messages.append(f"""Number of items is less than the last check! -
+                                   Last time: {subscription[5]},
+                                   This time: {current_obj["obj"]["subscription_content_count"]}""")
 
             #Update table
             table_updates = update_value(
                 "subscriptions",
                 {
                     "subscription_last_checked": current_time,
-                    "last_subscription_data": subscription[7],
-                    "current_subscription_data": current_obj["obj"]["current_subscription_data"],
                     "subscription_has_new_data": "0",
                     "subscription_content_count": current_obj["obj"]["subscription_content_count"]
                 },
@@ -402,21 +604,27 @@ def update_subscriptions():
                 "subscriptions",
                 {
                     "subscription_last_checked": current_time,
-                    "last_subscription_data": subscription[7],
-                    "current_subscription_data": current_obj["obj"]["current_subscription_data"],
                     "subscription_has_new_data": "1",
                     "subscription_content_count": current_obj["obj"]["subscription_content_count"]
                 },
                 {"id": subscription[6]}
             )
 
+        if table_updates:
+            #Only new and changed entries are written
+            table_updates = save_subscription_entries(
+                subscription[6], current_obj["obj"]["current_subscription_data"])
+
         if not table_updates:
             logger.error("Error while updating table!")
+            metrics.inc_counter("ytdl_subscription_check_failures_total",
+                                labels={"scheme": subscription[0]})
             faulty_subscriptions.append(subscription[1])
             faulty_messages.append("Error while updating subscription!")
             error_during_process = True
             continue
         logger.info("Subscription %s successfully updated", subscription[1])
+    release_lease("subscriptions")
 
     if len(faulty_subscriptions) > 0:
         for index, subscription in enumerate(faulty_subscriptions):
@@ -437,7 +645,8 @@ def export_subscriptions():
                                                         "downloaded_content_count",
                                                         "last_subscription_data",
                                                         "subscription_name",
-                                                        "output_format"])
+                                                        "output_format",
+                                                        "id"])
 
     if subscriptions is None:
         logging.error("Error while fetching subscriptions")
@@ -450,7 +659,8 @@ def export_subscriptions():
             "downloaded_content_count": subscription[2],
             "last_subscription_data": subscription[3],
             "subscription_name": subscription[4],
-            "output_format": subscription[5]
+            "output_format": subscription[5],
+            "entries": export_subscription_entries(subscription[6])
         }
         exported_subscriptions.append(subscription_obj)
     base_path = fetch_value("config", {"option_name": "base_location"}, ["option_value"], True)
@@ -486,7 +696,8 @@ def import_subscriptions(path="./", delelte_current_subscriptions=False):
 
     if delelte_current_subscriptions:
         logger.info("Current subscriptions will be deleted before import!")
-        if(delete_value("subscriptions", None, True)):
+        if(delete_value("subscriptions", None, True) and
+           delete_value("subscription_entries", None, True)):
             logger.info("Subscriptions removed!")
         else:
             logger.error("Error while removing old subscriptions! - Abort")
@@ -520,6 +731,13 @@ def import_subscriptions(path="./", delelte_current_subscriptions=False):
                                        subscription["subscription_last_checked"],
                                        subscription["last_subscription_data"],
                                        format_list)
+            #Exports of older versions don't contain the entries
+            if success and subscription.get("entries"):
+                subscription_id = fetch_value("subscriptions",
+                                              {"subscription_path": subscription["subscription_path"]},
+                                              ["id"], True)
+                success = bool(subscription_id) and \
+                          import_subscription_entries(subscription_id[0], subscription["entries"])
             if not success:
                 error_raised = True
                 failed_imports.append(subscription["subscription_name"])
@@ -539,6 +757,181 @@ def import_subscriptions(path="./", delelte_current_subscriptions=False):
     return True
 ### Subscription helper
 
+def save_subscription_entries(subscription_id:int, metadata:dict):
+    """ This function saves the entries (videos) of the playlist metadata of a subscription in
+        the table subscription_entries. Only new entries and entries with a changed title,
+        position or id are written. Entries that are not in the playlist anymore are kept.
+
+        Return Value: bool
+        - True -> Entries saved
+        - False -> SQL Error
+    """
+    existing_entries = {row[0]: row[1:] for row in fetch_value_iter(
+        "subscription_entries", {"subscription_id": subscription_id},
+        ["url", "title", "position", "video_id", "extractor"])}
+
+    changed_entries = []
+    for position, entry in enumerate(metadata.get("entries") or []):
+        if not entry or "url" not in entry:
+            continue
+        #Flat playlists contain "ie_key", full extractions "extractor_key"
+        entry_data = (entry.get("title"), position, entry.get("id"),
+                      entry.get("ie_key") or entry.get("extractor_key"))
+        if existing_entries.get(entry["url"]) == entry_data:
+            continue
+        changed_entries.append((subscription_id, entry["url"], *entry_data))
+
+    if not upsert_values("subscription_entries",
+                         ["subscription_id", "url", "title", "position", "video_id", "extractor"],
+                         changed_entries, ["subscription_id", "url"]):
+        logger.error("Error while saving entries of subscription %s!", subscription_id)
+        return False
+    logger.debug("%i entries of subscription %s saved", len(changed_entries), subscription_id)
+    return True
+
+def export_subscription_entries(subscription_id:int):
+    """ This function returns the entries of a subscription for the export. Downloaded entries
+        contain the path of the file - the items get new ids if they are imported.
+
+        Return Value: list
+        [{"url": "", "title": "", "position": 0, "video_id": "", "extractor": "",
+          "downloaded_file": ["<<file_path>>", "<<file_name>>"]|None}]
+    """
+    entries = fetch_value("subscription_entries", {"subscription_id": subscription_id},
+                          ["url", "title", "position", "video_id", "extractor",
+                           "downloaded_item_id"], False, "ORDER BY position")
+    linked_items = list({entry[5] for entry in entries or [] if entry[5] is not None})
+    item_files = {}
+    for index in range(0, len(linked_items), ITEM_ID_BATCH_SIZE):
+        for item_id, file_path, file_name in fetch_value_iter(
+                "items", {"id": linked_items[index:index + ITEM_ID_BATCH_SIZE]},
+                ["id", "file_path", "file_name"]):
+            item_files[item_id] = [file_path, file_name]
+    return [{"url": url, "title": title, "position": position, "video_id": video_id,
+             "extractor": extractor, "downloaded_file": item_files.get(item_id)}
+            for url, title, position, video_id, extractor, item_id in entries or []]
+
+def import_subscription_entries(subscription_id:int, entries:list):
+    """ This function saves exported entries (see export_subscription_entries()) of a
+        subscription. Downloaded entries are linked to the item of their file - import the
+        items before (import-items), otherwise the entries are checked again by start.
+
+        Return Value: bool
+    """
+    entry_rows = [(subscription_id, entry["url"], entry.get("title"), entry.get("position"),
+                   entry.get("video_id"), entry.get("extractor")) for entry in entries]
+    if not upsert_values("subscription_entries",
+                         ["subscription_id", "url", "title", "position", "video_id", "extractor"],
+                         entry_rows, ["subscription_id", "url"]):
+        logger.error("Error while importing the entries of subscription %s!", subscription_id)
+        return False
+
+    linked_entries = 0
+    for entry in entries:
+        if not entry.get("downloaded_file"):
+            continue
+        item_id = get_item_id_by_path(os.path.join(*entry["downloaded_file"]))
+        if item_id is not None and update_value_if("subscription_entries",
+                                                   {"downloaded_item_id": item_id},
+                                                   "subscription_id = ? AND url = ?",
+                                                   [subscription_id, entry["url"]]):
+            linked_entries += 1
+    logger.info("Imported %i entries (%i downloaded) of subscription %s", len(entry_rows),
+                linked_entries, subscription_id)
+    return True
+
+def seed_subscription_entries(subscription_id:int):
+    """ This function fills subscription_entries from the saved playlist metadata
+        (current_subscription_data) of a subscription - for subscriptions which were checked
+        before the table existed. Nothing is done if the subscription already has entries.
+
+        Return Value: bool
+        - True -> Entries exist
+        - False -> Error (see log)
+    """
+    if fetch_value("subscription_entries", {"subscription_id": subscription_id}, ["id"], True):
+        return True
+
+    subscription_data = fetch_value("subscriptions", {"id": subscription_id},
+                                    ["current_subscription_data"], True)
+    try:
+        metadata = json.loads(subscription_data[0])
+    except (TypeError, IndexError, json.JSONDecodeError):
+        logger.error("Error while decoding data from db for subscription %s", subscription_id)
+        return False
+    return save_subscription_entries(subscription_id, metadata)
+
+def unlink_missing_entries(subscription_id:int, path:str):
+    """ This function marks the entries of a subscription as not downloaded if the linked file
+        does not exist in path anymore - so they are checked (and redownloaded) again.
+
+        Return Value: int - Number of unlinked entries
+    """
+    try:
+        existing_files = set(os.listdir(path))
+    except OSError:
+        existing_files = set()
+
+    linked_items = list({item_id for (item_id,) in fetch_value_iter(
+        "subscription_entries", {"subscription_id": subscription_id,
+                                 "downloaded_item_id": NOT_NULL}, ["downloaded_item_id"])})
+
+    #Entries can be linked to the file of another subscription (same video) - check its path
+    missing_items = []
+    for index in range(0, len(linked_items), ITEM_ID_BATCH_SIZE):
+        missing_items += [item_id for item_id, file_path, file_name in fetch_value_iter(
+            "items", {"id": linked_items[index:index + ITEM_ID_BATCH_SIZE]},
+            ["id", "file_path", "file_name"])
+            if file_name not in existing_files and not (
+                file_path and file_name and check_file_exist(os.path.join(file_path, file_name)))]
+    for item_id in missing_items:
+        update_value_if("subscription_entries", {"downloaded_item_id": None},
+                        "subscription_id = ? AND downloaded_item_id = ?",
+                        [subscription_id, item_id])
+    return len(missing_items)
+
+def get_video_item(extractor:str, video_id:str, check_file:bool=False):
+    """ This function returns the id of the downloaded item of a video if an entry of any
+        subscription with the same extractor and video id is linked to it (e.g. the video is in
+        a channel and in a playlist of this channel). If check_file is True, the item is only
+        returned if the file exists on your FS.
+
+        Return Value: int|None
+    """
+    if not extractor or not video_id:
+        return None
+    entry = fetch_value("subscription_entries", {"extractor": extractor, "video_id": video_id,
+                                                 "downloaded_item_id": NOT_NULL},
+                        ["downloaded_item_id"], True)
+    if not entry:
+        return None
+    if check_file:
+        item = fetch_value("items", {"id": entry[0]}, ["file_path", "file_name"], True)
+        if not item or not item[0] or not item[1] or \
+           not check_file_exist(os.path.join(item[0], item[1])):
+            return None
+    return entry[0]
+
+def link_subscription_entry(entry_id:int, item_id:int):
+    """ This function marks an entry of a subscription as downloaded (item of the file)
+
+        Return Value: bool
+    """
+    if item_id is None:
+        return False
+    return update_value("subscription_entries", {"downloaded_item_id": item_id}, {"id": entry_id})
+
+def get_item_id_by_path(full_file_path:str):
+    """ This function returns the id of the item of a file
+
+        Return Value: int|None
+    """
+    if not full_file_path:
+        return None
+    file_path, file_name = os.path.split(full_file_path)
+    item = fetch_value("items", {"file_path": file_path, "file_name": file_name}, ["id"], True)
+    return item[0] if item else None
+
 def create_subscription_url(url:str, scheme:json):
     """ This function creates the subscription url which will used to subscribe to a channel or
         anything else
@@ -562,6 +955,7 @@ def create_subscription_url(url:str, scheme:json):
                                             uniform data
         }
     """
+    import tldextract
     logger.debug("Create subscription url for url %s", url)
     return_val = {
         "status": False,
@@ -724,7 +1118,7 @@ def get_subscription_data_obj(url:str, downloaded = None, last_checked=None, las
         logger.error("The provided url is not supported!")
         return subscription_entry
 
-    logger.debug("Used scheme for url is: %s", data["scheme"])
+    logger.debug("Used scheme for url is: %s", data["scheme"].get("schema_name"))
 
     subscription_data = create_subscription_url(url, data["scheme"])
 
@@ -739,7 +1133,8 @@ def get_subscription_data_obj(url:str, downloaded = None, last_checked=None, las
 
     metadata = get_metadata(subscription_data["formed_subscription_url"],
                             get_ydl_opts(data["dst_path"],
-                                         {'quiet': False, 'extract_flat': 'in_playlist'}))
+                                         {'quiet': False, 'extract_flat': 'in_playlist'},
+                                         scheme=data["scheme"]))
 
     if not metadata:
         logger.error("Error while fetching metadata for subscription! - Please check the log.")
@@ -816,7 +1211,10 @@ def direct_download_batch(file:str, output_format:list[str] = None):
     """ This function represents the "manual" video download approach but using a batch file
         You can pass an url and the file will be downlaoded, hashed and registered.
 
-        The parameter "own_file_data" is from prepare_scheme_dst_data()!
+        All urls are added to the download queue first (download_jobs table) and downloaded
+        after that. If the process is interrupted the remaining files are downloaded
+        with the next run.
+
         Return Values:bool
         - True (Successfully downloaded file and registered it in db)
         - False (Failed - either during download or registration / hashing)
@@ -831,9 +1229,24 @@ def direct_download_batch(file:str, output_format:list[str] = None):
     with open(file, 'r', encoding="UTF-8") as input_file:
         for line in input_file:
             line = line.strip()
-            if not direct_download(line, output_format):
+            if line == "":
+                continue
+            prepared_data = prepare_scheme_dst_data(line)
+
+            if prepared_data["status"] == 2:
+                logger.info("%s already exists in db - SKIP", line)
+                continue
+            if prepared_data["status"] != 1:
+                logger.error("Error while preparing download for %s! - Check log.", line)
+                failed = True
+                continue
+            if not enqueue_download_job(line, prepared_data, output_format):
                 failed = True
 
+    processed_jobs = process_download_jobs()
+    if not processed_jobs["status"]:
+        failed = True
+
     if not failed:
         logger.info("All files successfully downloaded")
         return True
@@ -841,15 +1254,44 @@ def direct_download_batch(file:str, output_format:list[str] = None):
     return False
 
 #This function is called from CLI
-def direct_download(url:str, own_file_data:dict=None, output_format:list[str] = None):
+def direct_download(url:str, own_file_data:dict=None, output_format:list[str] = None,
+                    ignore_existing_file=False):
     """ This function represents the "manual" video download approach
         You can pass an url and the file will be downlaoded, hashed and registered.
 
         The parameter "own_file_data" is from prepare_scheme_dst_data()!
+        If "ignore_existing_file" is True the file is downloaded even if it is already
+        registered in the db (used to redownload missing files)
         Return Values:bool
         - True (Successfully downloaded file and registered it in db)
         - False (Failed - either during download or registration / hashing)
     """
+    configure_bandwidth()
+    with timed_item(url):
+        return download_and_register(url, own_file_data, output_format,
+                                     ignore_existing_file)["status"]
+
+def download_and_register(url:str, own_file_data:dict=None, output_format:list[str] = None,
+                          ignore_existing_file=False, bandwidth_group:str="custom",
+                          file_index:dict=None, job_id:int=None):
+    """ This function downloads a file, hashes it and registers it in the db.
+        It is used by direct_download() and the download queue.
+        bandwidth_group is the group (subscription) the bandwidth budget is shared with.
+        file_index is the index of the destination path (see download_file()).
+        If job_id (download queue) is passed the file is only registered if this worker still
+        holds the lease of the job.
+
+        Return Value: dict
+        {
+            "status": False, -> Operation successfull? - Use it as probe
+            "full_file_path": None, -> The absolute path of the downloaded file
+            "resumed_bytes": 0, -> Bytes of a partial download that were reused (see download_file())
+            "lease_lost": False -> The lease of the job expired and was taken over by another
+                                   worker - the file was not registered
+        }
+    """
+    return_val = {"status": False, "full_file_path": None, "resumed_bytes": 0,
+                  "lease_lost": False}
     #Line Break for Pylint #C0301
     logger.info("""Directly download content from %s -
                 Check prerequisites and prepare download data""", url)
@@ -864,20 +1306,24 @@ def direct_download(url:str, own_file_data:dict=None, output_format:list[str] =
 
     if prepared_data["status"] != 1:
         logger.error("Error while preparing download! - Check log.")
-        return False
+        return return_val
 
     path = prepared_data["dst_path"]
 
     logger.info("File will be saved under: %s", path)
 
-    downloaded = download_file(url=url, path=path, output_format=output_format)
+    downloaded = download_file(url=url, path=path, ignore_existing_url=ignore_existing_file,
+                               output_format=output_format, bandwidth_group=bandwidth_group,
+                               scheme=prepared_data["scheme"], file_index=file_index)
+    return_val["resumed_bytes"] = downloaded["resumed_bytes"]
 
     if not downloaded["status"]:
         logger.error("Error while downloading file from %s - Please check log!", url)
-        return False
+        return return_val
 
     full_file_path = downloaded["full_file_path"]
     metadata = downloaded["metadata"]
+    return_val["full_file_path"] = full_file_path
     logger.debug("Full File path is: %s", full_file_path)
     #Compute hash from file
     file_hash = create_hash_from_file(full_file_path)
@@ -889,7 +1335,13 @@ def direct_download(url:str, own_file_data:dict=None, output_format:list[str] =
                      file_hash["status"], file_hash["hash"])
 
         error_post_processing(full_file_path)
-        return False
+        return return_val
+
+    #Another worker took over the job (lease expired) - it registers its own download
+    if job_id is not None and not renew_lease("download_jobs", job_id):
+        return_val["lease_lost"] = True
+        return return_val
+
     #Check if hash is already in database
     #If hash is not in db -> Video is new -
     #If hash is in db video already exist. Check if the url is the same
@@ -901,21 +1353,30 @@ def direct_download(url:str, own_file_data:dict=None, output_format:list[str] =
                                            file_hash["hash"],
                                            {"url": [url]},
                                            metadata)
-        if video_registered:
+        if video_registered["status"]:
             logger.info("File successfully downlaoded.")
-            return True
+            return_val["status"] = True
+            return return_val
         logger.error("Error while register Video to db!")
         error_post_processing(full_file_path)
-        return False
+        return return_val
 
-    return True
+    return_val["status"] = True
+    return return_val
 
 #This function will actually download a file...
-def download_file(url, path, metadata=None, ignore_existing_url=False, output_format:list[str] = None):
+def download_file(url, path, metadata=None, ignore_existing_url=False, output_format:list[str] = None,
+                  bandwidth_group:str="custom", scheme:dict=None, file_index:dict=None):
     """This function downloads the file specified in url and also provides the prepared
         file path from ydl
 
-        if the metadata parameter is None they will be fetched
+        The existence check only probes the url (see get_metadata()). The full metadata are
+        extracted while downloading - the metadata parameter is not used anymore.
+        The download rate is limited by the bandwidth scheduler (budget shared per bandwidth_group)
+        The download options (fragments, chunks, resume) are taken from the scheme
+        file_index (see create_file_index()) is created if it is not passed - pass it if many
+        files of the same path are downloaded. The downloaded file is added to it.
+        (see get_download_options())
 
         Return Value:dict
         {
@@ -923,30 +1384,39 @@ def download_file(url, path, metadata=None, ignore_existing_url=False, output_fo
             "full_file_path": None, - The full file path to the file (absolute path)
                                         including the filename
             "filename": None,
-            "metadata": None - Metadata from the file
+            "metadata": None, - Metadata from the file
+            "resumed_bytes": 0 - Size of the partial files of an interrupted download that
+                                 were continued
         }
     """
-    return_val = {"status": False, "full_file_path": None, "filename": None, "metadata": None}
-    metadata = get_metadata(url, get_ydl_opts(path, None, output_format))
-    if metadata is None:
+    from yt_dlp import DownloadError
+    return_val = {"status": False, "full_file_path": None, "filename": None, "metadata": None,
+                  "resumed_bytes": 0}
+    #Probe only - the full extraction is only needed if the file is downloaded
+    probe_metadata = get_metadata(url, get_ydl_opts(path, None, output_format, scheme, True), True)
+    if probe_metadata is None:
             logging.error("Error while fetching metadata to check if video already exists in db! - Continue without checking")
             return return_val
 
+    if ignore_existing_url:
+        file_index = {}
+    elif file_index is None:
+        file_index = create_file_index(path)
+    expected_file = get_expected_filepath(probe_metadata, path, file_index)
+    if expected_file is None:
+        return return_val
+    filename = expected_file["filename"]
+    if filename is not None:
+        return_val["full_file_path"] = os.path.join(path, filename)
+        return_val["filename"] = filename
 
-    full_file_path = YoutubeDL(get_ydl_opts(path, None, output_format)).prepare_filename(metadata,
-                                                                      outtmpl=path +
-                                                                      '/%(title)s.%(ext)s')
-
-    filename = os.path.basename(full_file_path).split(os.path.sep)[-1]
-    return_val["full_file_path"] = full_file_path
-    return_val["filename"] = filename
-
-    if not ignore_existing_url:
+    if not ignore_existing_url and filename is not None:
         #Check if video (path) is in db
         logger.debug("Check if file already exists in db")
         
         file_in_db = fetch_value("items", {"file_path": path, "file_name": filename}, ["file_path"], True)
-        if file_in_db is not None:
+        #A known file that is missing on your FS is downloaded again
+        if file_in_db is not None and os.path.isfile(return_val["full_file_path"]):
             logging.info("Video already exists in DB! - check if url exist")
             
             url_is_in_db = check_is_url_in_items_db(url, filename, path)
@@ -970,41 +1440,45 @@ def download_file(url, path, metadata=None, ignore_existing_url=False, output_fo
 
     
     
-    logger.info("File %s dont exist in DB", full_file_path)
+    logger.info("File %s dont exist in DB", expected_file["stem"])
 
     logger.info("Downloading file from server")
 
 
     try:
-        ydl_opts = get_ydl_opts(path, None, output_format)
-
-        #Fetch metadata if not passed
-        if metadata is None:
-            metadata = get_metadata(url, ydl_opts)
-
-        if not metadata or "title" not in metadata or "ext" not in metadata:
+        ydl_opts = get_ydl_opts(path, None, output_format, scheme)
+
+        if ydl_opts.get("continuedl", True):
+            return_val["resumed_bytes"] = get_partial_download_size(
+                os.path.join(path, expected_file["stem"]))
+            if return_val["resumed_bytes"] > 0:
+                logger.info("Resume interrupted download of %s (%i bytes already downloaded)",
+                            filename, return_val["resumed_bytes"])
+
+        #Extract and download in one step - the full metadata are only fetched here
+        with timed("ydl.download"), ydl_pool.borrow(ydl_opts) as ydl, \
+             bandwidth_scheduler.limited_download(bandwidth_group, ydl):
+            downloaded_info = ydl.extract_info(url, download=True)
+            if downloaded_info:
+                metadata = ydl.sanitize_info(downloaded_info)
+
+        if not downloaded_info or not metadata or "title" not in metadata or "ext" not in metadata:
             #Line Break for Pylint #C0301
-            logger.error("""Error while fetching metadata from target server! -
-                         Metadata could not be fetched or key \"title\" / \"ext\" is missing""")
+            logger.error("""Error while downloading %s! -
+                         Metadata could not be fetched or key \"title\" / \"ext\" is missing""", url)
             return return_val
 
-        with YoutubeDL(ydl_opts) as ydl:
-            value = ydl.download([url])
-
-        #https://github.com/yt-dlp/yt-dlp/issues/4262
-        if value == 0 or value == 1 or value == 100:
-            #Line Break for Pylint #C0301
-            full_file_path = YoutubeDL(ydl_opts).prepare_filename(metadata,
-                                                                  outtmpl=path +
-                                                                  '/%(title)s.%(ext)s')
+        with timed("prepare_filename"):
+            full_file_path = ydl_pool.prepare_filename(ydl_opts, metadata,
+                                                       path + '/%(title)s.%(ext)s')
 
-            full_file_path = os.path.abspath(full_file_path)
-            return_val["status"] = True
-            return_val["full_file_path"] = full_file_path
-            return_val["metadata"] = metadata
+        full_file_path = os.path.abspath(full_file_path)
+        file_name = os.path.basename(full_file_path)
+        file_index[os.path.splitext(file_name)[0]] = file_name
+        return_val["status"] = True
+        return_val["full_file_path"] = full_file_path
+        return_val["metadata"] = metadata
 
-            return return_val
-        logger.error("YDL reported code %s", value)
         return return_val
     except DownloadError as e:
         logger.error("Error while downloading video!- Error: %s", e)
@@ -1015,13 +1489,26 @@ def download_missing():
         This function iterates over all subscriptions and download missing videos
         (has_new_data = 1 or download count < plalist_content_count)
         The function does NOT check for new Videos on the playlist.
-        It utilizes the metadata column from the db! -
+        It utilizes the entries of the subscriptions (subscription_entries) from the db! -
+        Only entries which are not linked to a downloaded item are checked.
         To fetch actual data the function update_subscriptions() should be called!
 
+        Missing videos are added to the download queue (download_jobs table) and downloaded
+        after all subscriptions are checked. Entries that are already queued (e.g. from an
+        interrupted run) are not checked again.
+
+        A video that is in multiple subscriptions (same extractor and video id) is only
+        extracted and downloaded once per run. The entries of the other subscriptions are
+        linked to the same item.
+
+        Probable duplicates (predict_duplicate()) are skipped or deferred depending on the
+        option "duplicate_prediction".
+
         Return Value: bool
         - True (Successfully downlaoded all files)
         - False (Error while downlaoding files)
     """
+    from prettytable import PrettyTable
     logger.info("Download all missing videos...")
 
     subscriptions = fetch_value("subscriptions", None,
@@ -1031,17 +1518,38 @@ def download_missing():
                                  "downloaded_content_count",
                                  "subscription_content_count",
                                  "subscription_has_new_data",
-                                 "current_subscription_data",
-                                 "output_format"], None, "ORDER BY scheme")
+                                 "id",
+                                 "output_format",
+                                 "priority"], None, "ORDER BY priority DESC, scheme")
 
     if not subscriptions:
         logger.error("Error while fetching subscriptions!")
         return False
     failed_downloads = {}
-    current_subscription = ""
+    downloaded_counts = {}
+    #Videos checked in this run {(extractor, video_id): {"item_id": int|None, "url": str|None,
+    # "dst_path": str, "subscription": "<<subscription_name>>",
+    # "entries": [(entry_id, "<<subscription_name>>")]}}
+    #url is set if the video is in the download queue - item_id and url are None if it failed
+    run_videos = {}
+
+    duplicate_prediction = get_duplicate_prediction_mode()
+    if duplicate_prediction != "off":
+        #Items saved before the fingerprints existed
+        backfill_meta_fingerprints()
+    skipped_duplicates = 0
+    avoided_bytes = 0
     for subscription in subscriptions:
+        #A worker holds the lease of one subscription at a time
+        release_lease("subscriptions")
+        if SHUTDOWN_EVENT.is_set():
+            logger.info("Shutdown requested - Stop checking subscriptions")
+            break
+        if not claim_lease("subscriptions", subscription[6]):
+            logger.info("Subscription %s is processed by another worker - Skip", subscription[1])
+            continue
         try:
-            output_filter = json.loads(subscription[7])
+            output_filter = json.loads(subscription[7]) if subscription[7] else None
         except json.JSONDecodeError:
             output_filter = None
             logger.error("Error while convertig output format attribute of subscription %s to json!", subscription[1])
@@ -1054,34 +1562,102 @@ def download_missing():
             continue
         #Downlaod data
         logger.info("Download content from %s", subscription[1])
-        current_subscription = subscription[1]
-        #try to load the json metadata from db
-        try:
-            metadata = json.loads(subscription[6])
-        except json.JSONDecodeError:
-            logger.error("Error while decoding data from db for subscription %s", subscription[1])
-            continue
-
-        #Iterate over all Videos from the playlist
-        if not "entries" in metadata or not "playlist_count" in metadata:
-            logger.error("Error while downloading content from %s! - Missing keys",
-                         subscription[1])
+        #Subscriptions checked before the entries table existed - fill it once from the metadata
+        if not seed_subscription_entries(subscription[6]):
+            logger.error("Error while loading the entries of %s!", subscription[1])
             continue
 
         subscription_path = prepare_scheme_dst_data(subscription[2], True)
+        redownload_missing_files = fetch_value_as_bool("config",
+                                    {"option_name": "automatically_redownload_missing_files"},
+                                    ["option_value"], True)
 
         if not subscription_path["status"] or not subscription_path["dst_path"]:
             logger.error("Error while deciding storage path for subscription %s!",
                           subscription[1])
             continue
 
-        for entry in metadata["entries"]:
+        if redownload_missing_files:
+            unlinked_entries = unlink_missing_entries(subscription[6], subscription_path["dst_path"])
+            if unlinked_entries:
+                logger.info("%i files of %s don't exist on your FS anymore", unlinked_entries,
+                            subscription[1])
+
+        linked_entries = fetch_value("subscription_entries",
+                                     {"subscription_id": subscription[6],
+                                      "downloaded_item_id": NOT_NULL}, ["COUNT(id)"], True)
+        downloaded = linked_entries[0] if linked_entries else 0
+        missing_entries = fetch_value("subscription_entries",
+                                      {"subscription_id": subscription[6],
+                                       "downloaded_item_id": IS_NULL},
+                                      ["id", "url", "title", "extractor", "video_id"], False,
+                                      "ORDER BY position")
+        if missing_entries is False:
+            logger.error("Error while fetching the entries of %s!", subscription[1])
+            continue
+
+        #Existing files of the subscription (filename without extension -> filename)
+        file_index = create_file_index(subscription_path["dst_path"])
+        #Options to predict the filenames - the same for all entries of the subscription
+        filename_opts = get_ydl_opts(subscription_path["dst_path"])
+        progress = create_progress_logger(f"Checked entries of {subscription[1]}",
+                                          len(missing_entries), progress_logger=logger)
+        for entry_index, (entry_id, entry_url, entry_title, entry_extractor,
+                          entry_video_id) in enumerate(missing_entries, start=1):
+            progress(entry_index)
+            entry = {"url": entry_url, "title": entry_title}
             #Check each entry if it already exist before downloading,
             #using the title and the link
-            if not "title" in entry or not "url" in entry:
+            if entry["title"] is None:
                 logger.error("Entry misses needed keys! - SKIP")
                 continue
 
+            #Entries without a video id can only be matched by their url
+            video_key = (entry_extractor, entry_video_id) if entry_extractor and entry_video_id \
+                        else (None, entry["url"])
+            video_work = run_videos.get(video_key)
+            if video_work is None and video_key[0] is not None:
+                #Downloaded by another subscription in a previous run
+                shared_item_id = get_video_item(*video_key, check_file=redownload_missing_files)
+                if shared_item_id is not None:
+                    video_work = run_videos[video_key] = {"item_id": shared_item_id, "url": None}
+
+            if video_work is not None:
+                logger.debug("Entry %s was already checked for another subscription - SKIP",
+                             entry["title"])
+                metrics.inc_counter("ytdl_shared_entries_total")
+                if video_work["item_id"] is not None:
+                    downloaded += 1
+                    link_subscription_entry(entry_id, video_work["item_id"])
+                elif video_work["url"] is not None:
+                    video_work["entries"].append((entry_id, subscription[1]))
+                else:
+                    failed_downloads[subscription[1]].append(entry["title"])
+                continue
+            #Until the entry is queued or linked - the video failed
+            run_videos[video_key] = {"item_id": None, "url": None}
+
+            #Check if the entry is already in the download queue
+            download_job = fetch_download_job(entry["url"], subscription_path["dst_path"])
+
+            if download_job is not None and download_job[1] in ("queued", "running"):
+                logger.debug("Entry %s is already queued - SKIP", entry["title"])
+                run_videos[video_key] = {"item_id": None, "url": entry["url"],
+                                         "dst_path": subscription_path["dst_path"],
+                                         "subscription": subscription[1],
+                                         "entries": [(entry_id, subscription[1])]}
+                continue
+
+            if download_job is not None and download_job[1] == "done":
+                if not redownload_missing_files or check_file_exist(download_job[2]):
+                    downloaded += 1
+                    item_id = get_item_id_by_path(download_job[2])
+                    link_subscription_entry(entry_id, item_id)
+                    run_videos[video_key]["item_id"] = item_id
+                    continue
+                logger.info("""File %s was downloaded before but does not exist on your FS!
+                            File will be redownloaded...""", entry["title"])
+
             #To do all the work, the scheme is needed
             entry_scheme = load_scheme(entry["url"])
 
@@ -1098,16 +1674,20 @@ def download_missing():
                 failed_downloads[subscription[1]].append(entry["title"])
                 continue
 
-            file_metadata = get_metadata(entry["url"], get_ydl_opts(expected_path, format_filter=output_filter))
+            #Only probe - the full extraction is done if the file is downloaded
+            file_metadata = get_metadata(entry["url"], get_ydl_opts(expected_path, format_filter=output_filter,
+                                                                    scheme=entry_scheme["scheme"],
+                                                                    probe=True), probe=True)
 
             if file_metadata is None:
                 logger.error("Error while fetching metadata! - Skip item %s", entry["title"])
                 failed_downloads[subscription[1]].append(entry["title"])
                 continue
 
-            expected_filename = get_expected_filepath(file_metadata, expected_path)
+            expected_filename = get_expected_filepath(file_metadata, expected_path, file_index,
+                                                      filename_opts)
 
-            if not expected_filename["filename"]:
+            if expected_filename is None:
                 logger.error("Error while fetching filename for %s! - Skip item", entry["title"])
                 failed_downloads[subscription[1]].append(entry["title"])
                 continue
@@ -1115,10 +1695,12 @@ def download_missing():
             #This bool is used to decide if the current entry will be downloaded
             download_file_now = True
 
-            file_already_exist_in_db = fetch_value("items", [
-                {"file_name" : expected_filename["filename"]},
-                {"url": entry["url"]}],
-                ["id", "url", "tags", "data"], True)
+            #Without a known filename (no file with this title) only the url can match
+            existing_conditions = [{"url": entry["url"]}]
+            if expected_filename["filename"]:
+                existing_conditions.insert(0, {"file_name" : expected_filename["filename"]})
+            file_already_exist_in_db = fetch_value("items", existing_conditions,
+                                                   ["id", "url", "tags", "data"], True)
 
             if(file_already_exist_in_db is not None and
                file_already_exist_in_db is not False and
@@ -1128,28 +1710,29 @@ def download_missing():
                 #Check if missing files should be redownlaoded automatically. If so do it here...
                 # This function is also used in the check() function but only based on
                 # db entries!
-                redownload_missing_files = fetch_value_as_bool("config",
-                                    {"option_name": "automatically_redownload_missing_files"},
-                                    ["option_value"], True)
-
                 if redownload_missing_files:
                     logger.debug("""File %s already exist on db! -
                              Redownload is enabled check for File on FS...""", entry["title"])
 
-                    expected_file_path = os.path.join(expected_path, expected_filename["filename"])
-                    file_already_exist_on_fs = os.path.isfile(expected_file_path)
+                    file_already_exist_on_fs = expected_filename["filename"] is not None and \
+                        os.path.isfile(os.path.join(expected_path, expected_filename["filename"]))
                     if not file_already_exist_on_fs:
                         logger.info("""File %s already exists on db but not on your FS!
                                     File will be redownloaded...""", entry["title"])
+                        download_file_now = True
                     else:
                         logger.debug("File also exist on FS - SKIP")
                         download_file_now = False
                         downloaded += 1
+                        link_subscription_entry(entry_id, file_already_exist_in_db[0])
+                        run_videos[video_key]["item_id"] = file_already_exist_in_db[0]
                 else:
                     #Since files should not be redownloaded we will assume that the file exist
                     #on FS.
                     downloaded += 1
                     download_file_now = False
+                    link_subscription_entry(entry_id, file_already_exist_in_db[0])
+                    run_videos[video_key]["item_id"] = file_already_exist_in_db[0]
 
                 #Check if all data are existing for the current file
                 # url = file_already_exist_in_db[1], tags = 2, data = 3
@@ -1166,19 +1749,77 @@ def download_missing():
             if not download_file_now:
                 continue
 
-            file_downloaded = direct_download(entry["url"], subscription_path, output_format=output_filter)
+            job_priority = subscription[8]
+            #A missing file (known item) must not be predicted as duplicate of itself
+            known_item_id = file_already_exist_in_db[0] if file_already_exist_in_db else None
+            predicted_duplicate = predict_duplicate(file_metadata, known_item_id) \
+                                  if duplicate_prediction != "off" else {"status": False}
+            if predicted_duplicate["status"]:
+                metrics.inc_counter("ytdl_predicted_duplicates_total",
+                                    labels={"action": duplicate_prediction})
+                if duplicate_prediction == "skip":
+                    logger.info("%s is probably a duplicate of %s - SKIP", entry["title"],
+                                predicted_duplicate["full_file_path"])
+                    downloaded += 1
+                    link_subscription_entry(entry_id, predicted_duplicate["item_id"])
+                    run_videos[video_key]["item_id"] = predicted_duplicate["item_id"]
+                    skipped_duplicates += 1
+                    avoided_bytes += predicted_duplicate["size"]
+                    metrics.inc_counter("ytdl_avoided_duplicate_bytes_total",
+                                        predicted_duplicate["size"])
+                    continue
+                logger.info("%s is probably a duplicate of %s - Download is deferred",
+                            entry["title"], predicted_duplicate["full_file_path"])
+                job_priority = DEFERRED_JOB_PRIORITY
+
+            job_added = enqueue_download_job(entry["url"], subscription_path, output_filter,
+                                             subscription[1], entry["title"], job_priority,
+                                             get_upload_timestamp(file_metadata))
 
-            if not file_downloaded:
+            if not job_added:
                 #Append to the current subscription error log
                 failed_downloads[subscription[1]].append(entry["title"])
                 continue
-            logger.info("File %s successfully downloaded", entry["title"])
-            downloaded += 1
+            run_videos[video_key] = {"item_id": None, "url": entry["url"],
+                                     "dst_path": subscription_path["dst_path"],
+                                     "subscription": subscription[1],
+                                     "entries": [(entry_id, subscription[1])]}
+
+        downloaded_counts[subscription[1]] = downloaded
+    release_lease("subscriptions")
+
+    if skipped_duplicates:
+        logger.info("Skipped %i probable duplicates - %.1f MB not downloaded", skipped_duplicates,
+                    avoided_bytes / 1048576)
 
+    #All subscriptions checked - download all queued files
+    processed_jobs = process_download_jobs()
+
+    for subscription_name, failed_titles in processed_jobs["failed"].items():
+        failed_downloads.setdefault(subscription_name, []).extend(failed_titles)
+
+    #Link the entries to the downloaded files - they are not checked again
+    for video_work in run_videos.values():
+        if video_work["url"] is None:
+            continue
+        download_job = fetch_download_job(video_work["url"], video_work["dst_path"])
+        if download_job is None or download_job[1] != "done":
+            continue
+        item_id = get_item_id_by_path(download_job[2])
+        if item_id is None:
+            continue
+        for entry_id, subscription_name in video_work["entries"]:
+            link_subscription_entry(entry_id, item_id)
+            #The download is counted for the subscription of the job
+            if subscription_name != video_work["subscription"]:
+                downloaded_counts[subscription_name] = downloaded_counts.get(subscription_name, 0) + 1
+
+    for subscription_name, downloaded in downloaded_counts.items():
+        downloaded += processed_jobs["done"].get(subscription_name, 0)
         #Modify the "downloaded_content_count" column in db
         value_modified = update_value("subscriptions",
                                       {"downloaded_content_count": str(downloaded)},
-                                      {"subscription_name" : str(current_subscription)})
+                                      {"subscription_name" : str(subscription_name)})
 
         if not value_modified:
             logger.error("Error while modifing downlaoded content value")
@@ -1202,87 +1843,738 @@ def download_missing():
         return True
     return False
 
-################# DB functions
+################# Download queue
 
-def save_file_to_db(scheme_data, full_file_path, file_hash, url, metadata):
-    """ This function is used to save a file into the items table. It is basically
-        an SQL Insert wrapper
+def enqueue_download_job(url:str, prepared_data:dict, output_format:list[str] = None,
+                         subscription_name:str = None, title:str = None, priority:int = 0,
+                         upload_timestamp:int = 0):
+    """ This function adds a file to the download queue (download_jobs table).
+        The parameter "prepared_data" is from prepare_scheme_dst_data()!
+        If there is already a job for the url and path, the job is reused. A job that is
+        inserted by another worker at the same time is kept (unique index on url and path).
+        priority (of the subscription) and upload_timestamp define the order of the queue.
 
-        Return Value: dict
-        {
-            "status": False -> Operation successfull? - Use it as probe
-            "hash_exist": False -> Does the hash already exist in db?
-            "file_id": 1 -> ID of the file with the same  hash
-            "file_name": "hello.mp4" -> Name of the file with the same hash value
-            "file_path": "/path/to/file" -> Path to the file
-        }
+        Return Value: bool
+        - True (Job is queued)
+        - False (Failed - SQL Error or job failed too often)
     """
-    return_val = {
-        "status": False,
-        "hash_exist": False,
-        "file_id": None,
-        "file_name": None,
-        "file_path": None
-    }
-    #Video hash not exist as saved item add it...
-    logger.info("Add Video to DB")
-    scheme_path = scheme_data["scheme_path"]
+    dst_path = prepared_data["dst_path"]
+    existing_job = fetch_download_job(url, dst_path)
 
-    hash_exist = fetch_value("items", {"file_hash": file_hash}, ["id", "file_name", "file_path"], True)
-    if hash_exist is not None:
-        logger.debug("File hash already exist in DB! - Skip saving File")
-        return_val["file_id"] = hash_exist[0]
-        return_val["file_name"] = hash_exist[1]
-        return_val["file_path"] = hash_exist[2]
-        return_val["hash_exist"] = True
-        return_val["status"] = True
+    if existing_job is not None:
+        if existing_job[1] in ("queued", "running"):
+            logger.debug("Job for %s is already queued", url)
+            return True
+        if existing_job[1] == "failed" and existing_job[3] >= get_download_job_max_attempts():
+            logger.error("Download of %s failed %i times! - Job will not be queued again",
+                         url, existing_job[3])
+            return False
 
+        attempts = existing_job[3] if existing_job[1] == "failed" else 0
+        return update_value("download_jobs",
+                            {"state": "queued", "attempts": attempts, "priority": priority or 0,
+                             "upload_timestamp": upload_timestamp, "updated": get_current_time()},
+                            {"id": existing_job[0]})
 
-    head, tail = os.path.split(full_file_path)
-    logger.debug("Scheme Data: %s", scheme_path)
-    #Line Break for Pylint #C0301
-    use_tags_ydl = fetch_value_as_bool("config", {"option_name": "use_tags_from_ydl"},
-                                       ["option_value"], True)
-    #Define base data
-    video_data = {
-        "scheme": scheme_data["scheme"]["schema_name"],
-        "file_name": tail,
-        "file_path": head,
-        "file_hash": file_hash,
+    job = {
         "url": url,
-        "data": metadata
+        "title": title,
+        "scheme": prepared_data["scheme"]["schema_name"],
+        "dst_path": dst_path,
+        "subscription_name": subscription_name,
+        "output_format": json.dumps(output_format) if output_format is not None else None,
+        "state": "queued",
+        "priority": priority or 0,
+        "upload_timestamp": upload_timestamp,
+        "updated": get_current_time()
     }
-    if use_tags_ydl and metadata is not None:
-        logger.info("Also insert tags from ydl metadata")
-        if "tags" in metadata:
-            logger.debug("Found key 'tags'")
-            if len(metadata["tags"]) > 0:
-                logger.debug("Tags found...")
-                video_data["tags"] = metadata["tags"]
-            else:
-                logger.debug("Tags array is empty!")
-        else:
-            logger.debug("No tags key found in metadata")
-    else:
-        logger.info("Tags are not inserted from ydl")
-    video_registered = insert_value("items", video_data)
-    if not video_registered:
-        logger.error("Error while saving file to db!! - Please check log.")
-        #Line Break for Pylint #C0301
-        remove_file = fetch_value_as_bool("config", {"option_name":
-                                                     "remove_file_on_post_process_error"},
-                                          ["option_value"], True)
-        if remove_file:
-            logger.info("Remove file due to config setting.")
-            os.remove(full_file_path)
-            if os.path.exists(full_file_path):
-                #Line Break for Pylint #C0301
-                logger.error("""Error while removing video after post processing error! -
-                              Check permissions""")
-            return return_val
-        logger.warning("File will not be removed! - Be cautious, the file is not saved in the db!")
+    job_added = upsert_values("download_jobs", list(job), [tuple(job.values())],
+                              ["url", "dst_path"], update_existing=False)
+    if not job_added:
+        logger.error("Error while adding %s to the download queue!", url)
+        return False
+    logger.info("%s added to the download queue", title if title is not None else url)
+    return True
+
+def fetch_download_job(url:str, dst_path:str):
+    """ This function fetches the download job for an url and destination path
+
+        Return Value: tuple|None
+        - (id, state, file_path, attempts) -> Job exists
+        - None -> No job exists
+    """
+    download_job = fetch_value("download_jobs", {"url": url, "dst_path": dst_path},
+                               ["id", "state", "file_path", "attempts"], True)
+    if not download_job:
+        return None
+    return download_job
+
+def remove_duplicate_download_jobs():
+    """ This function removes download jobs with the same url and destination path - only the
+        oldest job is kept. They can exist in dbs created before the unique index.
+
+        Return Value: int - Number of removed jobs
+    """
+    duplicate_jobs = fetch_value("download_jobs", None, ["url", "dst_path", "MIN(id)"], False,
+                                 "GROUP BY url, dst_path HAVING COUNT(id) > 1")
+    removed_jobs = 0
+    for url, dst_path, kept_job_id in duplicate_jobs or []:
+        job_ids = [job_id for job_id, in fetch_value("download_jobs",
+                                                     {"url": url, "dst_path": dst_path}, ["id"])
+                   if job_id != kept_job_id]
+        if delete_value("download_jobs", {"id": job_ids}):
+            removed_jobs += len(job_ids)
+    if removed_jobs:
+        logger.info("Removed %i duplicate download jobs", removed_jobs)
+    return removed_jobs
+
+def get_download_job_max_attempts():
+    """ This function returns how often a download job is tried before it stays failed
+        (option "download_job_max_attempts" - Default 3)
+
+        Return Value: int
+    """
+    max_attempts = fetch_value("config", {"option_name": "download_job_max_attempts"},
+                               ["option_value"], True)
+    try:
+        return int(max_attempts[0])
+    except (TypeError, ValueError, IndexError):
+        logger.warning("Can't read option download_job_max_attempts! - Use default (3)")
+        return 3
+
+def get_download_workers():
+    """ This function returns the number of parallel downloads of the queue
+        (option "download_workers" - Default 1)
+
+        Return Value: int
+    """
+    workers = fetch_value("config", {"option_name": "download_workers"}, ["option_value"], True)
+    try:
+        return max(int(workers[0]), 1)
+    except (TypeError, ValueError, IndexError):
+        logger.warning("Can't read option download_workers! - Use default (1)")
+        return 1
+
+def get_group_commit_options():
+    """ This function returns the options of the group commit of parallel downloads
+        (options "db_group_commit_delay" (milliseconds - Default 5) and
+        "db_group_commit_size" (writes - Default 100))
+
+        Return Value: tuple (delay_ms, max_writes)
+    """
+    options = []
+    for option_name, default in (("db_group_commit_delay", 5), ("db_group_commit_size", 100)):
+        value = fetch_value("config", {"option_name": option_name}, ["option_value"], True)
+        try:
+            options.append(max(int(value[0]), 0))
+        except (TypeError, ValueError, IndexError):
+            logger.warning("Can't read option %s! - Use default (%i)", option_name, default)
+            options.append(default)
+    return tuple(options)
+
+def configure_bandwidth():
+    """ This function passes the bandwidth budget to the scheduler
+        (options "bandwidth_limit" (bytes per second, 0 = unlimited) and
+        "bandwidth_windows" (json list of time of day windows))
+
+        Return Value: bool
+        - True -> Budget configured
+        - False -> Invalid options - The invalid part is ignored (see log)
+    """
+    valid_config = True
+    limit = fetch_value("config", {"option_name": "bandwidth_limit"}, ["option_value"], True)
+    try:
+        limit = int(limit[0])
+    except (TypeError, ValueError, IndexError):
+        logger.warning("Can't read option bandwidth_limit! - Use default (0 - unlimited)")
+        limit = 0
+        valid_config = False
+
+    windows = fetch_value("config", {"option_name": "bandwidth_windows"}, ["option_value"], True)
+    try:
+        windows = json.loads(windows[0]) if windows and windows[0] else []
+    except json.JSONDecodeError as e:
+        logger.error("Can't read option bandwidth_windows! - Error: %s", e)
+        windows = []
+        valid_config = False
+
+    def get_local_time():
+        current_time = get_current_time()
+        if current_time == -1:
+            return datetime.now()
+        return datetime.strptime(current_time, "%Y-%m-%d %H:%M:%S")
+
+    if not bandwidth_scheduler.configure(limit, windows, get_local_time):
+        valid_config = False
+    if bandwidth_scheduler.is_limited():
+        logger.debug("Bandwidth budget: %i B/s (%i time windows)", limit, len(windows))
+    return valid_config
+
+def get_download_fairness_cap():
+    """ This function returns how many jobs of one subscription are downloaded before the
+        other subscriptions get their turn (option "download_fairness_cap" - Default 5)
+
+        Return Value: int
+    """
+    fairness_cap = fetch_value("config", {"option_name": "download_fairness_cap"},
+                               ["option_value"], True)
+    try:
+        return max(int(fairness_cap[0]), 1)
+    except (TypeError, ValueError, IndexError):
+        logger.warning("Can't read option download_fairness_cap! - Use default (5)")
+        return 5
+
+def get_duplicate_prediction_mode():
+    """ This function returns what download_missing() does with probable duplicates (same video
+        key or metadata fingerprint as a saved item) - option "duplicate_prediction":
+        - off -> Download them (duplicates are found by the hash after the download)
+        - skip -> Don't download them - the entry is linked to the saved item
+        - defer -> Download them after all other jobs
+
+        Return Value: str
+    """
+    mode = fetch_value("config", {"option_name": "duplicate_prediction"}, ["option_value"], True)
+    try:
+        mode = mode[0].strip().lower()
+    except (TypeError, AttributeError, IndexError):
+        mode = None
+    if mode not in DUPLICATE_PREDICTION_MODES:
+        logger.warning("Can't read option duplicate_prediction! - Use default (off)")
+        return "off"
+    return mode
+
+def get_upload_timestamp(metadata:dict):
+    """ This function returns the upload time of a video as unix timestamp
+        ("timestamp" or "upload_date" (YYYYMMDD) of the metadata)
+
+        Return Value: int - 0 if unknown
+    """
+    if not metadata:
+        return 0
+    if isinstance(metadata.get("timestamp"), (int, float)):
+        return int(metadata["timestamp"])
+    try:
+        return int(datetime.strptime(str(metadata["upload_date"]), "%Y%m%d").timestamp())
+    except (KeyError, ValueError, OverflowError):
+        return 0
+
+def create_download_queue():
+    """ This function creates the download order of all queued jobs as heap.
+        Jobs are ordered by round, priority (of the subscription) and upload time (newest
+        first). Each subscription can add "download_fairness_cap" jobs per round - so a big
+        back catalogue can't block new videos of other subscriptions. Deferred jobs
+        (DEFERRED_JOB_PRIORITY) are added in an own round after all other jobs.
+        Running jobs with an expired lease (the worker died) are queued again.
+
+        Return Value: list|None
+        - [(round, -priority, -upload_timestamp, id)] -> heap (use heapq.heappop())
+        - None -> SQL Error
+    """
+    job_columns = ["id", "subscription_name", "priority", "upload_timestamp"]
+    current_time = int(time.time())
+    queued_jobs = fetch_value("download_jobs", {"state": "queued"}, job_columns)
+    running_jobs = fetch_value("download_jobs", {"state": "running"},
+                               job_columns + ["lease_expires"])
+    if queued_jobs is False or queued_jobs is None or running_jobs is False:
+        logger.error("Error while fetching queued download jobs!")
+        return None
+    #Only a few jobs are running (one per worker) - check their lease here
+    queued_jobs += [job[:4] for job in running_jobs or [] if job[4] < current_time]
+
+    fairness_cap = get_download_fairness_cap()
+    jobs_per_subscription = {}
+    deferred_jobs = []
+    for job in queued_jobs:
+        if job[2] == DEFERRED_JOB_PRIORITY:
+            deferred_jobs.append(job)
+            continue
+        jobs_per_subscription.setdefault(job[1], []).append(
+            (-(job[2] or 0), -(job[3] or 0), job[0]))
+
+    download_queue = []
+    last_round = 0
+    for subscription_jobs in jobs_per_subscription.values():
+        subscription_jobs.sort()
+        for index, (priority, upload_timestamp, job_id) in enumerate(subscription_jobs):
+            download_queue.append((index // fairness_cap, priority, upload_timestamp, job_id))
+            last_round = max(last_round, index // fairness_cap)
+    #Probable duplicates are downloaded after all other jobs
+    for job in deferred_jobs:
+        download_queue.append((last_round + 1, -job[2], -(job[3] or 0), job[0]))
+    heapq.heapify(download_queue)
+    return download_queue
+
+def claim_download_job(download_queue:list):
+    """ This function claims the next queued download job of the download queue
+        (see create_download_queue()) (state queued -> running) with a lease of this worker.
+        The claim is one conditional update - if another worker (thread or process) claimed
+        the job first, the next job of the queue is used.
+
+        Return Value: tuple|None
+        - (id, url, title, scheme, dst_path, subscription_name, output_format, attempts)
+        - None -> No job in queue
+    """
+    while True:
+        #The queue is shared by all download workers (threads) of process_download_jobs()
+        with DOWNLOAD_QUEUE_LOCK:
+            if not download_queue:
+                return None
+            job_id = heapq.heappop(download_queue)[3]
+        next_job = fetch_value("download_jobs", {"id": job_id},
+                               ["id", "url", "title", "scheme", "dst_path", "subscription_name",
+                                "output_format", "attempts"], True)
+        if not next_job:
+            continue
+
+        current_time = int(time.time())
+        job_claimed = update_value_if("download_jobs",
+                                      {"state": "running", "attempts": next_job[7] + 1,
+                                       "lease_owner": WORKER_ID,
+                                       "lease_expires": current_time + get_lease_duration(),
+                                       "updated": get_current_time()},
+                                      "id = ? AND attempts = ? AND (state = 'queued' OR "
+                                      "(state = 'running' AND lease_expires < ?))",
+                                      [job_id, next_job[7], current_time])
+        if job_claimed is None:
+            logger.error("Error while claiming download job %s!", job_id)
+            return None
+        if job_claimed:
+            start_lease_heartbeat()
+            return next_job
+        logger.debug("Download job %s was claimed by another worker - Skip", job_id)
+
+def run_download_job(job:tuple, file_indexes:dict=None):
+    """ This function downloads one claimed job and saves the result in the job.
+        file_indexes {"<<dst_path>>": file index} are shared by all jobs of a run - the index
+        of each destination path is only created once (see create_file_index())
+
+        Return Value: dict
+        {
+            "status": False, -> Job state successfully saved? - Use it as probe
+            "downloaded": False, -> File successfully downloaded?
+            "lease_lost": False, -> The job was taken over by another worker (result dropped)
+            "subscription_name": "custom",
+            "title": "<<title>>"
+        }
+    """
+    job_id, url, title, scheme_name, dst_path, subscription_name, output_format, attempts = job
+    if title is None:
+        title = url
+    if subscription_name is None:
+        subscription_name = "custom"
+    return_val = {"status": False, "downloaded": False, "lease_lost": False,
+                  "subscription_name": subscription_name, "title": title}
+    logger.info("Download %s (attempt %i)", title, attempts + 1)
+
+    last_error = None
+    downloaded = {"status": False, "full_file_path": None, "resumed_bytes": 0, "lease_lost": False}
+    loaded_scheme = load_scheme_by_name(scheme_name)
+
+    if not loaded_scheme["status"]:
+        last_error = "Can't load scheme " + str(scheme_name)
+    else:
+        try:
+            output_filter = json.loads(output_format) if output_format else None
+        except json.JSONDecodeError:
+            logger.error("Error while loading output format of job %s! - Use global", job_id)
+            output_filter = None
+
+        prepared_data = {
+            "status": 1,
+            "scheme": loaded_scheme["scheme"],
+            "scheme_path": loaded_scheme["scheme_path"],
+            "dst_path": dst_path
+        }
+        file_index = None
+        if file_indexes is not None:
+            with FILE_INDEX_LOCK:
+                if dst_path not in file_indexes:
+                    file_indexes[dst_path] = create_file_index(dst_path)
+                file_index = file_indexes[dst_path]
+        #The profiler is entered outside of the try - its errors can't fail the job
+        with timed_item(title), profiled_item(title):
+            try:
+                downloaded = download_and_register(url, prepared_data, output_filter,
+                                                   bandwidth_group=subscription_name,
+                                                   file_index=file_index, job_id=job_id)
+                if not downloaded["status"]:
+                    last_error = "Error while downloading file! - Check log"
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logger.error("Unexpected error while downloading %s - Error: %s", url, e)
+                last_error = str(e)
+
+    if downloaded["lease_lost"]:
+        #The job state belongs to the other worker now
+        logger.warning("Lease of job %s expired while downloading %s - The result is dropped, "
+                       "the job is finished by another worker", job_id, title)
+        return_val["status"] = True
+        return_val["lease_lost"] = True
+        return return_val
+
+    if last_error is None:
+        return_val["downloaded"] = True
+        return_val["status"] = release_lease("download_jobs", job_id,
+                                             {"state": "done",
+                                              "file_path": downloaded["full_file_path"],
+                                              "resumed_bytes": downloaded["resumed_bytes"],
+                                              "last_error": "", "updated": get_current_time()})
+        logger.info("File %s successfully downloaded", title)
+        metrics.inc_counter("ytdl_downloads_total", labels={"scheme": scheme_name})
+        if downloaded["full_file_path"] and os.path.isfile(downloaded["full_file_path"]):
+            metrics.inc_counter("ytdl_downloaded_bytes_total",
+                                os.path.getsize(downloaded["full_file_path"]),
+                                {"scheme": scheme_name})
+        if downloaded["resumed_bytes"]:
+            metrics.inc_counter("ytdl_resumed_bytes_total", downloaded["resumed_bytes"],
+                                {"scheme": scheme_name})
+    else:
+        return_val["status"] = release_lease("download_jobs", job_id,
+                                             {"state": "failed", "last_error": last_error,
+                                              "updated": get_current_time()})
+        metrics.inc_counter("ytdl_download_failures_total", labels={"scheme": scheme_name})
+
+    if not return_val["status"]:
+        logger.error("Error while updating state of download job %s!", job_id)
+    return return_val
+
+def process_download_jobs():
+    """ This function is the worker loop of the download queue. It claims all queued jobs
+        (order see create_download_queue()) and downloads them with "download_workers"
+        parallel workers. All workers share the bandwidth budget (see configure_bandwidth()).
+        Jobs of this worker that are still marked as "running" are from an interrupted call and
+        are queued again before the loop starts - also the ones of dead processes on this host
+        (see release_dead_worker_leases()). Jobs of other workers are only taken over
+        if their lease expired (see claim_download_job()).
+
+        Return Value: dict
+        {
+            "status": False, -> All jobs successfully downloaded? - Use it as probe
+            "done": {"<<subscription_name>>": 1}, -> Number of downloaded files per subscription
+            "failed": {"<<subscription_name>>": ["<<title>>"]} -> Failed files per subscription
+        }
+    """
+    return_val = {"status": False, "done": {}, "failed": {}}
+
+    interrupted_jobs_reset = release_lease("download_jobs", data={"state": "queued"})
+    if not interrupted_jobs_reset:
+        logger.error("Error while resetting interrupted download jobs!")
+        return return_val
+    #Jobs of a crashed process of this host (other pid) - don't wait until the lease expires
+    release_dead_worker_leases()
+
+    download_queue = create_download_queue()
+    if download_queue is None:
+        return return_val
+
+    configure_bandwidth()
+    workers = get_download_workers()
+    results_lock = threading.Lock()
+    #Index of the files of each destination path - created once per run
+    file_indexes = {}
+
+    def download_worker():
+        """ Claim and download jobs until the queue is empty
+
+            Return Value: bool - Error occured?
+        """
+        error_occured = False
+        job = claim_download_job(download_queue)
+        while job is not None:
+            if SHUTDOWN_EVENT.is_set():
+                logger.info("Shutdown requested - Remaining jobs are downloaded with the next run")
+                release_lease("download_jobs", job[0], {"state": "queued"})
+                break
+
+            result = run_download_job(job, file_indexes)
+            if result["lease_lost"]:
+                job = claim_download_job(download_queue)
+                continue
+            subscription_name = result["subscription_name"]
+            with results_lock:
+                if result["downloaded"]:
+                    return_val["done"][subscription_name] = return_val["done"].get(
+                        subscription_name, 0) + 1
+                else:
+                    return_val["failed"].setdefault(subscription_name, []).append(result["title"])
+            if not result["downloaded"]:
+                error_occured = True
+            if not result["status"]:
+                error_occured = True
+                break
+            update_queue_metrics()
+            job = claim_download_job(download_queue)
+        return error_occured
+
+    update_queue_metrics()
+    if workers == 1:
+        errors = [download_worker()]
+    else:
+        logger.info("Download queue with %i parallel workers", workers)
+        #The db writes of all workers are committed together
+        with group_commit(*get_group_commit_options()), \
+             ThreadPoolExecutor(max_workers=workers) as executor:
+            errors = list(executor.map(lambda _: download_worker(), range(workers)))
+
+    update_queue_metrics()
+    return_val["status"] = not any(errors)
+    return return_val
+
+def update_queue_metrics():
+    """ This function updates the metric ytdl_download_queue_depth (number of jobs per state)
+    """
+    job_states = fetch_value("download_jobs", None, ["state", "COUNT(id)"], False, "GROUP BY state")
+    if job_states is False:
+        return
+    job_states = dict(job_states or [])
+    for state in ("queued", "running", "failed"):
+        metrics.set_gauge("ytdl_download_queue_depth", job_states.get(state, 0), {"state": state})
+
+################# Worker leases
+
+def get_lease_duration():
+    """ This function returns how many seconds a lease is valid without being renewed
+        (option "lease_duration" - Default 300). A job or subscription of a dead worker is
+        taken over by other workers after this time.
+
+        Return Value: int
+    """
+    lease_duration = fetch_value("config", {"option_name": "lease_duration"},
+                                 ["option_value"], True)
+    try:
+        return max(int(lease_duration[0]), 30)
+    except (TypeError, ValueError, IndexError):
+        logger.warning("Can't read option lease_duration! - Use default (300)")
+        return 300
+
+def claim_lease(table:str, row_id:int):
+    """ This function claims a row (e.g. a subscription) for this worker. A row can be claimed
+        if it has no lease, the lease expired or this worker already holds it.
+
+        Return Value: bool
+        - True -> Lease claimed
+        - False -> Another worker holds the lease / SQL Error
+    """
+    current_time = int(time.time())
+    lease_claimed = update_value_if(table,
+                                    {"lease_owner": WORKER_ID,
+                                     "lease_expires": current_time + get_lease_duration()},
+                                    "id = ? AND (lease_owner IS NULL OR lease_owner = '' OR "
+                                    "lease_owner = ? OR lease_expires < ?)",
+                                    [row_id, WORKER_ID, current_time])
+    if not lease_claimed:
+        return False
+    start_lease_heartbeat()
+    return True
+
+def renew_lease(table:str, row_id:int):
+    """ This function extends the lease of one row if this worker still holds it.
+        Use it before a result is saved - a worker whose lease expired must drop its result.
+
+        Return Value: bool
+        - True -> This worker holds the lease
+        - False -> The lease was taken over by another worker / SQL Error
+    """
+    return bool(update_value_if(table, {"lease_expires": int(time.time()) + get_lease_duration()},
+                                "id = ? AND lease_owner = ?", [row_id, WORKER_ID]))
+
+def release_lease(table:str, row_id:int=None, data:dict=None):
+    """ This function releases a lease of this worker and saves "data" in the same update.
+        Without row_id all leases of this worker in the table are released.
+
+        Return Value: bool
+        - True -> Released (or nothing to release if row_id is None)
+        - False -> The lease is held by another worker (it expired) / SQL Error
+    """
+    data = dict(data or {}, lease_owner="", lease_expires=0)
+    if row_id is None:
+        return update_value_if(table, data, "lease_owner = ?", [WORKER_ID]) is not None
+
+    lease_released = update_value_if(table, data, "id = ? AND lease_owner = ?",
+                                     [row_id, WORKER_ID])
+    if lease_released == 0:
+        logger.error("Lease of %s %s expired and was taken over by another worker!",
+                     table, row_id)
+    return bool(lease_released)
+
+def process_exists(pid:int):
+    """ This function checks if a process with the given pid is running on this host
+
+        Return Value: bool - True if it can't be checked
+    """
+    if os.name == "nt":
+        #os.kill() would terminate the process on Windows
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid) #PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            #ERROR_INVALID_PARAMETER -> No process with this pid
+            return kernel32.GetLastError() != 87
+        exit_code = ctypes.c_ulong()
+        kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))
+        kernel32.CloseHandle(handle)
+        return exit_code.value == 259 #STILL_ACTIVE
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+def is_dead_local_worker(lease_owner:str):
+    """ This function checks if a lease owner (WORKER_ID "<<host>>-<<pid>>") is a worker of
+        this host whose process does not exist anymore (e.g. crashed before a restart)
+
+        Return Value: bool
+    """
+    host, _, pid = (lease_owner or "").rpartition("-")
+    if lease_owner == WORKER_ID or host != socket.gethostname() or not pid.isdigit():
+        return False
+    return not process_exists(int(pid))
+
+def release_dead_worker_leases():
+    """ This function releases the leases of dead workers of this host at once - without
+        waiting until they expire. Their running download jobs are queued again. So a
+        restarted process continues where the crashed one stopped.
+
+        Return Value: int - Number of released rows
+    """
+    released_rows = 0
+    for table in ("download_jobs", "subscriptions"):
+        lease_owners = fetch_value(table, None, ["DISTINCT lease_owner"])
+        for (lease_owner,) in lease_owners or []:
+            if not is_dead_local_worker(lease_owner):
+                continue
+            data = {"lease_owner": "", "lease_expires": 0}
+            condition = "lease_owner = ?"
+            if table == "download_jobs":
+                data["state"] = "queued"
+                condition += " AND state = 'running'"
+            released = update_value_if(table, data, condition, [lease_owner])
+            if released:
+                logger.info("Released %i leases of %s in %s - the process does not exist anymore",
+                            released, lease_owner, table)
+                released_rows += released
+    return released_rows
+
+def renew_leases():
+    """ This function extends all leases held by this worker """
+    lease_expires = int(time.time()) + get_lease_duration()
+    for table in ("download_jobs", "subscriptions"):
+        update_value_if(table, {"lease_expires": lease_expires}, "lease_owner = ?", [WORKER_ID])
+
+def start_lease_heartbeat():
+    """ This function starts the thread which renews the leases of this worker every
+        lease_duration / 3 seconds (once per process). The leases of a long download must
+        not expire while it is running.
+    """
+    global LEASE_HEARTBEAT # pylint: disable=global-statement
+    with LEASE_LOCK:
+        if LEASE_HEARTBEAT is not None:
+            return
+
+        def renew_loop():
+            while not threading.Event().wait(get_lease_duration() / 3):
+                renew_leases()
+
+        LEASE_HEARTBEAT = threading.Thread(target=renew_loop, daemon=True, name="lease-heartbeat")
+        LEASE_HEARTBEAT.start()
+
+################# DB functions
+
+def save_file_to_db(scheme_data, full_file_path, file_hash, url, metadata):
+    """ This function is used to save a file into the items table. It is basically
+        an SQL Insert wrapper
+
+        Return Value: dict
+        {
+            "status": False -> Operation successfull? - Use it as probe
+            "hash_exist": False -> Does the hash already exist in db?
+            "file_id": 1 -> ID of the file with the same  hash
+            "file_name": "hello.mp4" -> Name of the file with the same hash value
+            "file_path": "/path/to/file" -> Path to the file
+        }
+    """
+    return_val = {
+        "status": False,
+        "hash_exist": False,
+        "file_id": None,
+        "file_name": None,
+        "file_path": None
+    }
+    #Video hash not exist as saved item add it...
+    logger.debug("Add Video to DB")
+    scheme_path = scheme_data["scheme_path"]
+
+    hash_exist = fetch_value("items", {"file_hash": file_hash}, ["id", "file_name", "file_path"], True)
+    if hash_exist is False:
+        logger.error("Error while checking if the file hash already exist in DB!")
+        return return_val
+    if hash_exist is not None:
+        logger.debug("File hash already exist in DB! - Skip saving File")
+        return_val["file_id"] = hash_exist[0]
+        return_val["file_name"] = hash_exist[1]
+        return_val["file_path"] = hash_exist[2]
+        return_val["hash_exist"] = True
+        return_val["status"] = True
+        return return_val
+
+
+    head, tail = os.path.split(full_file_path)
+    logger.debug("Scheme Data: %s", scheme_path)
+    #Line Break for Pylint #C0301
+    use_tags_ydl = fetch_value_as_bool("config", {"option_name": "use_tags_from_ydl"},
+                                       ["option_value"], True)
+    #Define base data
+    video_data = {
+        "scheme": scheme_data["scheme"]["schema_name"],
+        "file_name": tail,
+        "file_path": head,
+        "file_hash": file_hash,
+        "url": url,
+        "data": metadata
+    }
+    #The file was just hashed - save the fingerprint for quick validation runs
+    fingerprint = create_fingerprint_from_file(full_file_path)
+    current_time = get_current_time()
+    if fingerprint["status"] and current_time != -1:
+        video_data["file_fingerprint"] = fingerprint["fingerprint"]
+        video_data["last_full_check"] = current_time
+    #Used to predict duplicates before they are downloaded (see predict_duplicate())
+    meta_fingerprint = create_meta_fingerprint(metadata)
+    video_data["video_key"] = meta_fingerprint["video_key"] or ""
+    video_data["meta_fingerprint"] = meta_fingerprint["meta_fingerprint"] or ""
+    if use_tags_ydl and metadata is not None:
+        logger.debug("Also insert tags from ydl metadata")
+        if "tags" in metadata:
+            logger.debug("Found key 'tags'")
+            if len(metadata["tags"]) > 0:
+                logger.debug("Tags found...")
+                video_data["tags"] = metadata["tags"]
+            else:
+                logger.debug("Tags array is empty!")
+        else:
+            logger.debug("No tags key found in metadata")
+    else:
+        logger.debug("Tags are not inserted from ydl")
+    video_registered = insert_value("items", video_data)
+    if not video_registered:
+        logger.error("Error while saving file to db!! - Please check log.")
+        #Line Break for Pylint #C0301
+        remove_file = fetch_value_as_bool("config", {"option_name":
+                                                     "remove_file_on_post_process_error"},
+                                          ["option_value"], True)
+        if remove_file:
+            logger.info("Remove file due to config setting.")
+            os.remove(full_file_path)
+            if os.path.exists(full_file_path):
+                #Line Break for Pylint #C0301
+                logger.error("""Error while removing video after post processing error! -
+                              Check permissions""")
+            return return_val
+        logger.warning("File will not be removed! - Be cautious, the file is not saved in the db!")
         return return_val
-    logger.info("Video successfully saved. - Finished")
+    logger.debug("Video successfully saved. - Finished")
     return_val["status"] = True
     return return_val
 
@@ -1383,100 +2675,136 @@ def import_items(path="./"):
 def scheme_setup():
     """ Check all schemes if tables are needed in the db
 
+        A hash of all table definitions is stored in the config table (scheme_hash). If it
+        matches the current scheme files nothing is checked at all.
+
         Return Values: bool
         - True (Success)
         - False (Error while creating table or loading scheme)
     """
     script_dir = pathlib.Path(__file__).parent.resolve()
+    scheme_path = os.path.join(script_dir, "scheme")
 
-    if not os.path.isdir(os.path.join(script_dir, "scheme")):
+    if not os.path.isdir(scheme_path):
         logger.error("The scheme folder does not exist in the script folder! - Please add it!")
         return False
 
     error_occured = False
-    #Iterate over all existing scheme files and create tables if needed
-    for scheme in os.listdir(os.path.join(script_dir, "scheme")):
-        try:
-            #load scheme data
-            scheme_path = os.path.join(script_dir, "scheme")
-            scheme_path = os.path.join(scheme_path, scheme)
-            scheme_data = load_json_file(scheme_path)
-
-            #check if there is a "db" key -> If not a table is not needed - SKIP
-            if "db" in scheme_data and "table_needed" in scheme_data["db"]:
-                #Check if a table is needed
-                if scheme_data["db"]["table_needed"] is True:
-                    #Check if table exists - if not create it
-                    if not "table_name" in scheme_data["db"]:
-                        #Line Break for Pylint #C0301
-                        logger.error("""Error while checking for table in schema %s.
-                                      Key table_name is missing!""", scheme)
-                        error_occured = True
-                        continue
-                    table_exists = check_table_exist(scheme_data["db"]["table_name"])
-
-                    #If the table does not exist - create a new table inside the db
-                    if not table_exists:
-                        result = create_table(scheme_data["db"]["table_name"],
-                                              scheme_data["db"]["columns"])
-
-                        if not result:
-                            #Line Break for Pylint #C0301
-                            logger.error("""Error while creating table %s for scheme %s! -
-                                          Check log""", scheme_data["db"]["table_name"], scheme)
-                            error_occured = True
-                            continue
-                        #Line Break for Pylint #C0301
-                        logger.info("""Table %s for scheme %s successfully created!""",
-                                     scheme_data["db"]["table_name"], scheme)
-                    else:
-                        #If the table already exist check if all columns are created (only adding)
-                        #Check if table is like the scheme (minimal requirements are columns inside the scheme file.)
-                        logger.debug("Check if table %s have all columns...", scheme_data["db"]["table_name"])
-                        all_columns_exist:bool = check_scheme_match(scheme_data["db"]["table_name"],
-                                              scheme_data["db"]["columns"])
-                        if not all_columns_exist:
-                            logger.error("Error while checking all tables if they have all columns needed! - Check log")
-                            error_occured = True
-                    
-                    #After all tables are created and have the most actual format (all columns)
-                    #Check if the tablee does have any rows that are created by default
-                    #If table is created check if there are any default values and add these
-                    if "rows" in scheme_data["db"] and "row_exist_value" in scheme_data["db"]:
-                        logger.info("""Found default values for scheme %s -
-                                    Insert into table""",
-                                    scheme)
-                        for option in scheme_data["db"]["rows"]:
-                            #Iterate over all default options and insert them to the config
-                            #table
-                            #Check if the value already exist
-                            print(option[scheme_data["db"]["row_exist_value"]])
-                            value_already_esist = fetch_value(scheme_data["db"]["table_name"], {scheme_data["db"]["row_exist_value"]: option[scheme_data["db"]["row_exist_value"]]}, [scheme_data["db"]["row_exist_value"]], True )
-
-                            if value_already_esist is None:
-                                row_inserted = insert_value(
-                                    scheme_data["db"]["table_name"],
-                                    option)
-                                if not row_inserted:
-                                    logger.error("Error while inserting row: %s!", option)
-                                    continue
-                                logger.debug("Row inserted")
-                    else:
-                        logger.debug("There are no default rows in scheme %s", scheme)
-                        continue
-                else:
-                    logger.debug("Scheme %s does not need a table - SKIP", scheme)
-                    continue
-            else:
-                logger.debug("Scheme %s does not contain a db key - SKIP", scheme)
-                continue
-        except json.JSONDecodeError as e:
-            logger.error("Error while initializing scheme %s! - JSON Error: %s", scheme, e)
-            return False
-    if not error_occured:
+    table_schemes = {}
+    #Load all existing scheme files and collect the ones that need a table
+    for scheme in sorted(os.listdir(scheme_path)):
+        scheme_data = load_scheme_file(os.path.join(scheme_path, scheme))
+
+        if scheme_data is None:
+            logger.error("Error while loading scheme %s! - SKIP", scheme)
+            error_occured = True
+            continue
+
+        #check if there is a "db" key -> If not a table is not needed - SKIP
+        if not "db" in scheme_data or not "table_needed" in scheme_data["db"]:
+            logger.debug("Scheme %s does not contain a db key - SKIP", scheme)
+            continue
+
+        if scheme_data["db"]["table_needed"] is not True:
+            logger.debug("Scheme %s does not need a table - SKIP", scheme)
+            continue
+
+        if not "table_name" in scheme_data["db"]:
+            #Line Break for Pylint #C0301
+            logger.error("""Error while checking for table in schema %s.
+                          Key table_name is missing!""", scheme)
+            error_occured = True
+            continue
+        table_schemes[scheme] = scheme_data["db"]
+
+    scheme_hash = hashlib.sha256(json.dumps(table_schemes, sort_keys=True).encode()).hexdigest()
+    stored_hash = None
+    if check_table_exist("config"):
+        stored_hash = fetch_value("config", {"option_name": "scheme_hash"}, ["option_value"], True)
+
+    if stored_hash and stored_hash[0] == scheme_hash and not error_occured:
+        logger.debug("Scheme hash %s matches the db - skip scheme setup", scheme_hash)
         return True
-    return False
 
+    #Iterate over all table schemes and create tables if needed
+    for scheme, scheme_db in table_schemes.items():
+        table_name = scheme_db["table_name"]
+        #Check if table exists - if not create it
+        table_exists = check_table_exist(table_name)
+
+        #If the table does not exist - create a new table inside the db
+        if not table_exists:
+            result = create_table(table_name, scheme_db["columns"])
+
+            if not result:
+                #Line Break for Pylint #C0301
+                logger.error("""Error while creating table %s for scheme %s! -
+                              Check log""", table_name, scheme)
+                error_occured = True
+                continue
+            #Line Break for Pylint #C0301
+            logger.info("""Table %s for scheme %s successfully created!""",
+                         table_name, scheme)
+        else:
+            #If the table already exist check if all columns are created (only adding)
+            #Check if table is like the scheme (minimal requirements are columns inside the scheme file.)
+            logger.debug("Check if table %s have all columns...", table_name)
+            all_columns_exist:bool = check_scheme_match(table_name, scheme_db["columns"])
+            if not all_columns_exist:
+                logger.error("Error while checking all tables if they have all columns needed! - Check log")
+                error_occured = True
+
+        #Jobs queued before the unique index (url, dst_path) existed can exist twice
+        if table_exists and table_name == "download_jobs":
+            remove_duplicate_download_jobs()
+
+        #Create the indexes of the table {"<<index name>>": {"columns": [], "unique": false}}
+        for index_name, index in scheme_db.get("indexes", {}).items():
+            if not create_index(table_name, index_name, index["columns"], index.get("unique", False)):
+                error_occured = True
+
+        #After all tables are created and have the most actual format (all columns)
+        #Check if the tablee does have any rows that are created by default
+        #If table is created check if there are any default values and add these
+        if "rows" in scheme_db and "row_exist_value" in scheme_db:
+            logger.info("Found default values for scheme %s - Insert missing rows", scheme)
+            row_exist_value = scheme_db["row_exist_value"]
+            existing_rows = fetch_value(table_name, None, [row_exist_value])
+
+            if existing_rows is False:
+                logger.error("Error while fetching existing rows of table %s!", table_name)
+                error_occured = True
+                continue
+            existing_values = {row[0] for row in existing_rows or []}
+
+            for option in scheme_db["rows"]:
+                #Iterate over all default options and insert the missing ones
+                if option[row_exist_value] in existing_values:
+                    continue
+
+                row_inserted = insert_value(table_name, option)
+                if not row_inserted:
+                    logger.error("Error while inserting row: %s!", option)
+                    error_occured = True
+                    continue
+                logger.debug("Row %s inserted", option[row_exist_value])
+        else:
+            logger.debug("There are no default rows in scheme %s", scheme)
+
+    if error_occured:
+        return False
+
+    #Store the hash - the next start can skip all checks
+    if not stored_hash:
+        hash_saved = insert_value("config", {"option_name": "scheme_hash", "option_value": scheme_hash})
+    else:
+        hash_saved = update_value("config", {"option_value": scheme_hash}, {"option_name": "scheme_hash"})
+
+    if not hash_saved:
+        logger.warning("Error while saving the scheme hash! - Scheme setup runs again on next start")
+    return True
+
+@timed_function("load_scheme")
 def load_scheme(url: str):
     """ This function loads a scheme needed to work with the url and save data correct.
 
@@ -1497,7 +2825,7 @@ def load_scheme(url: str):
     scheme_path = scheme_data["scheme_path"]
 
     #Load Scheme
-    scheme = load_json_file(scheme_path)
+    scheme = load_scheme_file(scheme_path)
     if not scheme:
         logger.error("Error while loading scheme! - Check log")
         return return_scheme
@@ -1512,6 +2840,7 @@ def load_scheme(url: str):
     return_scheme["scheme_path"] = scheme_path
     return return_scheme
 
+@timed_function("load_scheme")
 def load_scheme_by_name(scheme_name:str):
     """
         This function loads a scheme by it's name.
@@ -1534,7 +2863,7 @@ def load_scheme_by_name(scheme_name:str):
         return return_scheme
 
     #Load Scheme
-    scheme = load_json_file(expected_scheme_path)
+    scheme = load_scheme_file(expected_scheme_path)
     if not scheme:
         logger.error("Error while loading scheme! - Check log")
         return return_scheme
@@ -1564,6 +2893,7 @@ def fetch_scheme_file(url:str):
         }
 
     """
+    import tldextract
     return_val = {"status": False, "scheme_path": None, "scheme_file": None}
     script_dir = pathlib.Path(__file__).parent.resolve()
 
@@ -1600,6 +2930,7 @@ def validate_scheme(url, scheme, silent=False):
         - True (Scheme Valid)
         - False (Scheme misses keys)
     """
+    import tldextract
     #Check if the loaded template is a url template
     if not "url_template" in scheme or scheme["url_template"] is False:
         #Line Break for Pylint #C0301
@@ -1765,7 +3096,7 @@ def fetch_scheme_file_by_file(url):
 
     for scheme_file in os.listdir(scheme_folder):
         #Try to load json file
-        scheme = load_json_file(os.path.join(scheme_folder, scheme_file))
+        scheme = load_scheme_file(os.path.join(scheme_folder, scheme_file))
 
         if not scheme:
             logger.error("Error while reading scheme file %s", scheme_file)
@@ -1846,90 +3177,405 @@ def prepare_scheme_dst_data(url, is_subscription=False):
 
 ################# Validation
 
-def validate(rehash=True):
-    """ This function itereates over all folders from the root directory (base path in db)
-        and checks
+def validate(rehash=False, quick=False):
+    """ This function itereates over all folders from the root directory (base path in db)
+        and checks
+
+        New files are hashed and added to the db. Files that are already known are only
+        checked for integrity if requested:
+            - rehash=True (--full) -> The SHA-256 of every known file is created again and
+                                      compared
+            - quick=True -> Only the fingerprint (size + sampled hashes) is compared.
+                            A full hash is only created if the fingerprint does not match or
+                            the last full check is older than "full_hash_interval" days
+                            (0 - default: never)
+        Files that are already recorded as duplicate (duplicates.json) are not hashed again.
+
+        Return Value: bool
+            -> True - Success
+            -> False -> Failed while validating
+    """
+
+    #fetch base path
+    base_path = fetch_value("config", {"option_name": "base_location"}, ["option_value"], True)
+
+    if not base_path:
+        logger.error("Error while fetching base path!")
+        return False
+    base_path = base_path[0]
+
+    base_path = os.path.abspath(base_path)
+
+    sample_size = get_fingerprint_sample_size()
+    full_hash_interval = fetch_value("config", {"option_name": "full_hash_interval"},
+                                     ["option_value"], True)
+    try:
+        full_hash_interval = int(full_hash_interval[0])
+    except (TypeError, ValueError, IndexError):
+        logger.warning("Can't read option full_hash_interval! - Use default (0 - disabled)")
+        full_hash_interval = 0
+
+    current_time = get_current_time()
+    if current_time == -1:
+        logger.error("Can't fetch current time!")
+        return False
+
+    hashed_bytes_before = metrics.get_value("ytdl_hashed_bytes_total")
+    hash_seconds_before = metrics.get_value("ytdl_hash_seconds_total")
+    error_happened = False
+    error_files = []
+    error_messages = []
+    added_files = 0
+    checked_files = 0
+    full_hashed_files = 0
+
+    #Load all known items once instead of querying the db for every file on the FS
+    item_index = build_item_path_index()
+    #Files already recorded as duplicate are not hashed again
+    duplicate_paths = get_duplicate_paths(base_path)
+    progress = create_progress_logger("Validated files", progress_logger=logger)
+    processed_files = 0
+
+    for current_dir, current_dir_directories, current_dir_files in os.walk(base_path):
+        abs_current_dir = os.path.abspath(current_dir)
+        for file in current_dir_files:
+            processed_files += 1
+            progress(processed_files)
+            #Get the filepath of the current file
+            abs_file_path = os.path.join(abs_current_dir, file)
+
+            path_data = fetch_path_data(abs_file_path, base_path)
+
+            if not path_data["status"]:
+                logger.error("Error while fetching path data for path %s", abs_file_path)
+                error_happened = True
+                error_files.append(abs_file_path)
+                error_messages.append("Error while fetching Path Data!")
+                continue
+
+            if path_data["schema_name"] is None or path_data["schema_name"] == "custom":
+                logger.warning("File %s can not be tested! - Schema \"%s\" is not valid", path_data["filename"], path_data["schema_name"])
+                continue
+
+            #Check if Video is in DB (path and name need to match)
+            file_in_db = item_index.get((abs_current_dir, path_data["filename"]))
+
+            if file_in_db is None and (abs_current_dir, path_data["filename"]) in duplicate_paths:
+                logger.debug("File %s is a known duplicate - SKIP", abs_file_path)
+                continue
+
+            if file_in_db is None:
+                #Add file to db
+                file_hash = create_hash_from_file(abs_file_path)
+
+                if not file_hash["status"]:
+                    logger.error("Error while hashing file! - Can't add file to db!")
+                    error_happened = True
+                    error_files.append(abs_file_path)
+                    error_messages.append("Error while creating hash for file!")
+                    continue
+
+                #File hash created add other stuff
+                loaded_scheme = load_scheme_by_name(path_data["schema_name"])
+
+                if not loaded_scheme["status"]:
+                    error_happened = True
+                    error_files.append(abs_file_path)
+                    error_messages.append("Error while fetching scheme data for file!")
+
+                file_saved = save_file_to_db(loaded_scheme, abs_file_path, file_hash["hash"], None, None)
+
+                if not file_saved["status"]:
+                    error_happened = True
+                    error_files.append(abs_file_path)
+                    error_messages.append("Error while saving video in db!")
+                    continue
+                elif file_saved["status"] and file_saved["hash_exist"]:
+                    logger.debug("File already exist in db!")
+                    add_duplicate_file(file_hash["hash"], path_data["filename"], abs_current_dir, file_saved["file_id"], file_saved["file_name"], file_saved["file_path"])
+                else:
+                    logger.debug("File %s added to DB!", file)
+                    added_files += 1
+                continue
+
+            if not rehash and not quick:
+                continue
+
+            #File is known - check integrity
+            item_id, stored_hash, _, stored_fingerprint, last_full_check = file_in_db
+            checked_files += 1
+            full_hash_needed = not quick
+
+            if quick:
+                fingerprint = create_fingerprint_from_file(abs_file_path, sample_size)
+                if not fingerprint["status"]:
+                    error_happened = True
+                    error_files.append(abs_file_path)
+                    error_messages.append("Error while creating fingerprint for file!")
+                    continue
+
+                if stored_fingerprint is None or stored_fingerprint != fingerprint["fingerprint"]:
+                    logger.debug("Fingerprint of %s does not match - Create full hash", file)
+                    full_hash_needed = True
+                elif check_full_hash_due(last_full_check, current_time, full_hash_interval):
+                    logger.debug("Last full check of %s is too old - Create full hash", file)
+                    full_hash_needed = True
+
+            if not full_hash_needed:
+                continue
+
+            full_hashed_files += 1
+            file_hash = create_hash_from_file(abs_file_path)
+            if not file_hash["status"]:
+                error_happened = True
+                error_files.append(abs_file_path)
+                error_messages.append("Error while creating hash for file!")
+                continue
+
+            if file_hash["hash"] != stored_hash:
+                logger.error("Hash of file %s does not match the saved hash!", abs_file_path)
+                error_happened = True
+                error_files.append(abs_file_path)
+                error_messages.append("Hash mismatch! - File is changed or corrupted")
+                continue
+
+            #File is valid - save the current fingerprint and the time of the check
+            fingerprint = create_fingerprint_from_file(abs_file_path, sample_size)
+            check_saved = update_value("items",
+                                       {"file_fingerprint": fingerprint["fingerprint"],
+                                        "last_full_check": current_time},
+                                       {"id": item_id})
+            if not check_saved:
+                logger.error("Error while saving fingerprint for %s", abs_file_path)
+
+    logging.info("Checked %i known files (%i with full hash)", checked_files, full_hashed_files)
+
+    hash_seconds = metrics.get_value("ytdl_hash_seconds_total") - hash_seconds_before
+    if hash_seconds > 0:
+        hashed_mb = (metrics.get_value("ytdl_hashed_bytes_total") - hashed_bytes_before) / 1048576
+        metrics.set_gauge("ytdl_hash_throughput_mb_per_second", round(hashed_mb / hash_seconds, 3))
+    export_metrics()
+
+    if not error_happened:
+        logging.info("All files validated! - Added %i files", added_files)
+        return True
+    else:
+        logger.error("Error while validating files. Errors:")
+        for index, error_message in enumerate(error_messages):
+            logger.error("Affected File: %s, Error: %s", error_files[index], error_message)
+        return False
+
+def check_full_hash_due(last_full_check, current_time:str, full_hash_interval:int):
+    """ This function is a helper for validate(). It checks if the last full check of a file
+        is older than "full_hash_interval" days. 0 disables the periodic full hash.
+
+        Return Value: bool
+            -> True - A full hash is needed
+            -> False - The last full check is recent enough (or the full hash is disabled)
+    """
+    if full_hash_interval <= 0:
+        return False
+    if last_full_check is None:
+        return True
+    try:
+        time_since_last_check = (datetime.strptime(current_time, "%Y-%m-%d %H:%M:%S") -
+                                 datetime.strptime(last_full_check, "%Y-%m-%d %H:%M:%S"))
+    except (TypeError, ValueError):
+        logger.warning("Can't read last full check value %s", last_full_check)
+        return True
+    return time_since_last_check.total_seconds() >= full_hash_interval * 86400
+
+def verify_db(redownload=False):
+    """ This function is the reverse check of validate(). It iterates over all items in the db
+        and checks if the file still exists on the FS.
+        The items are streamed from the db and checked in batches (VERIFY_BATCH_SIZE) with a
+        thread pool, so this also works for very big libraries.
+
+        All missing files are written to "missing_files.json" in the base directory.
+        If "redownload" is True all missing files with a known url will be downloaded again.
+
+        Return Value: bool
+            -> True - Success (no missing files or all missing files redownloaded)
+            -> False -> Missing files found / Error while redownloading
+    """
+    from prettytable import PrettyTable
+    base_path = fetch_value("config", {"option_name": "base_location"}, ["option_value"], True)
+
+    if not base_path:
+        logger.error("Error while fetching base path!")
+        return False
+    base_path = os.path.abspath(base_path[0])
+
+    workers = fetch_value("config", {"option_name": "verify_db_workers"}, ["option_value"], True)
+    try:
+        workers = int(workers[0])
+    except (TypeError, ValueError, IndexError):
+        logger.warning("Can't read option verify_db_workers! - Use default (16)")
+        workers = 16
+
+    def check_batch(batch, executor):
+        """ Stat all files of a batch in parallel and return the missing items"""
+        paths = [os.path.join(item[1], item[2]) for item in batch]
+        exists = executor.map(check_file_exist, paths)
+        return [item for item, item_exist in zip(batch, exists) if not item_exist]
+
+    missing_items = []
+    checked_items = 0
+    batch = []
+    progress = create_progress_logger("Checked items", progress_logger=logger)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for item in fetch_value_iter("items", None, ["id", "file_path", "file_name",
+                                                     "url", "scheme"],
+                                     batch_size=VERIFY_BATCH_SIZE):
+            batch.append(item)
+            if len(batch) >= VERIFY_BATCH_SIZE:
+                missing_items.extend(check_batch(batch, executor))
+                checked_items += len(batch)
+                progress(checked_items)
+                batch = []
+        if len(batch) > 0:
+            missing_items.extend(check_batch(batch, executor))
+            checked_items += len(batch)
+
+    logger.info("Checked %i items. %i files are missing on the FS", checked_items,
+                len(missing_items))
+
+    if len(missing_items) == 0:
+        return True
+
+    missing_list = []
+    missing_table = PrettyTable(['ID', 'file', 'url'])
+    missing_table.align['ID'] = "c"
+    missing_table.align['file'] = "l"
+    missing_table.align['url'] = "l"
+    for item in missing_items:
+        urls = get_item_urls(item[3])
+        missing_list.append({"file_id": item[0], "file_name": item[2],
+                             "file_path": item[1], "url": urls, "scheme": item[4]})
+        missing_table.add_row([item[0], os.path.join(item[1], item[2]), "\n".join(urls)])
+    print(missing_table)
+
+    missing_file_path = os.path.join(base_path, "missing_files.json")
+    try:
+        with open(missing_file_path, "w", encoding="UTF-8") as file:
+            file.write(json.dumps(missing_list))
+        logger.info("Missing files are saved in %s", missing_file_path)
+    except OSError as e:
+        logger.error("Error while writing missing files list! - Error: %s", e)
+
+    if not redownload:
+        return False
+
+    failed_redownloads = []
+    for missing_item in missing_list:
+        if not redownload_item(missing_item):
+            failed_redownloads.append(os.path.join(missing_item["file_path"],
+                                                   missing_item["file_name"]))
+
+    if len(failed_redownloads) > 0:
+        for failed_redownload in failed_redownloads:
+            logger.error("Can't redownload %s", failed_redownload)
+        return False
+    logger.info("All missing files redownloaded!")
+    return True
+
+def redownload_item(missing_item:dict):
+    """ This function is a helper for verify_db(). It downloads a missing item again
+        into the folder saved in the db.
 
         Return Value: bool
-            -> True - Success
-            -> False -> Failed while validating
+            -> True - File redownloaded
+            -> False - Failed (no url saved or download failed)
     """
-
-    #fetch base path
-    base_path = fetch_value("config", {"option_name": "base_location"}, ["option_value"], True)
-
-    if not base_path:
-        logger.error("Error while fetching base path!")
+    if len(missing_item["url"]) == 0:
+        logger.error("Item %s does not have any url! - Can't redownload file",
+                     missing_item["file_name"])
         return False
-    base_path = base_path[0]
 
-    base_path = os.path.abspath(base_path)
-
-    error_happened = False
-    error_files = []
-    error_messages = []
-    added_files = 0
-    for current_dir, current_dir_directories, current_dir_files in os.walk(base_path):
-        for file in current_dir_files:
-            #Get the filepath of the current file
-            abs_file_path = os.path.join(current_dir, file)
+    loaded_scheme = load_scheme_by_name(missing_item["scheme"])
+    if not loaded_scheme["status"]:
+        logger.error("Error while loading scheme %s! - Can't redownload file",
+                     missing_item["scheme"])
+        return False
 
-            path_data = fetch_path_data(abs_file_path)
+    own_file_data = {
+        "status": 1,
+        "scheme": loaded_scheme["scheme"],
+        "scheme_path": loaded_scheme["scheme_path"],
+        "dst_path": missing_item["file_path"]
+    }
 
-            if not path_data["status"]:
-                logger.error("Error while fetching path data for path %s", abs_file_path)
-                error_happened = True
-                error_files.append(abs_file_path)
-                error_messages.append("Error while fetching Path Data!")
-                continue
+    for url in missing_item["url"]:
+        logger.info("Redownload %s from %s", missing_item["file_name"], url)
+        if not direct_download(url, own_file_data, ignore_existing_file=True):
+            logger.warning("Error while redownloading from %s - Try next url", url)
+            continue
 
-            if path_data["schema_name"] is None or path_data["schema_name"] == "custom":
-                logger.warning("File %s can not be tested! - Schema \"%s\" is not valid", path_data["filename"], path_data["schema_name"])
-                continue
+        expected_file = os.path.join(missing_item["file_path"], missing_item["file_name"])
+        if not check_file_exist(expected_file):
+            #The file was saved under another name (e.g. title changed) - the new file is
+            #registered separately, so the old entry can be removed
+            logger.info("File was saved under a new name - Remove old entry %s",
+                        missing_item["file_id"])
+            delete_value("items", {"id": missing_item["file_id"]})
+        return True
+    return False
 
-            #Check if Video is in DB
-            file_in_db = fetch_value("items", {"file_name": path_data["filename"]}, ["file_name", "scheme", "file_hash", "locked"], True)
+def check_file_exist(path:str):
+    """ This function checks if a file exists by calling os.stat(). It is used by the
+        thread pool in verify_db()
 
-            if file_in_db is None:
-                #Add file to db
-                file_hash = create_hash_from_file(abs_file_path)
+        Return Value: bool
+            -> True - File exists (or can't be checked - e.g. permission error)
+            -> False - File does not exist
+    """
+    try:
+        os.stat(path)
+        return True
+    except (FileNotFoundError, NotADirectoryError):
+        return False
+    except OSError as e:
+        logger.warning("Can't check file %s - Error: %s", path, e)
+        return True
 
-                if not file_hash["status"]:
-                    logger.error("Error while hashing file! - Can't add file to db!")
-                    error_happened = True
-                    error_files.append(abs_file_path)
-                    error_messages.append("Error while creating hash for file!")
-                    continue
+def get_item_urls(url_data):
+    """ This function converts the url column of an item ({"url": [...]}) to a list
 
-                #File hash created add other stuff
-                loaded_scheme = load_scheme_by_name(path_data["schema_name"])
+        Return Value: list
+            - list of urls (empty if there are no urls)
+    """
+    if url_data is None or url_data.strip() == "":
+        return []
+    try:
+        urls = json.loads(url_data)
+        return list(urls["url"])
+    except (json.JSONDecodeError, KeyError, TypeError):
+        logger.error("Error while loading url column! - Data: %s", url_data)
+        return []
 
-                if not loaded_scheme["status"]:
-                    error_happened = True
-                    error_files.append(abs_file_path)
-                    error_messages.append("Error while fetching scheme data for file!")
+def build_item_path_index():
+    """ This function loads all items from the db into a dict. The index is used to resolve
+        files on the FS without querying the db for every single file.
+        The rows are streamed from the db, so only the index itself is kept in memory.
 
-                file_saved = save_file_to_db(loaded_scheme, abs_file_path, file_hash["hash"], None, None)
+        The key is the absolute path of the folder and the filename
+        (the same file name can exist in different folders).
 
-                if not file_saved["status"]:
-                    error_happened = True
-                    error_files.append(abs_file_path)
-                    error_messages.append("Error while saving video in db!")
-                    continue
-                elif file_saved["status"] and file_saved["hash_exist"]:
-                    logger.debug("File already exist in db!")
-                    add_duplicate_file(file_hash["hash"], path_data["filename"], os.path.abspath(current_dir), file_saved["file_id"], file_saved["file_name"], file_saved["file_path"])
-                else:
-                    logging.info("File %s added to DB!", file)
-                    added_files += 1
-    if not error_happened:
-        logging.info("All files validated! - Added %i files", added_files)
-        return True
-    else:
-        logger.error("Error while validating files. Errors:")
-        for index, error_message in enumerate(error_messages):
-            logger.error("Affected File: %s, Error: %s", error_files[index], error_message)
-        return False
+        Return Value: dict
+        {
+            ("/abs/path/to/folder", "filename.mp4"): (id, file_hash, locked,
+                                                      file_fingerprint, last_full_check),
+            ...
+        }
+    """
+    item_index = {}
+    for item in fetch_value_iter("items", None, ["id", "file_path", "file_name",
+                                                 "file_hash", "locked",
+                                                 "file_fingerprint", "last_full_check"]):
+        item_index[(os.path.abspath(item[1]), item[2])] = (item[0], item[3], item[4],
+                                                            item[5], item[6])
+    logger.debug("Loaded %i items into the path index", len(item_index))
+    return item_index
 
 
 ################# File Format (output format) stuff
@@ -2031,6 +3677,7 @@ def get_all_format_profiles(only_names = True) -> list|dict:
 
 def show_profiles():
     """ This function shows available profiles"""
+    from prettytable import PrettyTable
     profiles =  get_all_format_profiles(only_names=False)
 
     profiles_table = PrettyTable(['Profile', 'enabled', 'description'])
@@ -2043,9 +3690,10 @@ def show_profiles():
     return True
 
 ################# Helper
-def fetch_path_data(path):
+def fetch_path_data(path, base_path=None):
     '''
         This function returns the expected file scheme based on a defined rule set and the strict defined path syntax from this project.
+        If the base path is already known it can be passed to avoid a db lookup for every file.
 
         Expcected Syntax:
 
@@ -2062,13 +3710,14 @@ def fetch_path_data(path):
     '''
     return_val = {"status": False, "schema_name": None, "subscription": None, "category": None, "filename": None}
 
-    base_path = fetch_value("config", {"option_name": "base_location"}, ["option_value"], True)
+    if base_path is None:
+        base_path = fetch_value("config", {"option_name": "base_location"}, ["option_value"], True)
 
-    if not base_path:
-        logger.error("Error while fetching base path!")
-        return return_val
+        if not base_path:
+            logger.error("Error while fetching base path!")
+            return return_val
 
-    base_path = base_path[0]
+        base_path = base_path[0]
     base_path = os.path.abspath(base_path)
 
     if not base_path in path:
@@ -2113,6 +3762,7 @@ def show_help():
         This function shows help
         Return Value: None
     """
+    from prettytable import PrettyTable
     print("------------------------------ Help ------------------------------")
     #Line Break for Pylint #C0301
     print("""You asked for help... Here it is :) -
@@ -2133,6 +3783,10 @@ def show_help():
                         '''or the name of the subscription (Name of a channel).
                         The second parameter defines if all content of this channel also
                         should be removed (Default: False = NO)'''])
+    help_table.add_row(['set-subscription-priority',
+                        '<<url>> | <<Name>>, <<priority>>',
+                        '''Set the download priority of a subscription (Default: 0).
+                        New videos of subscriptions with a higher priority are downloaded first'''])
     #Line Break for Pylint #C0301
     help_table.add_row(['list-subscriptions',
                         '<<filter>>',
@@ -2181,6 +3835,19 @@ def show_help():
     help_table.add_row(['show-duplicates',
                         '',
                         '''Show duplicates (use command validate before!)'''])
+    help_table.add_row(['validate --full',
+                        '',
+                        '''Also hash all known files again and compare them to the saved hash'''])
+    help_table.add_row(['validate --quick',
+                        '',
+                        '''Only compare a fingerprint (size and sampled hashes) of known files.
+                        A full hash is only created on a mismatch or if the last full check
+                        is older than "full_hash_interval" days (0 = never)'''])
+    help_table.add_row(['verify-db',
+                        '--redownload',
+                        '''Check if all files saved in the db still exist on the FS.
+                        Missing files are saved in missing_files.json (base directory).
+                        With --redownload all missing files are downloaded again'''])
 
     help_table.add_row(['', '', ''])
     help_table.add_row(['--Operation--', '', ''])
@@ -2195,10 +3862,34 @@ def show_help():
                         '',
                         '''Run the script -> Check all subscriptions for
                         new content and download it'''])
+    help_table.add_row(['daemon',
+                        '',
+                        '''Keep running and check all subscriptions periodically
+                        (subscription_check_delay). Stop it with SIGTERM'''])
+    help_table.add_row(['worker',
+                        '',
+                        '''Like daemon - but several workers can share one db.
+                        Jobs queued by other workers are downloaded every worker_poll_interval'''])
+
+    help_table.add_row(['', '', ''])
+    help_table.add_row(['--Options--', '', ''])
+    help_table.add_row(['--timings',
+                        '<<command>>',
+                        '''Measure the time of all stages (metadata, download, hashing, db...)
+                        and save a report (p50/p95/max) as timings_<<date>>.json in the base dir'''])
+    help_table.add_row(['--profile',
+                        '[=cprofile|tracemalloc] <<command>>',
+                        '''Profile the command. The profile (.pstats / .tracemalloc) and a summary
+                        of the top entries (.txt) are saved in the base dir'''])
+    help_table.add_row(['--profile-items',
+                        '<<N>> <<command>>',
+                        '''Profile every download and save the profiles of the N slowest
+                        downloads in the base dir (profile_items_<<date>>)'''])
     print(help_table)
     print("Example: yt-manager.py add-subscription youtube-url")
     print("------------------------------------------------------------------")
 
+@timed_function("alive_check")
 def alive_check(url: str):
     """ This function is used to check if the provided url works (HTTP 200 - OK)
         if not the video can not be downloaded
@@ -2207,6 +3898,7 @@ def alive_check(url: str):
         - True (Url is alive)
         - False (Url is not reachable)
     """
+    import requests
     #Check if url is reachable
     try:
         requested_url = requests.get(url, timeout=30)
@@ -2267,6 +3959,30 @@ def load_json_file(path:str):
         return None
     return json_file
 
+def load_scheme_file(path:str):
+    """ Read a scheme file and return it as a dict. Loaded schemes are cached (SCHEME_CACHE)
+        and only read again if the file was changed. The returned dict is shared -
+        don't modify it!
+
+        Return Values:dict|None
+        - dict - your scheme
+        - None -> Parsing error / Not found
+    """
+    try:
+        modified = os.path.getmtime(path)
+    except OSError as e:
+        logger.error("Can't open scheme file %s - Error: %s", path, e)
+        return None
+
+    cached_scheme = SCHEME_CACHE.get(path)
+    if cached_scheme is not None and cached_scheme[0] == modified:
+        return cached_scheme[1]
+
+    scheme = load_json_file(path)
+    if scheme is not None:
+        SCHEME_CACHE[path] = (modified, scheme)
+    return scheme
+
 def decide_storage_path(url, scheme, is_subscription=False):
     """
         This function is used as a helper to set the intended storage
@@ -2377,11 +4093,15 @@ def decide_storage_path(url, scheme, is_subscription=False):
         return base_path
     return os.path.join(base_path, subscription_name)
 
-def get_metadata(url, ydl_opts):
+@timed_function("get_metadata")
+def get_metadata(url, ydl_opts, probe=False):
     """
         This function fetches metadata from a given url (file and playlist).
         It also sanitize the dict to make it convertible to json (YT DLP)
 
+        If probe is True the result is not processed (no format selection - "ext" is missing).
+        Use it together with get_ydl_opts(probe=True) for existence checks.
+
         Possible return Values:dict|None
         - dict -> metadata
         - None -> Failed to fetch data
@@ -2391,15 +4111,24 @@ def get_metadata(url, ydl_opts):
         - uploader
         - tags
     """
+    from yt_dlp import DownloadError
     try:
-        with YoutubeDL(ydl_opts) as ydl:
+        with ydl_pool.borrow(ydl_opts) as ydl:
             #We only need the metadata. So we don't need to download the whole file.
             #We will do this later...
-            file_data = ydl.sanitize_info(ydl.extract_info(url, download=False))
+            file_data = ydl.sanitize_info(ydl.extract_info(url, download=False,
+                                                           process=not probe))
     except DownloadError as e:
         logger.error("Error while fetching File information from target server! - Error: %s", e)
+        metrics.inc_counter("ytdl_extractor_calls_total", labels={"extractor": "unknown",
+                                                                  "result": "error"})
         return None
 
+    if isinstance(file_data, dict):
+        metrics.inc_counter("ytdl_extractor_calls_total",
+                            labels={"extractor": file_data.get("extractor_key", "unknown"),
+                                    "result": "ok"})
+
     #Check if result have any content
     try:
         if len(file_data) > 0:
@@ -2408,17 +4137,21 @@ def get_metadata(url, ydl_opts):
     except ValueError as e:
         #Line Break for Pylint #C0301
         logger.error("Error result seems to have no content! - \n\n Result: %s \n Error: %s",
-                     file_data, e)
+                     shorten(file_data), e)
         return None
     except TypeError as e:
         logger.error("Error while fetching metadata! - Type Error: %s", e)
         return None
 
-def get_ydl_opts(path, addons:json=None, format_filter:list[str] = None):
+def get_ydl_opts(path, addons:json=None, format_filter:list[str] = None, scheme:dict=None,
+                 probe=False):
     """
         #The standards options for yt dlp.
         These can be modified if the parameter addons is passed.
         Also the rewrite of settings is possible.
+        The download options (see get_download_options()) can be set per scheme.
+        If the scheme defines "extractors", yt-dlp only uses these extractors.
+        If probe is True the "probe_extractor_args" of the scheme are used (e.g. skip formats)
         For the save of functionality the outtmpl key can not
         be altered since other parts of the program
         rely on this!
@@ -2620,6 +4353,12 @@ def get_ydl_opts(path, addons:json=None, format_filter:list[str] = None):
                 'replace-in-metadata': True,
                 'restrict-filenames': True
             }
+    opts.update(get_download_options(scheme))
+    #Only load the extractors of the scheme (regex list of yt-dlp extractor names)
+    if scheme is not None and isinstance(scheme.get("extractors"), list) and scheme["extractors"]:
+        opts["allowed_extractors"] = scheme["extractors"]
+    if probe and scheme is not None and isinstance(scheme.get("probe_extractor_args"), dict):
+        opts["extractor_args"] = scheme["probe_extractor_args"]
     if addons is not None:
         for key in addons:
             if key == "outtmpl":
@@ -2628,6 +4367,67 @@ def get_ydl_opts(path, addons:json=None, format_filter:list[str] = None):
     
     return opts
 
+def get_download_options(scheme:dict=None):
+    """ This function returns the yt-dlp options for big files. The defaults are taken from the
+        config table, a scheme can override them with the key "download":
+        "download": {"continuedl": true, "concurrent_fragment_downloads": 4,
+                     "http_chunk_size": 10485760}
+
+        - continuedl -> Continue partial (.part) files of interrupted downloads
+          (option "download_continue")
+        - concurrent_fragment_downloads -> Number of fragments (DASH / HLS) downloaded in
+          parallel (option "concurrent_fragment_downloads")
+        - http_chunk_size -> Download big files in chunks of n bytes (0 = disabled)
+          (option "http_chunk_size")
+
+        Return Value: dict - yt-dlp options
+    """
+    download_options = {"continuedl": True, "concurrent_fragment_downloads": 1, "http_chunk_size": 0}
+    config_options = fetch_value("config", [{"option_name": "download_continue"},
+                                            {"option_name": "concurrent_fragment_downloads"},
+                                            {"option_name": "http_chunk_size"}],
+                                 ["option_name", "option_value"])
+    config_options = {
+        "continuedl" if option_name == "download_continue" else option_name: option_value
+        for option_name, option_value in config_options or []
+    }
+    if scheme is not None and isinstance(scheme.get("download"), dict):
+        config_options.update(scheme["download"])
+
+    for option_name, option_value in config_options.items():
+        if option_name not in download_options:
+            continue
+        try:
+            if option_name == "continuedl":
+                download_options[option_name] = str(option_value).lower() in ("true", "1")
+            else:
+                download_options[option_name] = max(int(option_value), 0)
+        except (TypeError, ValueError):
+            logger.warning("Invalid download option %s: %s - Use default", option_name, option_value)
+
+    download_options["concurrent_fragment_downloads"] = max(
+        download_options["concurrent_fragment_downloads"], 1)
+    if not download_options["http_chunk_size"]:
+        del download_options["http_chunk_size"]
+    return download_options
+
+def get_partial_download_size(file_stem:str):
+    """ This function returns the size of the partial files (.part / fragments) of an
+        interrupted download. file_stem is the path of the file without extension.
+        yt-dlp continues these files if "continuedl" is enabled.
+
+        Return Value: int - Size in bytes (0 = nothing to resume)
+    """
+    file_prefix = glob.escape(file_stem) + "."
+    partial_size = 0
+    for partial_file in glob.glob(file_prefix + "*.part") + glob.glob(file_prefix + "*.part-Frag*"):
+        try:
+            partial_size += os.path.getsize(partial_file)
+        except OSError:
+            continue
+    return partial_size
+
+@timed_function("hash")
 def create_hash_from_file(file):
     """
         This function creates a hash from a given file.
@@ -2648,12 +4448,17 @@ def create_hash_from_file(file):
     logger.debug("Create hash from file %s", file)
     #create hash and return the hex value
     hash_obj = hashlib.sha256()
+    hashed_bytes = 0
+    start_time = time.perf_counter()
     try:
         with open(file, 'rb') as f: # Open the file to read it's bytes
             fb = f.read(BUF_SIZE) # Read from the file. Take in the amount declared above
             while len(fb) > 0: # While there is still data being read from the file
                 hash_obj.update(fb) # Update the hash
+                hashed_bytes += len(fb)
                 fb = f.read(BUF_SIZE) # Read the next block from the file
+        metrics.inc_counter("ytdl_hashed_bytes_total", hashed_bytes)
+        metrics.inc_counter("ytdl_hash_seconds_total", time.perf_counter() - start_time)
         return_val["file"] = file
         return_val["hash"] = hash_obj.hexdigest()
         return_val["status"] = True
@@ -2665,6 +4470,183 @@ def create_hash_from_file(file):
         logger.error("Error while creating Hash from file! - Error: %s", e)
         return return_val
 
+@timed_function("fingerprint")
+def create_fingerprint_from_file(file, sample_size:int=None):
+    """
+        This function creates a cheap fingerprint of a given file. The fingerprint contains the
+        size of the file and a hash of the first, middle and last "sample_size" bytes.
+        It is used by validate() in quick mode to avoid a full hash of every file.
+
+        Return Value: dict
+        {
+            "status": False, -> Operation successfull? - Use it as probe
+            "file": None,  -> Absolute file path
+            "fingerprint": None -> fingerprint of the file (<<size>>:<<sha256 of samples>>)
+        }
+    """
+    return_val = {"status": False, "file": None, "fingerprint": None}
+
+    if file is None:
+        logger.error("File is NONE!")
+        return return_val
+
+    if sample_size is None:
+        sample_size = get_fingerprint_sample_size()
+
+    hash_obj = hashlib.sha256()
+    try:
+        file_size = os.path.getsize(file)
+        with open(file, 'rb') as f:
+            if file_size <= sample_size * 3:
+                #Small file - the samples would overlap, just hash the whole file
+                offsets = [0]
+                sample_size = file_size
+            else:
+                offsets = [0, (file_size - sample_size) // 2, file_size - sample_size]
+            for offset in offsets:
+                f.seek(offset)
+                remaining = sample_size
+                while remaining > 0:
+                    fb = f.read(min(BUF_SIZE, remaining))
+                    if len(fb) == 0:
+                        break
+                    hash_obj.update(fb)
+                    remaining -= len(fb)
+        return_val["file"] = file
+        return_val["fingerprint"] = str(file_size) + ":" + hash_obj.hexdigest()
+        return_val["status"] = True
+        return return_val
+    except OSError as e:
+        logger.error("Error while creating fingerprint from file! - Error: %s", e)
+        return return_val
+
+def get_fingerprint_sample_size():
+    """
+        This function returns the sample size used for fingerprints in bytes
+        (option "fingerprint_sample_size" in MB - Default 4 MB)
+
+        Return Value: int
+    """
+    sample_size = fetch_value("config", {"option_name": "fingerprint_sample_size"},
+                              ["option_value"], True)
+    try:
+        return int(float(sample_size[0]) * 1024 * 1024)
+    except (TypeError, ValueError, IndexError):
+        logger.warning("Can't read option fingerprint_sample_size! - Use default (4 MB)")
+        return 4 * 1024 * 1024
+
+def normalize_title(title:str):
+    """ This function normalizes a title for the metadata fingerprint (case, unicode forms,
+        punctuation and whitespace are ignored)
+
+        Return Value: str
+    """
+    title = unicodedata.normalize("NFKC", title).casefold()
+    return " ".join("".join(char if char.isalnum() else " " for char in title).split())
+
+def create_meta_fingerprint(metadata:dict):
+    """
+        This function creates the keys used to predict duplicates before a file is downloaded.
+        Both are created from metadata only (a probe is enough):
+        - video_key -> <<extractor>>:<<video id>> (the same video with another url)
+        - meta_fingerprint -> sha256 of extractor, duration and normalized title
+          (e.g. a reupload of a video). The filesize is not part of it, because it depends on
+          the selected format and is missing in probes.
+
+        Return Value: dict
+        {
+            "status": False, -> Operation successfull? - Use it as probe
+            "video_key": None, -> None if the metadata have no extractor or id
+            "meta_fingerprint": None, -> None if the metadata have no title or duration
+            "size": 0 -> filesize / filesize_approx of the metadata (0 = unknown)
+        }
+    """
+    return_val = {"status": False, "video_key": None, "meta_fingerprint": None, "size": 0}
+    if not isinstance(metadata, dict):
+        return return_val
+
+    extractor = metadata.get("extractor_key") or metadata.get("ie_key") or \
+                metadata.get("extractor")
+    if extractor and metadata.get("id"):
+        return_val["video_key"] = f"{extractor}:{metadata['id']}"
+
+    duration = metadata.get("duration")
+    title = normalize_title(metadata["title"]) if isinstance(metadata.get("title"), str) else ""
+    if extractor and isinstance(duration, (int, float)) and duration > 0 and title:
+        return_val["meta_fingerprint"] = hashlib.sha256(
+            f"{extractor}|{round(duration)}|{title}".encode()).hexdigest()
+
+    size = metadata.get("filesize") or metadata.get("filesize_approx")
+    if isinstance(size, (int, float)):
+        return_val["size"] = int(size)
+    return_val["status"] = True
+    return return_val
+
+def predict_duplicate(metadata:dict, exclude_item_id:int = None):
+    """
+        This function checks if a file is probably already saved - before it is downloaded.
+        An item with the same video key or metadata fingerprint (create_meta_fingerprint())
+        whose file exists on your FS is a probable duplicate. The item "exclude_item_id" is
+        ignored (e.g. the item of a missing file that is redownloaded).
+
+        Return Value: dict
+        {
+            "status": False, -> Probable duplicate found?
+            "item_id": None, -> ID of the saved item
+            "full_file_path": None, -> Path of the saved file
+            "size": 0 -> Expected size of the download in bytes (size of the saved file if
+                         the metadata have no filesize)
+        }
+    """
+    return_val = {"status": False, "item_id": None, "full_file_path": None, "size": 0}
+    fingerprint = create_meta_fingerprint(metadata)
+    conditions = [{key: fingerprint[key]} for key in ("video_key", "meta_fingerprint")
+                  if fingerprint[key]]
+    if not conditions:
+        return return_val
+
+    items = fetch_value("items", conditions, ["id", "file_path", "file_name"])
+    item = next((item for item in items or [] if item[0] != exclude_item_id and item[1] and
+                 item[2] and os.path.isfile(os.path.join(item[1], item[2]))), None)
+    if item is None:
+        return return_val
+
+    return_val["status"] = True
+    return_val["item_id"] = item[0]
+    return_val["full_file_path"] = os.path.join(item[1], item[2])
+    return_val["size"] = fingerprint["size"]
+    if not return_val["size"]:
+        try:
+            return_val["size"] = os.path.getsize(return_val["full_file_path"])
+        except OSError:
+            pass
+    return return_val
+
+def backfill_meta_fingerprints():
+    """
+        This function creates the video key and metadata fingerprint of all items saved
+        before these columns existed (from the saved metadata). Items without usable metadata
+        get empty values - so they are not checked again.
+
+        Return Value: int - Number of updated items
+    """
+    updated_items = 0
+    with group_commit(*get_group_commit_options()):
+        for item_id, item_data in fetch_value_iter("items", {"meta_fingerprint": IS_NULL},
+                                                   ["id", "data"]):
+            try:
+                metadata = json.loads(item_data) if isinstance(item_data, str) else item_data
+            except json.JSONDecodeError:
+                metadata = None
+            fingerprint = create_meta_fingerprint(metadata)
+            if update_value("items", {"video_key": fingerprint["video_key"] or "",
+                                      "meta_fingerprint": fingerprint["meta_fingerprint"] or ""},
+                            {"id": item_id}):
+                updated_items += 1
+    if updated_items:
+        logger.info("Created metadata fingerprints of %i items", updated_items)
+    return updated_items
+
 def error_post_processing(full_file_path):
     """ This function is used to remove downloaded files if anything fails during post processing
 
@@ -2697,6 +4679,7 @@ def get_current_time():
         - -1 -> Failed to get current time
         - timeval -> Current time
     """
+    import pytz
     try:
         user_tz = config.get("other", "timezone")
 
@@ -2709,24 +4692,96 @@ def get_current_time():
                       pytz.all_timezones, user_tz)
         return -1
 
-def get_expected_filepath(metadata:dict, path:str):
+def get_hours_since(timestamp:str, current_time:str):
+    """
+    Returns the hours between a timestamp (like 2024-02-12 12:45:33) and the current time
+
+    Return Value:float|None
+        - None -> Timestamp can't be read
+        - hours -> Hours since the timestamp
+    """
+    try:
+        time_since = (datetime.strptime(current_time, "%Y-%m-%d %H:%M:%S") -
+                      datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S"))
+    except (TypeError, ValueError):
+        logger.warning("Can't read timestamp %s", timestamp)
+        return None
+    return time_since.total_seconds()/3600
+
+def get_subscription_check_delay():
+    """
+    Returns the delay between two checks of a subscription in hours
+    (option "subscription_check_delay" - Default 24)
+
+    Return Value:float
+    """
+    check_interval = fetch_value("config",
+                                 {"option_name": "subscription_check_delay"},
+                                 ["option_value"], True)
+    try:
+        return float(check_interval[0])
+    except (TypeError, ValueError, IndexError):
+        logger.error("Error while fetching check interval value! - Use default (24 hours)")
+        return 24
+
+def get_expected_filepath(metadata:dict, path:str, file_index:dict=None, ydl_opts:dict=None):
     """
         This function is a simple helper used to get the expected full file path.
         The project wide default scheme is <<title>>.<<ext>>.
+        If it is called for many files of the same path, pass ydl_opts (get_ydl_opts(path))
+        - otherwise they are created for every call.
 
-        Return Values:str|None
+        Probed metadata (see get_metadata()) has no "ext" because no format is selected.
+        In this case the filename is taken from file_index (see create_file_index()) -
+        "filename" is None if no file with this title exists.
+
+        Return Values:dict|None
         - None -> Failed to get filename
-        - str -> Filename
+        - {"filepath": "/path", "filename": "<<title>>.<<ext>>"|None, "stem": "<<title>>"}
     """
-    if not "title" in metadata or not "ext" in metadata:
-        logger.error("Metadata does not contain title or ext key!")
+    if not "title" in metadata:
+        logger.error("Metadata does not contain title key!")
         return None
 
-    filename = YoutubeDL(get_ydl_opts(path)).prepare_filename(metadata,
-                                                                  outtmpl=path +
-                                                              '/%(title)s.%(ext)s')
+    if not "ext" in metadata:
+        if file_index is None:
+            logger.error("Metadata does not contain ext key!")
+            return None
+        if ydl_opts is None:
+            ydl_opts = get_ydl_opts(path)
+        with timed("prepare_filename"):
+            stem = ydl_pool.prepare_filename(ydl_opts, metadata, path + '/%(title)s')
+        head, tail = os.path.split(stem)
+        return {"filepath": head, "filename": file_index.get(tail), "stem": tail}
+
+    if ydl_opts is None:
+        ydl_opts = get_ydl_opts(path)
+    with timed("prepare_filename"):
+        filename = ydl_pool.prepare_filename(ydl_opts, metadata, path + '/%(title)s.%(ext)s')
     head, tail = os.path.split(filename)
-    return {"filepath": head, "filename": tail}
+    return {"filepath": head, "filename": tail, "stem": os.path.splitext(tail)[0]}
+
+def create_file_index(path:str):
+    """
+        This function creates an index of all files of a folder - the files registered in the
+        db (items) and the files on the FS. It is used to find files by title if the
+        extension is not known (probe mode).
+
+        Return Value: dict {"<<filename without extension>>": "<<filename>>"}
+    """
+    file_index = {}
+    try:
+        with os.scandir(path) as folder_entries:
+            for folder_entry in folder_entries:
+                if folder_entry.is_file() and not folder_entry.name.endswith(".part"):
+                    file_index.setdefault(os.path.splitext(folder_entry.name)[0], folder_entry.name)
+    except OSError:
+        logger.debug("Folder %s does not exist (yet)", path)
+
+    #Registered files win (the FS can contain other files with the same title)
+    for file_name, in fetch_value_iter("items", {"file_path": path}, ["file_name"]):
+        file_index[os.path.splitext(file_name)[0]] = file_name
+    return file_index
 
 def check_is_url_in_items_db(url, filename=None, file_path=None, filename_is_id=False):
     """
@@ -2931,12 +4986,33 @@ def add_duplicate_file(hash_value, c_filename, c_filepath= None, db_id=None, db_
         file.write(duplicates_json)
     return True
 
+def get_duplicate_paths(base_path:str):
+    """
+        This function returns the paths of all files in duplicates.json which are not
+        saved in the db (see add_duplicate_file())
+
+        Return Val: set {(file_path, file_name)}
+    """
+    duplicate_file_path = os.path.join(base_path, "duplicates.json")
+    try:
+        with open(duplicate_file_path, encoding="UTF-8") as file:
+            duplicates_json = json.loads(file.read() or "{}")
+    except FileNotFoundError:
+        return set()
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning("Can't read duplicate file %s - Error: %s", duplicate_file_path, e)
+        return set()
+
+    return {(entry["file_path"], entry["file_name"]) for listing in duplicates_json.values()
+            for entry in listing if entry.get("file_id") is None}
+
 def show_duplicate_files():
     """
         This function is used to print all duplicates to the cli
 
         Return Val: None
     """
+    from prettytable import PrettyTable
 
     #Fetch base path
     base_path = fetch_value("config", {"option_name": "base_location"}, ["option_value"], True)
@@ -3049,6 +5125,108 @@ def insert_missing_file_data_in_db(file_id, url, metadata):
     logging.error("Error while adding data")
     return False
 
+def get_metrics_textfile_path():
+    """ This function returns the textfile the metrics are written to
+        (option "metrics_textfile_path" - Default NONE)
+
+        Return Value: str|None - None if the export is disabled
+    """
+    textfile_path = fetch_value("config", {"option_name": "metrics_textfile_path"},
+                                ["option_value"], True)
+    if not textfile_path or textfile_path[0] in ("", "NONE"):
+        return None
+    return textfile_path[0]
+
+def get_metrics_http_port():
+    """ This function returns the port of the metrics endpoint in daemon mode
+        (option "metrics_http_port" - Default 0 = disabled)
+
+        Return Value: int
+    """
+    metrics_port = fetch_value("config", {"option_name": "metrics_http_port"}, ["option_value"], True)
+    try:
+        return int(metrics_port[0])
+    except (TypeError, ValueError, IndexError):
+        logger.warning("Can't read option metrics_http_port! - Metrics endpoint disabled")
+        return 0
+
+def configure_metrics(command:str=None):
+    """ This function enables the measurement of durations (metrics.enable()) if the metrics
+        are exported - to the textfile or (daemon) with the http endpoint.
+        Without an export the db calls are not measured.
+
+        Return Value: bool - Metrics enabled?
+    """
+    if get_metrics_textfile_path() is None and \
+       (command != "daemon" or get_metrics_http_port() <= 0):
+        return False
+    metrics.enable()
+    return True
+
+def export_metrics():
+    """
+        This function writes all metrics to the textfile defined in the option
+        metrics_textfile_path (config table) - e.g. for the node-exporter textfile collector.
+        If the option is "NONE" nothing is written.
+
+        Return Value: bool
+        - True -> Metrics written / export disabled
+        - False -> Error while writing the file (see log)
+    """
+    textfile_path = get_metrics_textfile_path()
+    if textfile_path is None:
+        return True
+
+    metrics.set_gauge("ytdl_last_run_timestamp_seconds", int(time.time()))
+    return metrics.write_textfile(textfile_path)
+
+def get_workdir():
+    """
+        This function returns the absolute path of the workdir (base_location)
+
+        Return Value: str|None
+        - str -> absolute path
+        - None -> Can't fetch the workdir (see log)
+    """
+    workdir = fetch_value("config", {"option_name": "base_location"}, ["option_value"], True)
+
+    if not workdir:
+        logger.error("Can't fetch workdir!")
+        return None
+    return os.path.abspath(workdir[0])
+
+def save_timing_report():
+    """
+        This function saves the timing report of the current run (CLI option --timings)
+        inside the workdir.
+
+        Return Value: bool
+        - True -> Report saved
+        - False -> Error while saving the report (see log)
+    """
+    workdir = get_workdir()
+
+    if workdir is None:
+        logger.error("Timing report is not saved")
+        return False
+    return write_report(workdir) is not None
+
+def save_item_profiles():
+    """
+        This function saves the profiles of the slowest downloads (CLI option --profile-items)
+        inside the workdir.
+
+        Return Value: bool
+        - True -> Profiles saved
+        - False -> Error while saving the profiles / nothing was downloaded (see log)
+    """
+    workdir = get_workdir()
+
+    if workdir is None:
+        logger.error("Download profiles are not saved")
+        return False
+    return write_item_profiles(workdir) is not None
+
 def check_for_workdir(inner=False):
     """
         This function checks if the defined workdir in the db is existing
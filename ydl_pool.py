@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+"""
+#
+# Project by j54j6
+# This file provides a pool of YoutubeDL instances. Creating a YoutubeDL instance is expensive
+# (extractors, cookie jar, opener, cache) and most calls of a run use the same options.
+# Instances are cached by a hash of their options and reused. All instances are closed on exit.
+#
+"""
+
+#Python modules
+import copy
+import json
+import atexit
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# init logger
+logger = logging.getLogger(__name__)
+
+#Maximum number of idle instances in the pool - the least recently used ones are closed
+POOL_MAX_IDLE = 16
+
+#Idle instances {"<<options hash>>": [YoutubeDL, ...]} (least recently used first)
+IDLE_INSTANCES:OrderedDict = OrderedDict()
+POOL_LOCK = threading.Lock()
+
+def get_options_key(ydl_opts:dict):
+    """ Return a canonical hash of the options (used as key of the pool) """
+    return hashlib.sha256(json.dumps(ydl_opts, sort_keys=True, default=repr).encode()).hexdigest()
+
+@contextmanager
+def borrow(ydl_opts:dict):
+    """ Context manager to use a YoutubeDL instance with the given options. An idle instance
+        with the same options is reused - otherwise a new one is created. The instance must not
+        be closed by the caller. It is given back to the pool afterwards.
+
+        with borrow(get_ydl_opts(path)) as ydl:
+            ydl.extract_info(url, download=False)
+    """
+    from yt_dlp import YoutubeDL # pylint: disable=import-outside-toplevel
+    options_key = get_options_key(ydl_opts)
+    ydl = None
+    with POOL_LOCK:
+        if IDLE_INSTANCES.get(options_key):
+            ydl = IDLE_INSTANCES[options_key].pop()
+            IDLE_INSTANCES.move_to_end(options_key)
+    if ydl is None:
+        logger.debug("Create YoutubeDL instance for options %s", options_key[:12])
+        #YoutubeDL changes the passed dict (e.g. outtmpl) - keep the options of the caller
+        ydl = YoutubeDL(copy.deepcopy(ydl_opts))
+
+    try:
+        yield ydl
+    finally:
+        #download() returns the result of all downloads of the instance - reset it
+        if hasattr(ydl, "_download_retcode"):
+            ydl._download_retcode = 0 # pylint: disable=protected-access
+        give_back(options_key, ydl)
+
+def give_back(options_key:str, ydl):
+    """ Put an instance back into the pool. If the pool is full, the least recently used
+        instance is closed.
+    """
+    evicted = []
+    with POOL_LOCK:
+        IDLE_INSTANCES.setdefault(options_key, []).append(ydl)
+        IDLE_INSTANCES.move_to_end(options_key)
+        idle_count = sum(len(instances) for instances in IDLE_INSTANCES.values())
+        while idle_count > POOL_MAX_IDLE:
+            oldest_key, oldest_instances = next(iter(IDLE_INSTANCES.items()))
+            evicted.append(oldest_instances.pop(0))
+            if not oldest_instances:
+                del IDLE_INSTANCES[oldest_key]
+            idle_count -= 1
+    for instance in evicted:
+        close_instance(instance)
+
+def prepare_filename(ydl_opts:dict, metadata:dict, outtmpl:str):
+    """ Return the filename yt-dlp would use for metadata (with a pooled instance) """
+    with borrow(ydl_opts) as ydl:
+        return ydl.prepare_filename(metadata, outtmpl=outtmpl)
+
+def close_instance(ydl):
+    """ Close an instance and log errors """
+    try:
+        ydl.close()
+    except Exception as e: # pylint: disable=broad-exception-caught
+        logger.warning("Error while closing YoutubeDL instance - Error: %s", e)
+
+def close_all():
+    """ Close all idle instances (called on exit / daemon shutdown) """
+    with POOL_LOCK:
+        instances = [ydl for pooled in IDLE_INSTANCES.values() for ydl in pooled]
+        IDLE_INSTANCES.clear()
+    for ydl in instances:
+        close_instance(ydl)
+    if instances:
+        logger.debug("Closed %i YoutubeDL instances", len(instances))
+
+atexit.register(close_all)
@@ -29,70 +29,60 @@ import argparse
 from project_functions import (show_help, direct_download, direct_download_batch,
                                scheme_setup, add_subscription, add_subscription_batch,
                                del_subscription, list_subscriptions, export_subscriptions,
-                               import_subscriptions, start, validate, export_items, import_items,
+                               set_subscription_priority, import_subscriptions, start, validate,
+                               export_items, import_items,
                                show_duplicate_files, check_for_workdir, 
-                               show_profiles, enable_profile, disable_profile)
+                               show_profiles, enable_profile, disable_profile, verify_db, daemon,
+                               worker, configure_metrics,
+                               save_timing_report, save_item_profiles, get_workdir)
 from database_manager import check_db
 from config_handler import check_for_config
+from instrumentation import enable_timings, enable_item_profiling, profile_call, PROFILE_MODES
+from log_handler import setup_logging, LOG_LEVELS
 
 #Version
 CURRENT_VERSION = 20240921
 
 
-# Init. Logging
-logging.getLogger(__name__).addHandler(logging.StreamHandler(sys.stdout))
-logging.basicConfig(level=logging.DEBUG)
+# Init. Logging (configured by setup_logging() in main())
 logger = logging.getLogger(__name__)
 
-logger.info("Running startup checks...")
-
-#Check for config File
-CONFIG_LOADED = check_for_config()
-if not CONFIG_LOADED:
-    logger.error("Error while loading config! - Check log...")
-    sys.exit()
-
-#Check for database and init
-DATABASE_CHECK_SUCCESSFULL = check_db()
-if not DATABASE_CHECK_SUCCESSFULL:
-    logging.error("Error while initializing DB! - Please check log...")
-    sys.exit()
-
-#Check database content
-DEPENDENCIES = scheme_setup()
-
-if not DEPENDENCIES:
-    logging.error("Error while prepare dependencies... Check log.")
-    sys.exit()
-
-#All Tables exists needed to run this thing...
-logging.info("All mandatory tables are existing...")
-
-#POSTPONED
-#parser = argparse.ArgumentParser(
-#description="""YT-DL Manager - Download and manage Videos from different sources.
-#               Further you can download new content completly automatic""")
-#parser.add_argument("command",
-#       type=str,
-#       choices=["help",
-#       "add-subscription",
-#       "del-subscription",
-#       "list-subscriptions",
-#       "custom",
-#       "start",
-#       "validate"],
-#help="Command - What do you want to do?")
-#parser.add_argument("--url",
-#           help="Url to add a subscription or directly download a video",
-#           default=None)
-
-#args = parser.parse_args()
-
-#Check for workdir
-WORKDIR_EXIST = check_for_workdir()
-if not WORKDIR_EXIST:
-    logger.info("Workdir can't be created!")
-    sys.exit(-1)
+def run_startup_checks(command:str) -> bool:
+    """ This function runs all checks needed before a command can be executed.
+        "help" doesn't need anything. The scheme setup is skipped by scheme_setup() itself if
+        the db already matches the scheme files. The config is loaded before (main()) since
+        it is needed to set up logging.
+
+        Return Value: bool
+        - True: All checks passed
+        - False: At least one check failed (see log)
+    """
+    if command in (None, "help"):
+        return True
+
+    logger.info("Running startup checks...")
+
+    #Check for database and init
+    if not check_db():
+        logger.error("Error while initializing DB! - Please check log...")
+        return False
+
+    #Check database content
+    if not scheme_setup():
+        logger.error("Error while prepare dependencies... Check log.")
+        return False
+
+    #All Tables exists needed to run this thing...
+    logger.info("All mandatory tables are existing...")
+
+    #Check for workdir
+    if not check_for_workdir():
+        logger.info("Workdir can't be created!")
+        return False
+
+    #Durations are only measured if the metrics are exported
+    configure_metrics(command)
+    return True
 
 def convert_to_list(val) -> list[str]:
     """ This function is used to convert the user input to a list of strings"""
@@ -109,6 +99,14 @@ def convert_to_list(val) -> list[str]:
 def main():
     """ The main function provides the CLI"""
     parser = argparse.ArgumentParser(description="YT-Download Manager by j54j6")
+    parser.add_argument("--timings", help="Measure the time of all stages and save a report in the workdir",
+                        action="store_true")
+    parser.add_argument("--log-level", help="Log level (overrides log_level in config.ini)",
+                        type=str.upper, choices=LOG_LEVELS)
+    parser.add_argument("--profile", help="Profile the command and save the profile in the workdir",
+                        choices=PROFILE_MODES)
+    parser.add_argument("--profile-items", help="Save the profiles of the N slowest downloads in the workdir",
+                        type=int, default=0)
 
     # Subcommands
     subparsers = parser.add_subparsers(dest="command")
@@ -131,6 +129,11 @@ def main():
     del_sub = subparsers.add_parser("del-subscription", help="Delete a subscription")
     del_sub.add_argument("url", help="URL of the subscription")
 
+    # Set subscription priority command
+    priority_sub = subparsers.add_parser("set-subscription-priority", help="Set the download priority of a subscription")
+    priority_sub.add_argument("url", help="URL or name of the subscription")
+    priority_sub.add_argument("priority", help="Priority (higher = downloaded first, default 0)")
+
     # List subscriptions command
     list_sub = subparsers.add_parser("list-subscriptions", help="List all subscriptions")
     list_sub.add_argument("filter", help="Filter for subscription list", nargs="?")
@@ -161,10 +164,19 @@ def main():
 
     subparsers.add_parser("start", help="Run the script to check for new content and download it")
 
-    subparsers.add_parser("validate", help="Rehash all files and compare them to stored files")
+    subparsers.add_parser("daemon", help="Keep running and check for new content periodically")
+
+    subparsers.add_parser("worker", help="Run as one of several workers sharing one database")
+
+    validate_parser = subparsers.add_parser("validate", help="Add new files to the db and check known files (--full / --quick)")
+    validate_parser.add_argument("--full", help="Rehash all known files and compare them to the stored hash", nargs="?", const=True)
+    validate_parser.add_argument("--quick", help="Only compare fingerprints (size and sampled hashes)", nargs="?", const=True)
 
     subparsers.add_parser("show-duplicates", help="Show duplicate files")
 
+    verify_db_parser = subparsers.add_parser("verify-db", help="Check if all files in the db exist on the FS")
+    verify_db_parser.add_argument("--redownload", help="Redownload all missing files", nargs="?", const=True)
+
     subparsers.add_parser("show-format-profiles", help="Show all currently defined profiles to define the output format")
     
     en_format_profile = subparsers.add_parser("enable-format-profile", help="Enable a specific format profile (globally)")
@@ -174,7 +186,23 @@ def main():
     dis_format_profile = subparsers.add_parser("disable-format-profile", help="Disable a specific format profile (globally)")
     dis_format_profile.add_argument("profile_name", help="Profilename of the intended profile")
     # Parse arguments
-    args = parser.parse_args()
+    #"--profile" without a mode would take the command as its value - use the default mode
+    args = parser.parse_args(["--profile=cprofile" if arg == "--profile" else arg
+                              for arg in sys.argv[1:]])
+
+    #Check for config File
+    if args.command not in (None, "help") and not check_for_config():
+        logging.error("Error while loading config! - Check log...")
+        sys.exit(-1)
+    setup_logging(args.log_level)
+
+    if args.timings:
+        enable_timings()
+    if args.profile_items > 0:
+        enable_item_profiling(args.profile_items)
+
+    if not run_startup_checks(args.command):
+        sys.exit(-1)
 
     # Command mapping to functions
     commands = {
@@ -185,6 +213,7 @@ def main():
             add_subscription_batch(args.url) if args.batch else add_subscription(args.url)
         ),
         "del-subscription": lambda: del_subscription(args.url),
+        "set-subscription-priority": lambda: set_subscription_priority(args.url, args.priority),
         "list-subscriptions": lambda: list_subscriptions(list(args.filter.split(",")) if args.filter else None),
         "export-subscriptions": export_subscriptions,
         "import-subscriptions": lambda: import_subscriptions(args.path, args.overwrite),
@@ -199,8 +228,11 @@ def main():
                                 else direct_download(args.url)
                             ),
         "start": start,
-        "validate": validate,
+        "daemon": daemon,
+        "worker": worker,
+        "validate": lambda: validate(rehash=bool(args.full), quick=bool(args.quick)),
         "show-duplicates": show_duplicate_files,
+        "verify-db": lambda: verify_db(bool(args.redownload)),
         "show-format-profiles": show_profiles,
         "enable-format-profile": lambda: enable_profile(args.profile_name, args.only_active),
         "disable-format-profile": lambda: disable_profile(args.profile_name),
@@ -209,7 +241,16 @@ def main():
     # Execute the command
     command_func = commands.get(args.command)
     if command_func:
-        NO_ERROR = command_func()
+        workdir = get_workdir() if args.profile and args.command != "help" else None
+        if workdir is not None:
+            NO_ERROR = profile_call(command_func, args.profile, workdir,
+                                    "profile_" + args.command)
+        else:
+            NO_ERROR = command_func()
+        if args.timings:
+            save_timing_report()
+        if args.profile_items > 0:
+            save_item_profiles()
         if NO_ERROR:
             sys.exit(0)
         else: